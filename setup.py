@@ -54,18 +54,22 @@ setup(name = 'Maui-Smart-Grid', version = '1.0.0',
 
       py_modules = [
                     'filelock',
+                    'meco_batch_insert',
                     'meco_data_autoloader',
                     'meco_db_delete',
                     'meco_db_insert',
                     'meco_db_read',
                     'meco_dupe_check',
+                    'meco_dupe_index',
                     'meco_fk',
                     'meco_mapper',
                     'meco_plotting',
                     'meco_pv_readings_in_nonpv_mlh_notifier',
                     'meco_xml_parser',
                     'msg_aggregated_data',
+                    'msg_cloud_storage',
                     'msg_configer',
+                    'msg_csv_bulk_loader',
                     'msg_data_aggregator',
                     'msg_data_verifier',
                     'msg_db_connector',
@@ -74,13 +78,16 @@ setup(name = 'Maui-Smart-Grid', version = '1.0.0',
                     'msg_file_util',
                     'msg_logger',
                     'msg_math_util',
+                    'msg_noaa_weather_data_downloader',
                     'msg_noaa_weather_data_dupe_checker',
                     'msg_noaa_weather_data_inserter',
                     'msg_noaa_weather_data_parser',
                     'msg_noaa_weather_data_util',
                     'msg_notifier',
                     'msg_python_util',
+                    'msg_rolling_statistics',
                     'msg_time_util',
+                    'msg_timestamp_parser',
                     'msg_types'
       ],
 
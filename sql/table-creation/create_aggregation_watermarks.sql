@@ -0,0 +1,29 @@
+-- Create the Aggregation Watermarks table.
+--
+-- Holds the last aggregation endpoint for each aggregated data type and
+-- subkey so that new data can be found without scanning the aggregated
+-- data tables. Data types without subkeys use an empty subkey.
+--
+-- Rows are created and advanced by MSGDataAggregator.
+
+SET statement_timeout = 0;
+SET client_encoding = 'UTF8';
+SET standard_conforming_strings = on;
+SET check_function_bodies = false;
+SET client_min_messages = warning;
+
+SET search_path = public, pg_catalog;
+
+SET default_tablespace = '';
+
+SET default_with_oids = false;
+
+CREATE TABLE "AggregationWatermarks" (
+    data_type character varying NOT NULL,
+    subkey character varying DEFAULT '' NOT NULL,
+    last_endpoint timestamp without time zone NOT NULL,
+    updated timestamp without time zone DEFAULT now() NOT NULL
+);
+
+ALTER TABLE ONLY "AggregationWatermarks"
+    ADD CONSTRAINT aggregation_watermarks_pkey PRIMARY KEY (data_type, subkey);
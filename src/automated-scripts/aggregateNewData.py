@@ -27,7 +27,7 @@ class NewDataAggregator(object):
         Constructor.
         """
         self.logger = SEKLogger(__name__, 'DEBUG')
-        self.aggregator = MSGDataAggregator()
+        self.aggregator = MSGDataAggregator(bulkInsert = True)
         self.notifier = MSGNotifier()
         self.rawTypes = [x.name for x in list(MSGAggregationTypes)]
         self.connector = MSGDBConnector()
@@ -10,7 +10,8 @@ in the config file.
 
 Usage:
 
-    python exportDBsToCloud.py
+    python exportDBsToCloud.py [--streaming] [--compresslevel N]
+                               [--workers N]
 
 """
 
@@ -42,6 +43,15 @@ def processCommandLineArguments():
     parser.add_argument('--fullpath',
                         help = 'Full path to database file to be uploaded.')
     parser.add_argument('--testing', action = 'store_true', default = False)
+    parser.add_argument('--streaming', action = 'store_true', default = False,
+                        help = 'Compress and split the output of pg_dump as '
+                               'it is produced.')
+    parser.add_argument('--compresslevel', type = int, default = 9,
+                        choices = range(1, 10),
+                        help = 'gzip compression level.')
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'Number of compression threads. More than one '
+                               'compresses blocks in parallel.')
 
     COMMAND_LINE_ARGS = parser.parse_args()
 
@@ -61,7 +71,12 @@ if __name__ == '__main__':
         ',')
     fileIDs = exporter.exportDBs(databases = dbs, toCloud = True,
                                  testing = COMMAND_LINE_ARGS.testing,
-                                 deleteOutdated = True)
+                                 deleteOutdated = True,
+                                 streaming = COMMAND_LINE_ARGS.streaming,
+                                 compressLevel =
+                                 COMMAND_LINE_ARGS.compresslevel,
+                                 compressionWorkers =
+                                 COMMAND_LINE_ARGS.workers)
 
     wallTime = time.time() - startTime
     wallTimeMin = int(wallTime / 60.0)
@@ -6,8 +6,16 @@ Usage:
 
     time python -u ${PATH}/insertCompressedNOAAWeatherData.py [--testing]
                                                               [--email]
+                                                              [--alldata]
+                                                              [--workers N]
 
 This script only supports processing of *hourly.txt.gz files.
+
+Files are decompressed and parsed by a pool of worker processes while the
+main process inserts the parsed records of each file, in bulk, as they
+become available. The number of workers is given by `--workers` and
+defaults to the value of multiprocessing_limit in the [Hardware] section of
+the configuration. Parse and insert times are reported for each file.
 """
 
 __author__ = 'Daniel Zhang (張道博)'
@@ -21,6 +29,9 @@ KAHULUI_AIRPORT = '22516'
 
 import os
 import fnmatch
+import time
+import multiprocessing
+from itertools import imap
 from msg_configer import MSGConfiger
 from msg_notifier import MSGNotifier
 import argparse
@@ -64,9 +75,52 @@ def processCommandLineArguments():
                                   'processing the latest data. Processing '
                                   'only the latest data is the default '
                                   'behavior.')
+    argParser.add_argument('--workers', type = int, default = None,
+                           help = 'Number of files to decompress and parse '
+                                  'concurrently. Defaults to the '
+                                  'multiprocessing limit in the local '
+                                  'configuration file.')
     COMMAND_LINE_ARGS = argParser.parse_args()
 
 
+def workerCount():
+    """
+    Determine the number of worker processes.
+
+    :returns: Int count of workers.
+    """
+
+    if COMMAND_LINE_ARGS.workers:
+        return max(1, COMMAND_LINE_ARGS.workers)
+
+    try:
+        return max(1, int(
+            configer.configOptionValue("Hardware", "multiprocessing_limit")))
+    except (TypeError, ValueError):
+        return multiprocessing.cpu_count()
+
+
+def parseFile(fullPath):
+    """
+    Decompress and parse a weather data file. This is a multiprocessing pool
+    worker.
+
+    :param fullPath: Path of an hourly.txt.gz file.
+    :returns: Tuple of the path, a list of record tuples and the parse time
+    in seconds.
+    """
+
+    startTime = time.time()
+    fileObject = gzip.open(fullPath, "rb")
+    try:
+        # Plain tuples are returned since records are pickled.
+        records = [tuple(record) for record in
+                   dataParser.weatherRecords(fileObject, [KAHULUI_AIRPORT])]
+    finally:
+        fileObject.close()
+    return fullPath, records, time.time() - startTime
+
+
 def previousRetrievalResults():
     """
     Return previous retrieval results.
@@ -125,54 +179,59 @@ msgBody += msg + "\n"
 allDays = []
 weatherDays = []
 setOfAllDays = set()
-for root, dirnames, filenames in os.walk('.'):
-
-    if COMMAND_LINE_ARGS.alldata:
+paths = []
 
-        # Load ALL data.
+if COMMAND_LINE_ARGS.alldata:
+    # Load ALL data.
+    for root, dirnames, filenames in os.walk('.'):
         for filename in fnmatch.filter(filenames, '*hourly.txt.gz'):
-            fullPath = os.path.join(root, filename)
-            msg = fullPath
-            print msg
-            msgBody += "Processing %s.\n" % msg
-            fileObject = gzip.open(fullPath, "rb")
-            weatherDays = inserter.insertDataDict(conn, 'WeatherNOAA',
-                                                  dataParser.parseWeatherData(
-                                                      fileObject,
-                                                      [KAHULUI_AIRPORT]),
-                                                  commit = True)
-            allDays += weatherDays
-
-            fileObject.close()
-            if TESTING:
-                break
-
-    else: # Only process the latest data from the last loaded date.
-        weatherUtil = MSGWeatherDataUtil()
-        keepList = weatherUtil.getKeepList(weatherUtil.fileList,
-                                           connector.conn.cursor())
-
-        print "keep list = %s" % keepList
-
-        keepDates = [weatherUtil.datePart(filename = k) for k in keepList]
-        hourlyNames = [k + 'hourly.txt.gz' for k in keepDates]
+            paths.append(os.path.join(root, filename))
+
+else: # Only process the latest data from the last loaded date.
+    weatherUtil = MSGWeatherDataUtil()
+    keepList = weatherUtil.getKeepList(weatherUtil.fileList,
+                                       connector.conn.cursor())
+
+    print "keep list = %s" % keepList
+
+    keepDates = [weatherUtil.datePart(filename = k) for k in keepList]
+    hourlyNames = [k + 'hourly.txt.gz' for k in keepDates]
 
+    for root, dirnames, filenames in os.walk('.'):
         for n in hourlyNames:
-            fullPath = os.path.join(root, n)
-            msg = fullPath
-            print msg
-            msgBody += "Processing %s.\n" % msg
-            fileObject = gzip.open(fullPath, "rb")
-            weatherDays = inserter.insertDataDict(conn, 'WeatherNOAA',
-                                                  dataParser.parseWeatherData(
-                                                      fileObject,
-                                                      [KAHULUI_AIRPORT]),
-                                                  commit = True)
-            allDays += weatherDays
-
-            fileObject.close()
-            if TESTING:
-                break
+            if n in filenames:
+                paths.append(os.path.join(root, n))
+
+if TESTING:
+    paths = paths[:1]
+
+workers = min(workerCount(), max(1, len(paths)))
+msg = "Parsing with %d workers." % workers
+print msg
+msgBody += msg + "\n"
+
+pool = None
+if workers > 1:
+    pool = multiprocessing.Pool(workers)
+    parsedFiles = pool.imap_unordered(parseFile, paths)
+else:
+    parsedFiles = imap(parseFile, paths)
+
+for fullPath, records, parseTime in parsedFiles:
+    startTime = time.time()
+    weatherDays = inserter.insertRecords(conn, 'WeatherNOAA',
+                                         dataParser.recordCols, records,
+                                         commit = True)
+    msg = "Processing %s: %d records parsed in %.2f s, %d timestamps " \
+          "inserted in %.2f s." % (fullPath, len(records), parseTime,
+                                   len(weatherDays), time.time() - startTime)
+    print msg
+    msgBody += msg + "\n"
+    allDays += weatherDays
+
+if pool:
+    pool.close()
+    pool.join()
 
 if len(allDays) == 0:
     msgBody += "No weather data was processed."
@@ -12,6 +12,12 @@ database and send email notifications, respectively.
 From the **current working directory**, recursively descend into every existing
 folder and insert all data that is found using multiprocessing.
 
+Files are processed by a pool of worker processes, largest file first. The
+number of workers is given by `--workers` and defaults to the value of
+multiprocessing_limit in the [Hardware] section of the configuration. A file
+that takes longer than `--timeout` seconds to process is abandoned. Results
+are reported as each file finishes.
+
 This script makes use of `insertSingleMECOEnergyDataFile.py`.
 
 This script only supports processing of gzip-compressed XML (*.xml.gz) files.
@@ -30,6 +36,7 @@ import re
 import argparse
 import time
 import multiprocessing
+import signal
 
 from msg_configer import MSGConfiger
 from msg_notifier import MSGNotifier
@@ -67,9 +74,46 @@ def processCommandLineArguments():
                         help = 'If this flag is on, '
                                'insert data to the testing database as '
                                'specified in the local configuration file.')
+    parser.add_argument('--workers', type = int, default = None,
+                        help = 'Number of files to process concurrently. '
+                               'Defaults to the multiprocessing limit in the '
+                               'local configuration file.')
+    parser.add_argument('--timeout', type = int, default = 0,
+                        help = 'Seconds allowed for processing a single file. '
+                               'No limit is applied if this is 0.')
     COMMAND_LINE_ARGS = parser.parse_args()
 
 
+def workerCount():
+    """
+    Determine the number of worker processes.
+
+    :returns: Int count of workers.
+    """
+
+    if COMMAND_LINE_ARGS.workers:
+        return max(1, COMMAND_LINE_ARGS.workers)
+
+    try:
+        return max(1, int(
+            configer.configOptionValue("Hardware", "multiprocessing_limit")))
+    except (TypeError, ValueError):
+        return multiprocessing.cpu_count()
+
+
+def pathsLargestFirst(paths):
+    """
+    Order paths so that the largest files are processed first. This keeps a
+    large file from starting last and extending the total run time.
+
+    :param paths: List of file paths.
+    :returns: List of file paths sorted by descending file size.
+    """
+
+    return sorted(paths, key = lambda path: os.path.getsize(path),
+                  reverse = True)
+
+
 def makePlotAttachments():
     """
     Make data plots.
@@ -116,7 +160,7 @@ def insertDataWrapper(fullPath):
     :returns: A log of parsing along with performance results.
     """
 
-    pattern = 'Process-(\d+),'
+    pattern = '(?:Process|PoolWorker)-(\d+),'
     jobString = str(multiprocessing.current_process())
     match = re.search(pattern, jobString)
     assert match.group(1) is not None, "Process ID was matched."
@@ -142,21 +186,35 @@ def insertDataWrapper(fullPath):
     return myLog
 
 
-def worker(path, returnDict):
+def timeoutHandler(signum, frame):
+    """
+    Abort processing of a file that has exceeded the timeout.
+    """
+
+    raise RuntimeError(
+        "Processing time exceeded %s s." % COMMAND_LINE_ARGS.timeout)
+
+
+def worker(path):
     """
-    This is a multiprocessing worker for inserting data.
+    This is a multiprocessing pool worker for inserting data.
 
     :param path: A path containing data to be inserted.
-    :param returnDict: Process results, in the form of a log, are returned to
-    the caller via this dictionary during multiprocessing.
+    :returns: Tuple of the path and a log of the processing results.
     """
 
-    result = insertDataWrapper(path)
-    pattern = 'Process-(\d+),'
-    jobString = str(multiprocessing.current_process())
-    match = re.search(pattern, jobString)
-    assert match.group(1) is not None, "Process ID was matched."
-    returnDict[match.group(1)] = result
+    if COMMAND_LINE_ARGS.timeout > 0:
+        signal.signal(signal.SIGALRM, timeoutHandler)
+        signal.alarm(COMMAND_LINE_ARGS.timeout)
+
+    try:
+        return path, insertDataWrapper(path)
+    except Exception as detail:
+        msg = "\n%s\nAn exception occurred: %s\n" % (path, detail)
+        logger.log(msg, 'error')
+        return path, msg
+    finally:
+        signal.alarm(0)
 
 
 if __name__ == '__main__':
@@ -233,24 +291,24 @@ if __name__ == '__main__':
                 pathsToProcess.append(os.path.join(root, filename))
 
     try:
-        procs = []
-        manager = multiprocessing.Manager()
-        returnDict = manager.dict()
-
-        for path in pathsToProcess:
-            procs.append(multiprocessing.Process(target = worker,
-                                                 args = (path, returnDict)))
-            procs[-1].daemon = True
-            procs[-1].start()
-
-        for proc in procs:
-            proc.join()
-
-        for key in returnDict.keys():
-            sys.stderr.write("Process %s results:\n" % key)
-            sys.stderr.write(returnDict[key])
+        workers = workerCount()
+        msg = "Processing with %s workers." % workers
+        print msg
+        msgBody += msg + "\n"
+
+        # Each file gets a fresh process so that memory and the DB
+        # connection are released when the file is finished.
+        pool = multiprocessing.Pool(workers, maxtasksperchild = 1)
+
+        for path, result in pool.imap_unordered(worker, pathsLargestFirst(
+                pathsToProcess)):
+            sys.stderr.write("Results for %s:\n" % path)
+            sys.stderr.write(result)
             sys.stderr.write("\n")
-            msgBody += returnDict[key]
+            msgBody += result
+
+        pool.close()
+        pool.join()
 
     except Exception as detail:
         msg = "\nAn exception occurred: {}\n".format(detail)
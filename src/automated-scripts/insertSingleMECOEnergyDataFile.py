@@ -96,7 +96,9 @@ class Inserter(object):
                 i.parser.filename = filePath
 
                 # Obtain the log of the parsing.
-                parseLog += i.parser.parseXML(fileObject, True, jobID = jobID)
+                parseLog += i.parser.parseXML(fileObject, True, jobID = jobID,
+                                              streaming = True, batch = True,
+                                              indexDupes = True)
 
                 fileObject.close()
         except TypeError:
@@ -19,6 +19,19 @@ data from the last insertion time.
 This can involve, in regular use, re-downloading the previous month of data
 and the current month of data.
 
+Re-downloads are conditional requests based on the headers recorded in the
+download manifest, so archives that have not changed on the server are not
+retrieved again. Downloads are performed concurrently by a pool of threads.
+
+The hourly data in each retrieved archive is transcoded directly from the
+zip archive to gzip in a single streaming pass. The gzip compression level
+is given by `--compresslevel`. When `--wban` is given, one or more times,
+only the rows for those stations are kept.
+
+Usage:
+
+    python retrieveNOAAWeatherData.py [--compresslevel N] [--wban WBAN]
+
 """
 
 __author__ = 'Daniel Zhang (張道博)'
@@ -27,16 +40,16 @@ __license__ = 'https://raw.github' \
               '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
               '-LICENSE.txt'
 
-import pycurl
+import urllib2
 from msg_configer import MSGConfiger
 from sek.logger import SEKLogger, CRITICAL, ERROR, WARNING, INFO, DEBUG, SILENT
-import multiprocessing
+from multiprocessing.pool import ThreadPool
 import zipfile
 import os
-import gzip
+import argparse
 from msg_noaa_weather_data_util import MSGWeatherDataUtil
+from msg_noaa_weather_data_downloader import MSGWeatherDataDownloader
 from msg_db_connector import MSGDBConnector
-import fnmatch
 from msg_time_util import MSGTimeUtil
 
 weatherDataPath = ''
@@ -46,6 +59,7 @@ downloadCount = 0
 WEATHER_DATA_PATH = ''
 MSG_BODY = ''
 WEATHER_DATA = 'Weather Data'
+COMMAND_LINE_ARGS = None
 
 # @todo Remove use of global weather data path.
 
@@ -76,6 +90,8 @@ class MSGWeatherDataRetriever(object):
         weatherDataPattern = self.configer.configOptionValue(WEATHER_DATA,
                                                              'weather_data_pattern')
 
+        self.downloader = MSGWeatherDataDownloader(weatherDataPath)
+
 
     def fileExists(self, filename):
         # @todo Move to external module.
@@ -104,6 +120,20 @@ def fileExists(filename):
     return False
 
 
+def processCommandLineArguments():
+    global COMMAND_LINE_ARGS
+    argParser = argparse.ArgumentParser(
+        description = 'Retrieve NOAA weather data and recompress the hourly '
+                      'data with gzip.')
+    argParser.add_argument('--compresslevel', type = int, default = 9,
+                           choices = range(1, 10),
+                           help = 'gzip compression level for hourly data.')
+    argParser.add_argument('--wban', action = 'append', default = None,
+                           help = 'Keep only the hourly data for this '
+                                  'station. May be given more than once.')
+    COMMAND_LINE_ARGS = argParser.parse_args()
+
+
 def unzipWorker(filename, forceDownload = False):
     """
     Perform decompression of downloaded files.
@@ -125,39 +155,22 @@ def unzipWorker(filename, forceDownload = False):
         return
 
     if (fileExists(filename)):
-        msg = "Unzipping %s." % filename
-        print msg
-        MSG_BODY += '%s\n' % msg
+        hourlyName = retriever.weatherUtil.datePart(
+            filename = originalName) + "hourly.txt"
         try:
-
             zfile = zipfile.ZipFile(filename)
-            for name in zfile.namelist():
-                (dirname, filename) = os.path.split(name)
-                if not dirname == '':
-                    msg = "Decompressing " + filename + " into " + dirname + "."
-                    print msg
-                    MSG_BODY += '%s\n' % msg
-                else:
-                    msg = "Decompressing " + filename + "."
-                    print msg
-                    MSG_BODY += '%s\n' % msg
-
-                if not os.path.exists(dirname) and not dirname == '':
-                    os.mkdir(dirname)
-                fd = open(name, "w")
-                fd.write(zfile.read(name))
-                fd.close()
-
-            hourlyName = retriever.weatherUtil.datePart(
-                filename = originalName) + "hourly.txt"
-
-            if fileExists(hourlyName):
-                msg = "Hourly file exists. Compressing the hourly file with " \
-                      "gzip."
+            names = [name for name in zfile.namelist() if
+                     os.path.basename(name) == hourlyName]
+            zfile.close()
+
+            if names:
+                msg = "Transcoding %s from %s to gzip." % (names[0], filename)
                 print msg
                 MSG_BODY += '%s\n' % msg
-
-                gzipCompressFile(hourlyName)
+                retriever.downloader.zipMemberToGzip(
+                    filename, names[0], hourlyGzName,
+                    compressLevel = COMMAND_LINE_ARGS.compresslevel,
+                    stationIDs = COMMAND_LINE_ARGS.wban)
             else:
                 msg = "Hourly file not found."
                 print msg
@@ -169,21 +182,6 @@ def unzipWorker(filename, forceDownload = False):
             MSG_BODY += '%s\n' % msg
 
 
-def gzipCompressFile(filename):
-    """
-    Perform gzip compression on a given file.
-
-    :param filename
-    """
-
-    # @todo Move to external module.
-    f_in = open(filename, 'rb')
-    f_out = gzip.open(filename + ".gz", 'wb')
-    f_out.writelines(f_in)
-    f_out.close()
-    f_in.close()
-
-
 def unzipFile(filename, forceDownload = False):
     """
     Unzip a given file.
@@ -223,30 +221,29 @@ def performDownloading(filename, forceDownload = False):
         print msg
         MSG_BODY += '%s\n' % msg
 
+    downloaded = False
     if not fileExists(filename) or forceDownload:
         msg = "Performing download on " + filename
         print msg
         MSG_BODY += '%s\n' % msg
 
-        fp = open(weatherDataPath + "/" + filename, "wb")
-        curl = pycurl.Curl()
-        curl.setopt(pycurl.URL, weatherDataURL + "/" + filename)
-        curl.setopt(pycurl.WRITEDATA, fp)
         try:
-            curl.perform()
-        except pycurl.error, e:
-            errorCode, errorText = e.args
-            msg = 'Error during retrieval: code: %s, text: %s.' % (
-                errorCode, errorText)
+            downloaded = retriever.downloader.download(
+                weatherDataURL + "/" + filename, filename)
+        except (urllib2.URLError, IOError) as detail:
+            msg = 'Error during retrieval: %s.' % detail
             logger.log(msg)
             MSG_BODY += '%s\n' % msg
 
             success = False
-        curl.close()
-        fp.close()
 
-    if fileExists(filename) or forceDownload:
-        unzipFile(filename, forceDownload)
+        if not downloaded and success:
+            msg = "%s is unchanged." % filename
+            print msg
+            MSG_BODY += '%s\n' % msg
+
+    if fileExists(filename):
+        unzipFile(filename, downloaded)
 
     global downloadCount
     downloadCount += 1
@@ -262,24 +259,6 @@ def performDownloadingWithForcedDownload(filename):
 # Downloader is going to get Sep, but not the rest of Aug.
 # To get the remainder of Aug, force download on Aug.
 
-def cleanUpTxtFiles():
-    """
-    Clean up unused txt files by deleting them from local storage.
-    """
-
-    global MSG_BODY
-    patterns = ['*hourly.txt', '*daily.txt', '*monthly.txt', '*precip.txt',
-                '*remarks.txt', '*station.txt']
-    for root, dirs, filenames in os.walk(
-            configer.configOptionValue('Weather Data', 'weather_data_path')):
-        for pat in patterns:
-            for filename in fnmatch.filter(filenames, pat):
-                os.remove(filename)
-                msg = "Removed %s." % filename
-                print msg
-                MSG_BODY += '%s\n' % msg
-
-
 def saveRetrievalResults():
     """
     Save retrieval results stored in a global string.
@@ -294,6 +273,8 @@ def saveRetrievalResults():
 
 if __name__ == '__main__':
 
+    processCommandLineArguments()
+
     dbConnector = MSGDBConnector()
     cursor = dbConnector.conn.cursor()
     weatherUtil = MSGWeatherDataUtil()
@@ -341,7 +322,7 @@ if __name__ == '__main__':
         print msg
         MSG_BODY += '%s\n' % msg
 
-        retriever.pool = multiprocessing.Pool(int(multiprocessingLimit))
+        retriever.pool = ThreadPool(int(multiprocessingLimit))
         results = retriever.pool.map(performDownloading, retriever.fileList)
         retriever.pool.close()
         retriever.pool.join()
@@ -363,7 +344,7 @@ if __name__ == '__main__':
         print msg
         MSG_BODY += '%s\n' % msg
 
-        retriever.pool = multiprocessing.Pool(int(multiprocessingLimit))
+        retriever.pool = ThreadPool(int(multiprocessingLimit))
         results = retriever.pool.map(performDownloadingWithForcedDownload,
                                      keepList)
         retriever.pool.close()
@@ -384,5 +365,4 @@ if __name__ == '__main__':
     print msg
     MSG_BODY += '%s\n' % msg
 
-    cleanUpTxtFiles()
     saveRetrievalResults()
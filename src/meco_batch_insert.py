@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+from meco_db_insert import MECODBInserter
+from meco_mapper import MECOMapper
+from msg_db_util import MSGDBUtil
+from sek.logger import SEKLogger
+
+
+class MECOBatchInserter(object):
+    """
+    Buffer parsed MECO rows and insert them with one multi-row INSERT per
+    table.
+
+    Rows are given placeholder primary keys when they are added. On flush,
+    the real primary keys for every buffered row of a table are allocated in
+    a single round-trip and foreign keys are resolved client-side before the
+    rows are inserted. Tables are inserted in the order they were first
+    encountered, which places parent tables before their children.
+
+    Usage:
+
+        batcher = MECOBatchInserter()
+        meterDataKey = batcher.addRow('MeterData', columnsAndValues)
+        batcher.addRow('IntervalReadData', columnsAndValues, meterDataKey)
+        batcher.flush(conn)
+        meterDataID = batcher.primaryKeyFor(meterDataKey)
+
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        self.logger = SEKLogger(__name__, 'info')
+        self.mapper = MECOMapper()
+        self.dbUtil = MSGDBUtil()
+        self.inserter = MECODBInserter()
+
+        # Buffered rows keyed by table name. Each row is a list of
+        # [foreign key value, columnsAndValues].
+        self.rows = {}
+        self.tableOrder = []
+
+        # Keys, such as dupe check keys, of rows that are buffered but not
+        # yet in the database.
+        self.pendingKeys = set()
+
+        # Primary keys allocated by the last flush keyed by table name.
+        self.allocatedIDs = {}
+
+    def addRow(self, tableName, columnsAndValues, fKeyVal = None,
+               pendingKey = None):
+        """
+        Buffer a row to be inserted on the next flush.
+
+        :param tableName: name of the db table
+        :param columnsAndValues: dictionary of columns and values to be
+        inserted to the db
+        :param fKeyVal: (optional) A foreign key value that is either an
+        existing primary key or a placeholder returned by this method.
+        :param pendingKey: (optional) A hashable key that identifies the row
+        until it has been flushed.
+        :returns: A placeholder for the row's primary key as a tuple of
+        (table name, row index).
+        """
+
+        if tableName not in self.rows:
+            self.rows[tableName] = []
+            self.tableOrder.append(tableName)
+
+        self.rows[tableName].append([fKeyVal, columnsAndValues])
+
+        if pendingKey is not None:
+            self.pendingKeys.add(pendingKey)
+
+        return (tableName, len(self.rows[tableName]) - 1)
+
+    def hasPendingKey(self, pendingKey):
+        """
+        :param pendingKey: A key given to addRow.
+        :returns: True if a row with the key is buffered, otherwise False.
+        """
+
+        return pendingKey in self.pendingKeys
+
+    def rowCount(self):
+        """
+        :returns: Number of buffered rows.
+        """
+
+        return sum(len(rows) for rows in self.rows.values())
+
+    def primaryKeyFor(self, keyVal):
+        """
+        Resolve a placeholder to the primary key allocated for it by the last
+        flush. Values that are not placeholders are returned unchanged.
+
+        :param keyVal: A primary key value or a placeholder.
+        :returns: The primary key value.
+        """
+
+        if isinstance(keyVal, tuple):
+            tableName, index = keyVal
+            return self.allocatedIDs[tableName][index]
+        return keyVal
+
+    def flush(self, conn):
+        """
+        Insert all buffered rows without committing.
+
+        :param conn: DB connection
+        :returns: Number of rows inserted.
+        """
+
+        if not self.tableOrder:
+            return 0
+
+        self.allocatedIDs = {}
+        for tableName in self.tableOrder:
+            pkeyCol = self.mapper.dbColumnsForTable(tableName)['_pkey']
+            self.allocatedIDs[tableName] = self.dbUtil.getNextSequenceIDs(
+                conn, tableName, pkeyCol, len(self.rows[tableName]))
+
+        rowCount = 0
+        for tableName in self.tableOrder:
+            ids = self.allocatedIDs[tableName]
+            self.inserter.insertDataRows(conn, tableName, [
+                (ids[i], self.primaryKeyFor(fKeyVal), columnsAndValues) for
+                i, (fKeyVal, columnsAndValues) in
+                enumerate(self.rows[tableName])], withoutCommit = 1)
+            rowCount += len(ids)
+
+        self.logger.log('Flushed {} rows.'.format(rowCount), 'debug')
+
+        self.rows = {}
+        self.tableOrder = []
+        self.pendingKeys = set()
+        return rowCount
@@ -130,3 +130,67 @@ class MECODBInserter(object):
 
         return cur
 
+    def insertDataRows(self, conn, tableName, rows, withoutCommit = 0):
+        """
+        Insert multiple rows to a table with a single multi-row INSERT.
+
+        Unlike insertData, primary keys are given explicitly instead of being
+        taken from the sequence default.
+
+        :param conn: database connection
+        :param tableName: name of the db table
+        :param rows: list of (primary key value, foreign key value,
+        columnsAndValues) tuples where columnsAndValues is a dictionary of
+        source data columns and values
+        :param (optional) withoutCommit: a flag indicated that the insert
+        will not be immediately committed
+        :returns: A database cursor.
+        """
+
+        cur = conn.cursor()
+
+        if not rows:
+            return cur
+
+        # Get a dictionary of mapped (from DB to source data) column names.
+        columnDict = self.mapper.getDBColNameDict(tableName)
+        sourceCols = sorted(columnDict.keys())
+
+        cols = [columnDict[col] for col in sourceCols]
+        template = ','.join(['%s'] * len(cols))
+
+        # Add a creation timestamp to MeterData.
+        if tableName == 'MeterData':
+            cols.append('created')
+            template += ',NOW()'
+
+        values = []
+        for pkeyVal, fKeyVal, columnsAndValues in rows:
+            rowVals = []
+            for col in sourceCols:
+                if col == '_pkey':
+                    rowVals.append(pkeyVal)
+                elif col == '_fkey':
+                    rowVals.append(fKeyVal)
+
+                # The Register and Reading tables need to handle NULL
+                # values as a special case.
+                elif tableName == 'Register' or tableName == 'Reading':
+                    rowVals.append(columnsAndValues.get(col))
+                else:
+                    rowVals.append(columnsAndValues[col])
+            values.append(cur.mogrify('(%s)' % template, rowVals))
+
+        sql = """INSERT INTO "%s" (%s) VALUES %s""" % (
+            tableName, ','.join(cols), ','.join(values))
+
+        self.dbUtil.executeSQL(cur, sql)
+
+        if withoutCommit == 0:
+            try:
+                conn.commit()
+            except:
+                self.logger.log("ERROR: Commit failed.", 'debug')
+
+        return cur
+
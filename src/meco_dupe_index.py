@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from msg_db_util import MSGDBUtil
+from sek.logger import SEKLogger
+
+
+class MECODupeIndex(object):
+    """
+    In-memory index of the duplicate check keys that exist in the database
+    for the meters and time range covered by a MECO data file.
+
+    The index is loaded with one range query per data branch so that
+    duplicate checks during parsing are set membership tests instead of
+    joins against the database. The keys are
+
+        Reading: (meter name, interval end time, channel)
+        Register: (meter name, register read time, register number)
+        Event: (meter name, event time)
+
+    Rows inserted while parsing must be added to the index so that
+    duplicates within the same file continue to be detected.
+
+    Usage:
+
+        dupeIndex = MECODupeIndex()
+        dupeIndex.load(conn, fileObject)
+        dupeIndex.readingDupeExists(meterName, endTime, channel)
+
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        self.logger = SEKLogger(__name__, 'info')
+        self.dbUtil = MSGDBUtil()
+
+        # Reading keys map to reading IDs to support verification of values.
+        self.readingIDs = {}
+        self.registerKeys = set()
+        self.eventKeys = set()
+
+        # The reading ID of the last reading dupe found.
+        self.currentReadingID = 0
+
+        self.timePattern = re.compile(
+            '(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(\.\d+)?')
+
+    def timestampKey(self, timeString):
+        """
+        Convert a source data timestamp to the value stored in the database.
+
+        Database columns are timestamps without time zone so the UTC offset
+        is discarded.
+
+        :param timeString: String like 2013-04-08T00:15:00.000-10:00.
+        :returns: datetime or None if the string is not a timestamp.
+        """
+
+        if timeString is None:
+            return None
+
+        match = self.timePattern.match(timeString)
+        if match is None:
+            return None
+
+        microseconds = 0
+        if match.group(3):
+            microseconds = int(round(float(match.group(3)) * 1000000))
+
+        return datetime.strptime(
+            '%s %s' % (match.group(1), match.group(2)),
+            '%Y-%m-%d %H:%M:%S').replace(microsecond = microseconds)
+
+    def meterNameKey(self, meterName):
+        """
+        :param meterName: String of meter name. Database values are padded.
+        :returns: String of meter name without padding.
+        """
+
+        return meterName.strip()
+
+    def scanFile(self, fileObject):
+        """
+        Determine the meters and the time range for each branch in a file.
+
+        The file object is rewound after the scan.
+
+        :param fileObject: a file object referencing an XML file.
+        :returns: Tuple of (set of meter names, dict of (min, max) datetimes
+        keyed by 'Interval', 'RegisterRead' and 'Event').
+        """
+
+        timeAttributes = {'Interval': 'EndTime', 'RegisterRead': 'ReadTime',
+                          'Event': 'EventTime'}
+        meterNames = set()
+        ranges = {}
+
+        context = ET.iterparse(fileObject, events = ('start', 'end'))
+        for event, element in context:
+            name = element.tag.split('}')[-1]
+            if event == 'end':
+                if name == 'MeterData':
+                    element.clear()
+                continue
+
+            if name == 'MeterData':
+                meterNames.add(
+                    self.meterNameKey(element.attrib.get('MeterName', '')))
+            elif name in timeAttributes:
+                timestamp = self.timestampKey(
+                    element.attrib.get(timeAttributes[name]))
+                if timestamp is None:
+                    continue
+                if name not in ranges:
+                    ranges[name] = (timestamp, timestamp)
+                else:
+                    ranges[name] = (min(ranges[name][0], timestamp),
+                                    max(ranges[name][1], timestamp))
+
+        fileObject.seek(0)
+        return meterNames, ranges
+
+    def load(self, conn, fileObject):
+        """
+        Load the index for the data contained in a file.
+
+        :param conn: Database connection.
+        :param fileObject: a file object referencing an XML file.
+        """
+
+        self.readingIDs = {}
+        self.registerKeys = set()
+        self.eventKeys = set()
+
+        meterNames, ranges = self.scanFile(fileObject)
+        if not meterNames:
+            return
+
+        meterNames = sorted(meterNames)
+        dbCursor = conn.cursor()
+
+        if 'Interval' in ranges:
+            sql = dbCursor.mogrify("""SELECT "MeterData".meter_name,
+                                             "Interval".end_time,
+                                             "Reading".channel,
+                                             "Reading".reading_id
+                     FROM "MeterData"
+                     INNER JOIN "IntervalReadData" ON "MeterData"
+                     .meter_data_id = "IntervalReadData".meter_data_id
+                     INNER JOIN "Interval" ON "IntervalReadData"
+                     .interval_read_data_id = "Interval".interval_read_data_id
+                     INNER JOIN "Reading" ON "Interval".interval_id = "Reading"
+                     .interval_id
+                     WHERE "Interval".end_time BETWEEN %s AND %s
+                     AND "MeterData".meter_name = ANY(%s)""", (
+                ranges['Interval'][0], ranges['Interval'][1], meterNames))
+            self.dbUtil.executeSQL(dbCursor, sql)
+            for row in dbCursor.fetchall():
+                self.readingIDs[(self.meterNameKey(row[0]), row[1],
+                                 int(row[2]))] = row[3]
+
+        if 'RegisterRead' in ranges:
+            sql = dbCursor.mogrify("""SELECT "MeterData".meter_name,
+                                             "RegisterRead".read_time,
+                                             "Register"."number"
+                     FROM "MeterData"
+                     INNER JOIN "RegisterData" ON "MeterData".meter_data_id =
+                     "RegisterData".meter_data_id
+                     INNER JOIN "RegisterRead" ON "RegisterData"
+                     .register_data_id = "RegisterRead".register_data_id
+                     INNER JOIN "Tier" ON "RegisterRead".register_read_id =
+                     "Tier".register_read_id
+                     INNER JOIN "Register" ON "Tier".tier_id = "Register"
+                     .tier_id
+                     WHERE "RegisterRead".read_time BETWEEN %s AND %s
+                     AND "MeterData".meter_name = ANY(%s)""", (
+                ranges['RegisterRead'][0], ranges['RegisterRead'][1],
+                meterNames))
+            self.dbUtil.executeSQL(dbCursor, sql)
+            for row in dbCursor.fetchall():
+                self.registerKeys.add(
+                    (self.meterNameKey(row[0]), row[1], int(row[2])))
+
+        if 'Event' in ranges:
+            sql = dbCursor.mogrify("""SELECT "MeterData".meter_name,
+                                             "Event".event_time
+                     FROM "MeterData"
+                     INNER JOIN "EventData" ON "MeterData".meter_data_id =
+                     "EventData".meter_data_id
+                     INNER JOIN "Event" ON "EventData".event_data_id =
+                     "Event".event_data_id
+                     WHERE "Event".event_time BETWEEN %s AND %s
+                     AND "MeterData".meter_name = ANY(%s)""", (
+                ranges['Event'][0], ranges['Event'][1], meterNames))
+            self.dbUtil.executeSQL(dbCursor, sql)
+            for row in dbCursor.fetchall():
+                self.eventKeys.add((self.meterNameKey(row[0]), row[1]))
+
+        self.logger.log(
+            'Loaded dupe index with {} readings, {} registers and {} events '
+            'for {} meters.'.format(len(self.readingIDs), len(self.registerKeys),
+                                    len(self.eventKeys), len(meterNames)),
+            'info')
+
+    def readingKey(self, meterName, endTime, channel):
+        return (self.meterNameKey(meterName), self.timestampKey(endTime),
+                int(channel))
+
+    def registerKey(self, meterName, readTime, registerNumber):
+        return (self.meterNameKey(meterName), self.timestampKey(readTime),
+                int(registerNumber))
+
+    def eventKey(self, meterName, eventTime):
+        return (self.meterNameKey(meterName), self.timestampKey(eventTime))
+
+    def readingDupeExists(self, meterName, endTime, channel):
+        """
+        Determine if a reading branch duplicate exists. When one does,
+        currentReadingID is set to the ID of the existing reading.
+
+        :param meterName: Meter name in MeterData table.
+        :param endTime: End time in Interval table.
+        :param channel: Channel in Reading table.
+        :returns: True if tuple exists, False if not.
+        """
+
+        readingID = self.readingIDs.get(
+            self.readingKey(meterName, endTime, channel))
+        if readingID is None:
+            return False
+
+        self.currentReadingID = readingID
+        return True
+
+    def registerDupeExists(self, meterName, readTime, registerNumber):
+        """
+        :param meterName: Meter name in MeterData table.
+        :param readTime: Read time in RegisterRead table.
+        :param registerNumber: Corresponds to DB column "number".
+        :returns: True if tuple exists, False if not.
+        """
+
+        return self.registerKey(meterName, readTime,
+                                registerNumber) in self.registerKeys
+
+    def eventDupeExists(self, meterName, eventTime):
+        """
+        :param meterName: Meter name in MeterData table.
+        :param eventTime: Timestamp of event.
+        :returns: True if tuple exists, False if not.
+        """
+
+        return self.eventKey(meterName, eventTime) in self.eventKeys
+
+    def addReading(self, meterName, endTime, channel, readingID):
+        """
+        Add an inserted reading to the index.
+
+        :param readingID: The reading ID or a placeholder that is resolved
+        with resolveReadingIDs.
+        """
+
+        self.readingIDs[
+            self.readingKey(meterName, endTime, channel)] = readingID
+
+    def addRegister(self, meterName, readTime, registerNumber):
+        self.registerKeys.add(
+            self.registerKey(meterName, readTime, registerNumber))
+
+    def addEvent(self, meterName, eventTime):
+        self.eventKeys.add(self.eventKey(meterName, eventTime))
+
+    def resolveReadingIDs(self, resolver, keys):
+        """
+        Replace placeholder reading IDs with allocated reading IDs.
+
+        :param resolver: Callable mapping a placeholder to a reading ID.
+        :param keys: Iterable of (meter name, end time, channel) tuples in
+        source data form.
+        """
+
+        for meterName, endTime, channel in keys:
+            key = self.readingKey(meterName, endTime, channel)
+            self.readingIDs[key] = resolver(self.readingIDs[key])
@@ -18,6 +18,8 @@ from meco_fk import MECOFKDeterminer
 import sys
 from itertools import tee, islice, izip_longest
 from meco_dupe_check import MECODupeChecker
+from meco_batch_insert import MECOBatchInserter
+from meco_dupe_index import MECODupeIndex
 from sek.logger import SEKLogger
 
 
@@ -53,7 +55,9 @@ class MECOXMLParser(object):
         self.fileObject = None
         self.processForInsertElementCount = 0
         self.inserter = MECODBInserter()
+        self.batchInserter = MECOBatchInserter()
         self.insertDataIntoDatabase = False
+        self.batchInsert = False
 
         # Count number of times sections in source data are encountered.
         self.tableNameCount = {'SSNExportDocument': 0, 'MeterData': 0,
@@ -77,6 +81,9 @@ class MECOXMLParser(object):
         self.lastTable = None
         self.fkDeterminer = MECOFKDeterminer()
         self.dupeChecker = MECODupeChecker()
+        self.dupeIndex = MECODupeIndex()
+        self.indexDupes = False
+        self.unresolvedReadingKeys = []
         self.currentMeterName = None
         self.currentIntervalEndTime = None
         self.currentRegisterReadReadTime = None
@@ -106,7 +113,8 @@ class MECOXMLParser(object):
         self.totalEventDupeOnInsertCount = 0
 
 
-    def parseXML(self, fileObject, insert = False, jobID = ''):
+    def parseXML(self, fileObject, insert = False, jobID = '',
+                 streaming = False, batch = False, indexDupes = False):
         """
         Parse an XML file.
 
@@ -114,6 +122,17 @@ class MECOXMLParser(object):
         :param insert: (optional) True to insert to the database | False to
         perform no
         inserts.
+        :param jobID: (optional) Identifier for multiprocessing process.
+        :param streaming: (optional) True to parse incrementally so that only
+        one MeterData block is held in memory at a time | False to build the
+        full tree before walking it.
+        :param batch: (optional) True to buffer rows and insert them with one
+        multi-row INSERT per table for each MeterData block | False to insert
+        each row individually.
+        :param indexDupes: (optional) True to perform dupe checks against an
+        index loaded for the meters and time range of the file | False to
+        query the database for every dupe check. The file object must support
+        seeking.
         :returns: String containing a concise log of parsing.
         """
 
@@ -121,15 +140,25 @@ class MECOXMLParser(object):
 
         self.commitCount = 0
         self.insertDataIntoDatabase = insert
+        self.batchInsert = batch
+        self.indexDupes = indexDupes and insert
+        self.unresolvedReadingKeys = []
 
         parseMsg = "\nParsing XML in %s.\n" % self.filename
         sys.stderr.write(parseMsg)
         parseLog = parseMsg
 
-        tree = ET.parse(fileObject)
-        root = tree.getroot()
+        if self.indexDupes:
+            self.dupeIndex.load(self.conn, fileObject)
 
-        parseLog += self.walkTheTreeFromRoot(root, jobID = jobID)
+        if streaming:
+            parseLog += self.walkElements(self.iterElementsWithNext(fileObject),
+                                          jobID = jobID)
+        else:
+            tree = ET.parse(fileObject)
+            root = tree.getroot()
+
+            parseLog += self.walkTheTreeFromRoot(root, jobID = jobID)
 
         return parseLog
 
@@ -168,23 +197,54 @@ class MECOXMLParser(object):
 
         self.dataProcessCount += 1
 
+        pendingKey = None
+        if self.batchInsert:
+            # Buffered rows are not visible to the dupe checker so they are
+            # inserted first when they would collide with the current row.
+            pendingKey = self.pendingKeyForElement(columnsAndValues,
+                                                   currentTableName)
+            if currentTableName == "MeterData" or \
+                    self.batchInserter.hasPendingKey(pendingKey):
+                self.flushBatch()
+
         # Handle a special case for duplicate reading data.
         # Intercept the duplicate reading data before insert.
         if currentTableName == "Reading":
-            self.channelDupeExists = self.dupeChecker.readingBranchDupeExists(
-                self.conn, self.currentMeterName, self.currentIntervalEndTime,
-                columnsAndValues['Channel'])
+            if self.indexDupes:
+                self.channelDupeExists = self.dupeIndex.readingDupeExists(
+                    self.currentMeterName, self.currentIntervalEndTime,
+                    columnsAndValues['Channel'])
+                if self.channelDupeExists:
+                    # Used when verifying the values of the dupe.
+                    self.dupeChecker.currentReadingID = self.dupeIndex\
+                        .currentReadingID
+            else:
+                self.channelDupeExists = self.dupeChecker\
+                    .readingBranchDupeExists(self.conn, self.currentMeterName,
+                                             self.currentIntervalEndTime,
+                                             columnsAndValues['Channel'])
             self.readingDupeCheckCount += 1
 
         if currentTableName == "Register":
-            self.numberDupeExists = self.dupeChecker.registerBranchDupeExists(
-                self.conn, self.currentMeterName,
-                self.currentRegisterReadReadTime, columnsAndValues['Number'])
+            if self.indexDupes:
+                self.numberDupeExists = self.dupeIndex.registerDupeExists(
+                    self.currentMeterName, self.currentRegisterReadReadTime,
+                    columnsAndValues['Number'])
+            else:
+                self.numberDupeExists = self.dupeChecker\
+                    .registerBranchDupeExists(self.conn, self.currentMeterName,
+                                              self.currentRegisterReadReadTime,
+                                              columnsAndValues['Number'])
             self.registerDupeCheckCount += 1
 
         if currentTableName == "Event":
-            self.eventTimeDupeExists = self.dupeChecker.eventBranchDupeExists(
-                self.conn, self.currentMeterName, columnsAndValues['EventTime'])
+            if self.indexDupes:
+                self.eventTimeDupeExists = self.dupeIndex.eventDupeExists(
+                    self.currentMeterName, columnsAndValues['EventTime'])
+            else:
+                self.eventTimeDupeExists = self.dupeChecker\
+                    .eventBranchDupeExists(self.conn, self.currentMeterName,
+                                           columnsAndValues['EventTime'])
             self.eventDupeCheckCount += 1
 
         # Only perform an insert if there are no duplicate values
@@ -195,19 +255,31 @@ class MECOXMLParser(object):
             # ***********************
             # ***** INSERT DATA *****
             # ***********************
-            cur = self.inserter.insertData(self.conn, currentTableName,
-                                           columnsAndValues,
-                                           fKeyVal = fKeyValue,
-                                           withoutCommit = 1)
-            # The last 1 indicates don't commit. Commits are handled externally.
+            if self.batchInsert:
+                # The primary key is a placeholder until the batch is flushed.
+                self.lastSeqVal = self.batchInserter.addRow(currentTableName,
+                                                            columnsAndValues,
+                                                            fKeyValue,
+                                                            pendingKey)
+            else:
+                cur = self.inserter.insertData(self.conn, currentTableName,
+                                               columnsAndValues,
+                                               fKeyVal = fKeyValue,
+                                               withoutCommit = 1)
+                # The last 1 indicates don't commit. Commits are handled
+                # externally.
+
+                # Only attempt getting the last sequence value if an insertion
+                # took place.
+                self.lastSeqVal = self.util.getLastSequenceID(self.conn,
+                                                              currentTableName,
+                                                              pkeyCol)
             self.insertCount += 1
             self.cumulativeInsertCount += 1
 
-            # Only attempt getting the last sequence value if an insertion
-            # took place.
-            self.lastSeqVal = self.util.getLastSequenceID(self.conn,
-                                                          currentTableName,
-                                                          pkeyCol)
+            if self.indexDupes:
+                self.addToDupeIndex(columnsAndValues, currentTableName)
+
             # Store the primary key.
             self.fkDeterminer.pkValforCol[pkeyCol] = self.lastSeqVal
 
@@ -275,6 +347,73 @@ class MECOXMLParser(object):
 
         return parseLog
 
+    def pendingKeyForElement(self, columnsAndValues, currentTableName):
+        """
+        Get the key used to detect a collision between the current element
+        and rows buffered for batch insertion. The keys correspond to the
+        duplicate checks for the Reading, Register and Event branches.
+
+        :param columnsAndValues: A dictionary containing columns and their
+        values.
+        :param currentTableName: The name of the current table.
+        :returns: A tuple or None if the table is not dupe checked.
+        """
+
+        if currentTableName == "Reading":
+            return (currentTableName, self.currentMeterName,
+                    self.currentIntervalEndTime, columnsAndValues['Channel'])
+        elif currentTableName == "Register":
+            return (currentTableName, self.currentMeterName,
+                    self.currentRegisterReadReadTime,
+                    columnsAndValues['Number'])
+        elif currentTableName == "Event":
+            return (currentTableName, self.currentMeterName,
+                    columnsAndValues['EventTime'])
+        return None
+
+    def addToDupeIndex(self, columnsAndValues, currentTableName):
+        """
+        Add the keys of an inserted element to the dupe index so that dupes
+        within the same file are detected.
+
+        :param columnsAndValues: A dictionary containing columns and their
+        values.
+        :param currentTableName: The name of the current table.
+        """
+
+        if currentTableName == "Reading":
+            self.dupeIndex.addReading(self.currentMeterName,
+                                      self.currentIntervalEndTime,
+                                      columnsAndValues['Channel'],
+                                      self.lastSeqVal)
+            if self.batchInsert:
+                self.unresolvedReadingKeys.append((self.currentMeterName,
+                                                   self.currentIntervalEndTime,
+                                                   columnsAndValues['Channel']))
+        elif currentTableName == "Register":
+            self.dupeIndex.addRegister(self.currentMeterName,
+                                       self.currentRegisterReadReadTime,
+                                       columnsAndValues['Number'])
+        elif currentTableName == "Event":
+            self.dupeIndex.addEvent(self.currentMeterName,
+                                    columnsAndValues['EventTime'])
+
+    def flushBatch(self):
+        """
+        Insert rows buffered for batch insertion and replace the placeholder
+        primary keys held for foreign keys with the allocated values.
+        """
+
+        if self.batchInserter.flush(self.conn) > 0:
+            for col in self.fkDeterminer.pkValforCol.keys():
+                self.fkDeterminer.pkValforCol[
+                    col] = self.batchInserter.primaryKeyFor(
+                    self.fkDeterminer.pkValforCol[col])
+            self.lastSeqVal = self.batchInserter.primaryKeyFor(self.lastSeqVal)
+            self.dupeIndex.resolveReadingIDs(self.batchInserter.primaryKeyFor,
+                                             self.unresolvedReadingKeys)
+        self.unresolvedReadingKeys = []
+
     def generateConciseLogEntries(self, jobID = '', reportType = None):
         """
         Create log entries in the concise log.
@@ -370,10 +509,22 @@ class MECOXMLParser(object):
         :returns: String containing a concise log of parsing activity.
         """
 
+        return self.walkElements(self.getNext(root.iter()), jobID = jobID)
+
+
+    def walkElements(self, elementPairs, jobID = ''):
+        """
+        Walk elements in document order while looking ahead one element.
+
+        :param elementPairs: Iterable of (element, next element) tuples where
+        the next element is None for the last element.
+        :param jobID: Identifier used to distinguish multiprocessing jobs.
+        :returns: String containing a concise log of parsing activity.
+        """
+
         parseLog = ''
-        walker = root.iter()
 
-        for element, nextElement in self.getNext(walker):
+        for element, nextElement in elementPairs:
             # Process every element in the tree while reading ahead to get
             # the next element.
 
@@ -457,6 +608,8 @@ class MECOXMLParser(object):
 
                     parseLog += self.logger.logAndWrite("*")
                     self.commitCount += 1
+                    if self.batchInsert:
+                        self.flushBatch()
                     self.conn.commit()
 
                 if self.lastRegister(currentTableName, nextTableName):
@@ -482,6 +635,8 @@ class MECOXMLParser(object):
 
         parseLog += self.logger.logAndWrite("*")
         self.commitCount += 1
+        if self.batchInsert:
+            self.flushBatch()
         self.conn.commit()
         sys.stderr.write("\n")
 
@@ -539,6 +694,43 @@ class MECOXMLParser(object):
         return izip_longest(items, nexts)
 
 
+    def iterElementsWithNext(self, fileObject):
+        """
+        Incrementally parse an XML file and return each element with the
+        element that follows it in document order.
+
+        This produces the same sequence as getNext(root.iter()) without
+        building the full tree. An element is only returned once the start of
+        the following element has been parsed so that its text is complete.
+        MeterData elements are cleared, and detached from the root, after their
+        last descendant has been returned.
+
+        :param fileObject: a file object referencing an XML file.
+        :returns: Generator of (element, next element) tuples. The next
+        element is None for the last element.
+        """
+
+        context = ET.iterparse(fileObject, events = ('start', 'end'))
+        event, root = next(context)
+        pending = root
+        finished = []
+
+        for event, element in context:
+            if event == 'start':
+                yield pending, element
+                pending = element
+
+                for block in finished:
+                    block.clear()
+                    root.remove(block)
+                finished = []
+
+            elif self.tableNameForAnElement(element) == 'MeterData':
+                finished.append(element)
+
+        yield pending, None
+
+
     def initChannelProcessed(self):
         """
         Initialize the dictionary for channel processing.
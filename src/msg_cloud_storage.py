@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import datetime
+import hashlib
+import httplib
+import os
+import shutil
+import threading
+import time
+import uuid
+import httplib2
+from apiclient.discovery import build
+from apiclient.http import MediaFileUpload
+from apiclient import errors
+from sek.logger import SEKLogger
+
+# Resumable upload chunks must be a multiple of 256 KB.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class MSGCloudStorageClient(object):
+    """
+    Base class for the cloud storage clients used by MSGDBExporter.
+
+    Files are uploaded in resumable sessions. A chunk that fails with a
+    transient error is retried, with exponential backoff, from the point
+    where the session left off instead of restarting the upload.
+
+    Files are described by dicts with the keys of Google Drive file
+    resources: id, title, originalFilename, md5Checksum, fileSize,
+    createdDate and webContentLink.
+
+    Subclasses implement uploadSession, listFiles, deleteFile and addReader.
+    """
+
+    def __init__(self, chunkSize = UPLOAD_CHUNK_SIZE, retryCount = 5,
+                 retryDelay = 1):
+        """
+        Constructor.
+
+        :param chunkSize: Int size in bytes of upload chunks.
+        :param retryCount: Int number of times to retry a failed chunk.
+        :param retryDelay: Number of seconds before the first retry. The
+        delay doubles for each consecutive failure.
+        """
+
+        self.logger = SEKLogger(__name__, 'DEBUG')
+        self.chunkSize = chunkSize
+        self.retryCount = retryCount
+        self.retryDelay = retryDelay
+
+
+    def uploadSession(self, fullPath = '', body = None, mimeType = ''):
+        """
+        :param fullPath: String of the file to be uploaded.
+        :param body: dict of file metadata.
+        :param mimeType: String
+        :returns: Object with a nextChunk() method that uploads the next
+        chunk and returns the file dict when the upload is complete or None
+        otherwise, and an abort() method that discards an upload that is
+        given up.
+        """
+
+        raise NotImplementedError
+
+
+    def isTransient(self, error):
+        """
+        :param error: Exception raised while uploading a chunk.
+        :returns: True if the chunk should be retried.
+        """
+
+        return isinstance(error, (IOError, httplib.HTTPException))
+
+
+    def upload(self, fullPath = '', body = None, mimeType = ''):
+        """
+        Upload a file in a resumable session.
+
+        :param fullPath: String of the file to be uploaded.
+        :param body: dict of file metadata.
+        :param mimeType: String
+        :returns: dict of the uploaded file.
+        :raises: The last exception when a chunk cannot be uploaded. The
+        session is aborted first.
+        """
+
+        session = self.uploadSession(fullPath, body, mimeType)
+        failures = 0
+        while True:
+            try:
+                response = session.nextChunk()
+            except Exception as detail:
+                if not self.isTransient(detail) or failures >= self.retryCount:
+                    session.abort()
+                    raise
+                failures += 1
+                delay = self.retryDelay * 2 ** (failures - 1)
+                self.logger.log(
+                    'Retrying chunk of {} in {} s after: {}'.format(
+                        os.path.basename(fullPath), delay, detail), 'warning')
+                time.sleep(delay)
+                continue
+            failures = 0
+            if response is not None:
+                return response
+
+
+    def listFiles(self):
+        """
+        :returns: List of file dicts.
+        """
+
+        raise NotImplementedError
+
+
+    def deleteFile(self, fileID = ''):
+        raise NotImplementedError
+
+
+    def addReader(self, fileID = '', emailAddress = ''):
+        raise NotImplementedError
+
+
+class MSGDriveUploadSession(object):
+    """
+    Resumable upload session to Google Drive.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+
+    def nextChunk(self):
+        # After a failure, the client library queries the upload status and
+        # resumes from the last byte received by the server.
+        status, response = self.request.next_chunk()
+        return response
+
+
+    def abort(self):
+        # Incomplete resumable uploads expire on the server.
+        pass
+
+
+class MSGDriveStorageClient(MSGCloudStorageClient):
+    """
+    Google Drive storage client.
+
+    The Drive service is built once per thread because the underlying HTTP
+    connection is not safe to share between threads.
+    """
+
+    def __init__(self, credentials = None, **kwargs):
+        """
+        Constructor.
+
+        :param credentials: Authorized Google API credentials.
+        """
+
+        super(MSGDriveStorageClient, self).__init__(**kwargs)
+        self.credentials = credentials
+        self.local = threading.local()
+
+
+    @property
+    def driveService(self):
+        if not getattr(self.local, 'driveService', None):
+            http = self.credentials.authorize(httplib2.Http())
+            self.local.driveService = build('drive', 'v2', http = http)
+        return self.local.driveService
+
+
+    def uploadSession(self, fullPath = '', body = None, mimeType = ''):
+        media_body = MediaFileUpload(fullPath, mimetype = mimeType,
+                                     chunksize = self.chunkSize,
+                                     resumable = True)
+        return MSGDriveUploadSession(
+            self.driveService.files().insert(body = body,
+                                             media_body = media_body))
+
+
+    def isTransient(self, error):
+        if isinstance(error, errors.HttpError):
+            # Rate limit errors are reported as 403 or 429.
+            return error.resp.status >= 500 or error.resp.status == 429 or (
+                error.resp.status == 403 and 'ratelimitexceeded' in str(
+                    error.content).lower())
+        return super(MSGDriveStorageClient, self).isTransient(error)
+
+
+    def listFiles(self):
+        return self.driveService.files().list().execute()['items']
+
+
+    def deleteFile(self, fileID = ''):
+        # Writing the fileId arg name is required here.
+        self.driveService.files().delete(fileId = fileID).execute()
+
+
+    def addReader(self, fileID = '', emailAddress = ''):
+        permission = {'value': emailAddress, 'type': 'user', 'role': 'reader'}
+        self.driveService.permissions().insert(fileId = fileID,
+                                               sendNotificationEmails = False,
+                                               body = permission).execute()
+
+
+class MSGLocalUploadSession(object):
+    """
+    Resumable upload session to local storage.
+    """
+
+    def __init__(self, client, fullPath, item):
+        self.client = client
+        self.fullPath = fullPath
+        self.item = item
+        self.partPath = os.path.join(client.path, '{}.part'.format(item['id']))
+        self.offset = 0
+        open(self.partPath, 'wb').close()
+
+
+    def nextChunk(self):
+        self.client.simulateFailure()
+
+        with open(self.fullPath, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(self.client.chunkSize)
+        with open(self.partPath, 'r+b') as f:
+            f.seek(self.offset)
+            f.write(data)
+        self.offset += len(data)
+
+        if len(data) == self.client.chunkSize:
+            return None
+        return self.client.finishUpload(self)
+
+
+    def abort(self):
+        if os.path.exists(self.partPath):
+            os.remove(self.partPath)
+
+
+class MSGLocalStorageClient(MSGCloudStorageClient):
+    """
+    Cloud storage client backed by a local directory.
+
+    Used to test exports without a cloud service. Transient failures can be
+    simulated for a number of chunk uploads.
+
+    Usage:
+
+        client = MSGLocalStorageClient(path, transientFailures = 2)
+        exporter = MSGDBExporter(storageClient = client)
+
+    """
+
+    def __init__(self, path = '', transientFailures = 0, **kwargs):
+        """
+        Constructor.
+
+        :param path: Directory where uploaded files are stored.
+        :param transientFailures: Int count of chunk uploads that will fail
+        with an IOError.
+        """
+
+        super(MSGLocalStorageClient, self).__init__(**kwargs)
+        self.path = path
+        self.transientFailures = transientFailures
+        self.files = {}
+        self.readers = {}
+        self.lock = threading.Lock()
+
+
+    def simulateFailure(self):
+        with self.lock:
+            if self.transientFailures <= 0:
+                return
+            self.transientFailures -= 1
+        raise IOError('Simulated transient failure.')
+
+
+    def uploadSession(self, fullPath = '', body = None, mimeType = ''):
+        item = dict(body or {})
+        item['id'] = uuid.uuid4().hex
+        item['mimeType'] = mimeType
+        item['originalFilename'] = os.path.basename(fullPath)
+        return MSGLocalUploadSession(self, fullPath, item)
+
+
+    def finishUpload(self, session):
+        storedPath = os.path.join(self.path, session.item['id'])
+        shutil.move(session.partPath, storedPath)
+
+        md5 = hashlib.md5()
+        with open(storedPath, 'rb') as f:
+            for buf in iter(lambda: f.read(self.chunkSize), b''):
+                md5.update(buf)
+
+        item = session.item
+        item['md5Checksum'] = md5.hexdigest()
+        item['fileSize'] = str(os.path.getsize(storedPath))
+        item['createdDate'] = datetime.datetime.utcnow().strftime(
+            '%Y-%m-%dT%H:%M:%S.%fZ')
+        item['webContentLink'] = 'file://{}'.format(storedPath)
+        with self.lock:
+            self.files[item['id']] = item
+        return item
+
+
+    def listFiles(self):
+        with self.lock:
+            return [dict(item) for item in self.files.values()]
+
+
+    def deleteFile(self, fileID = ''):
+        with self.lock:
+            del self.files[fileID]
+        os.remove(os.path.join(self.path, fileID))
+
+
+    def addReader(self, fileID = '', emailAddress = ''):
+        with self.lock:
+            self.readers.setdefault(fileID, set()).add(emailAddress)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import csv
+import os
+import sys
+import time
+from cStringIO import StringIO
+from sek.logger import SEKLogger
+
+# Rows sent in each COPY.
+BATCH_SIZE = 10000
+
+# Source values that are loaded as NULL.
+NULL_VALUES = frozenset(['', 'NULL'])
+
+
+class MSGCSVBulkLoader(object):
+    """
+    Load the rows of CSV files into a table with COPY FROM STDIN.
+
+    Each CSV row supplies the values of the leading columns, in order. The
+    values of any remaining columns are the same for every row of a file and
+    are given with the file.
+
+    A column can have a transform, a callable applied to each source value.
+    Values that are None or in nullValues after the transform are loaded as
+    NULL. Other values are escaped for the COPY text format, so quotes,
+    backslashes, tabs and line breaks in the data are loaded as they are.
+
+    Rows are sent in batches of batchSize rows. The rows of a load are
+    committed together after the last batch, unless commits are left to the
+    caller, so a failed load leaves none of its rows in the table.
+
+    Usage:
+
+        loader = MSGCSVBulkLoader(conn, '"MeterLocationHistory"', columns)
+        rowCount = loader.loadFile(filename)
+
+    """
+
+    def __init__(self, conn = None, table = '', columns = None,
+                 transforms = None, nullValues = NULL_VALUES, delimiter = ',',
+                 header = True, batchSize = BATCH_SIZE, exitOnFail = True):
+        """
+        Constructor.
+
+        :param conn: Database connection.
+        :param table: String of the table name, quoted as needed.
+        :param columns: List of column names.
+        :param transforms: dict of callables keyed by column name.
+        :param nullValues: Collection of values to be loaded as NULL.
+        :param delimiter: CSV delimiter.
+        :param header: True if files have a header row to be skipped.
+        :param batchSize: Int count of rows sent in each COPY.
+        :param exitOnFail: If False, a failed load returns None instead of
+        exiting.
+        """
+
+        self.logger = SEKLogger(__name__, 'info')
+        self.conn = conn
+        self.table = table
+        self.columns = list(columns or [])
+        self.transforms = transforms or {}
+        self.nullValues = frozenset(nullValues)
+        self.delimiter = delimiter
+        self.header = header
+        self.batchSize = batchSize
+        self.exitOnFail = exitOnFail
+
+
+    def copyValue(self, val):
+        """
+        :param val: A value after its transform.
+        :returns: String of the value in the COPY text format.
+        """
+
+        if val is None or val in self.nullValues:
+            return '\\N'
+        elif type(val) == type(0.0):
+            val = repr(val)
+        elif not isinstance(val, basestring):
+            val = str(val)
+        return val.replace('\\', '\\\\').replace('\t', '\\t').replace(
+            '\n', '\\n').replace('\r', '\\r')
+
+
+    def loadRows(self, rows, extraValues = None, commit = True):
+        """
+        Load rows into the table as a single transaction. If any batch fails,
+        the whole load is rolled back.
+
+        Rows are truncated, or padded with NULLs, to the count of columns
+        that precede the extra values.
+
+        :param rows: Iterable of lists of source values.
+        :param extraValues: List of the values of the last columns, for all
+        rows.
+        :param commit: If False, the load is left uncommitted.
+        :returns: Int count of rows loaded or None if the load failed and
+        exitOnFail is False.
+        """
+
+        extra = ''.join(
+            '\t' + self.copyValue(val) for val in (extraValues or []))
+        width = len(self.columns) - len(extraValues or [])
+        transforms = [self.transforms.get(col) for col in self.columns[:width]]
+        padding = [''] * width
+        sql = 'COPY {} ({}) FROM STDIN'.format(self.table,
+                                              ','.join(self.columns))
+
+        cursor = self.conn.cursor()
+        buffer = StringIO()
+        cnt = 0
+        try:
+            for row in rows:
+                if len(row) < width:
+                    row = list(row) + padding[len(row):]
+                buffer.write('\t'.join(
+                    [self.copyValue(t(val) if t else val) for val, t in
+                     zip(row, transforms)]) + extra + '\n')
+                cnt += 1
+                if cnt % self.batchSize == 0:
+                    self.__copy(cursor, sql, buffer)
+                    buffer = StringIO()
+            self.__copy(cursor, sql, buffer)
+            if commit:
+                self.conn.commit()
+        except Exception as detail:
+            self.conn.rollback()
+            self.logger.log(
+                'Bulk load to {} failed after {} rows and was rolled back: '
+                '{}.'.format(self.table, cnt, detail),
+                'error')
+            if self.exitOnFail:
+                sys.exit(-1)
+            return None
+
+        return cnt
+
+
+    def __copy(self, cursor, sql, buffer):
+        if buffer.tell():
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+
+
+    def loadFile(self, fullPath = '', extraValues = None, commit = True):
+        """
+        Load the rows of a CSV file into the table as a single transaction
+        and log the throughput.
+
+        :param fullPath: String of the path of a CSV file.
+        :param extraValues: List of the values of the last columns, for all
+        rows.
+        :param commit: If False, the load is left uncommitted.
+        :returns: Int count of rows loaded or None if the load failed and
+        exitOnFail is False.
+        """
+
+        start = time.time()
+        with open(fullPath, 'rU') as csvFile:
+            reader = csv.reader(csvFile, delimiter = self.delimiter)
+            if self.header:
+                next(reader, None)
+            cnt = self.loadRows(reader, extraValues, commit)
+
+        if cnt is not None:
+            seconds = time.time() - start
+            self.logger.log(
+                'Loaded {} rows from {} to {} in {:.1f} s ({:.0f} rows/s).'
+                .format(cnt, os.path.basename(fullPath), self.table, seconds,
+                        cnt / max(seconds, 0.001)), 'info')
+        return cnt
@@ -14,14 +14,19 @@ from msg_notifier import MSGNotifier
 from msg_configer import MSGConfiger
 from msg_math_util import MSGMathUtil
 from msg_aggregated_data import MSGAggregatedData
+from msg_types import MSGAggregationEngines
 from datetime import datetime
-import copy
 from msg_time_util import MSGTimeUtil
 from itertools import groupby
+from cStringIO import StringIO
 from dateutil.relativedelta import relativedelta
+import numpy as np
 
 MINUTE_POSITION = 4  # In a time tuple.
 INTERVAL_DURATION = 15
+RAW_DATA_ITERSIZE = 10000  # Rows per fetch when streaming raw data.
+WATERMARK_TABLE = 'AggregationWatermarks'
+FIRST_ENDPOINT = '-infinity'  # Lower bound when nothing has been aggregated.
 
 
 class MSGDataAggregator(object):
@@ -51,6 +56,11 @@ class MSGDataAggregator(object):
     range. The timestamps for aggregation intervals are the last timestamp in a
     respective series.
 
+    Alternatively, the SQL engine, selected per data type, performs the
+    bucketing and averaging within the database and inserts the result
+    directly to the aggregated data table. The NumPy engine performs the
+    same aggregation as the Python engine using array operations.
+
     * Aggregation subkeys are values such as eGauge IDs or circuit numbers.
 
     Aggregation is being implemented externally for performance and flexibility
@@ -72,12 +82,22 @@ class MSGDataAggregator(object):
     """
 
     def __init__(self, exitOnError = True, commitOnEveryInsert = False,
-                 testing = False):
+                 testing = False, engines = None,
+                 itersize = RAW_DATA_ITERSIZE, bulkInsert = False,
+                 upsert = False):
         """
         Constructor.
 
         :param testing: if True, the testing DB will be connected instead of
         the production DB.
+        :param engines: dict of {dataType: MSGAggregationEngines} for data
+        types that are not aggregated with the default Python engine.
+        :param itersize: number of rows fetched at a time when raw data is
+        streamed.
+        :param bulkInsert: if True, aggregated data is inserted with COPY
+        instead of one INSERT per row.
+        :param upsert: if True, bulk inserted data replaces existing
+        aggregated data for the same intervals.
         """
 
         self.logger = SEKLogger(__name__, 'info')
@@ -92,6 +112,10 @@ class MSGDataAggregator(object):
         self.nextMinuteCrossingWithoutSubkeys = None
         self.exitOnError = exitOnError
         self.commitOnEveryInsert = commitOnEveryInsert
+        self.engines = engines if engines else {}
+        self.itersize = itersize
+        self.bulkInsert = bulkInsert
+        self.upsert = upsert
         section = 'Aggregation'
         tableList = ['irradiance', 'agg_irradiance', 'weather', 'agg_weather',
                      'circuit', 'agg_circuit', 'egauge', 'agg_egauge']
@@ -152,13 +176,121 @@ class MSGDataAggregator(object):
         """
         Last aggregation endpoint for a given datatype.
 
+        This is the latest watermark of the data type's subkeys.
+
         :param dataType:
         :param timeColumnName:
-        :return:
+        :return: datetime or None if nothing has been aggregated.
+        """
+
+        watermarks = self.aggregationWatermarks(aggDataType = aggDataType,
+                                                timeColumnName = timeColumnName)
+        return max(watermarks.values()) if watermarks else None
+
+
+    def aggregationKeyColumns(self, aggDataType = ''):
+        """
+        :param aggDataType: string
+        :return: (timeColName, subkeyColName) for an aggregated data type.
+        The subkey column name is '' if there is none.
         """
 
-        return self.existingIntervals(aggDataType = aggDataType,
-                                      timeColumnName = timeColumnName)[-1]
+        return next(((params[1], params[2]) for params in
+                     self.dataParams.values() if params[0] == aggDataType),
+                    ('', ''))
+
+
+    def aggregationWatermarks(self, aggDataType = '', timeColumnName = ''):
+        """
+        Last aggregation endpoints, for a given data type, persisted in the
+        watermark table.
+
+        When no watermarks exist for the data type, they are initialized
+        from the aggregated data. The initialization is not committed so that
+        the caller owns the transaction.
+
+        :param aggDataType: string
+        :param timeColumnName: string
+        :return: dict of {subkey: datetime}. Data types without subkeys
+        have the single subkey ''.
+        """
+
+        sql = """SELECT subkey, last_endpoint FROM "{}" WHERE data_type =
+        '{}'""".format(WATERMARK_TABLE, aggDataType)
+        watermarks = {x[0]: x[1] for x in self.rows(sql)}
+        if watermarks:
+            return watermarks
+
+        subkeyCol = self.aggregationKeyColumns(aggDataType)[1]
+        self.dbUtil.executeSQL(self.cursor, """INSERT INTO "{0}" (data_type,
+        subkey, last_endpoint) SELECT '{1}', {2}, MAX({3}) FROM "{4}" GROUP BY
+        2""".format(WATERMARK_TABLE, aggDataType,
+                      'CAST({} AS TEXT)'.format(
+                          subkeyCol) if subkeyCol else "''", timeColumnName,
+                      self.tables[aggDataType]))
+        self.logger.log('Initialized {} watermarks for {}.'.format(
+            self.cursor.rowcount, aggDataType))
+        return {x[0]: x[1] for x in self.rows(sql)}
+
+
+    def advanceAggregationWatermarks(self, aggDataType = '',
+                                     timeColumnName = '', startDate = '',
+                                     endDate = ''):
+        """
+        Advance the watermarks for a given data type to the last aggregated
+        endpoints between the start and end dates.
+
+        The change is not committed so that it can be committed with the
+        aggregated data.
+
+        :param aggDataType: string
+        :param timeColumnName: string
+        :param startDate: string
+        :param endDate: string
+        :return: None
+        """
+
+        subkeyCol = self.aggregationKeyColumns(aggDataType)[1]
+        subkey = 'CAST({} AS TEXT)'.format(subkeyCol) if subkeyCol else "''"
+        endpoints = """SELECT {0} AS subkey, MAX({1}) AS endpoint FROM "{2}"
+        WHERE {1} BETWEEN '{3}' AND '{4}' GROUP BY 1""".format(
+            subkey, timeColumnName, self.tables[aggDataType], startDate,
+            endDate)
+
+        self.dbUtil.executeSQL(self.cursor, """UPDATE "{0}" SET
+        last_endpoint = new.endpoint, updated = NOW() FROM ({1}) AS new
+        WHERE "{0}".data_type = '{2}' AND "{0}".subkey = new.subkey
+        AND new.endpoint > "{0}".last_endpoint""".format(WATERMARK_TABLE,
+                                                         endpoints,
+                                                         aggDataType))
+        self.dbUtil.executeSQL(self.cursor, """INSERT INTO "{0}" (data_type,
+        subkey, last_endpoint) SELECT '{2}', new.subkey, new.endpoint
+        FROM ({1}) AS new WHERE NOT EXISTS (SELECT 1 FROM "{0}"
+        WHERE data_type = '{2}' AND subkey = new.subkey)""".format(
+            WATERMARK_TABLE, endpoints, aggDataType))
+
+
+    def lastRawEndpoint(self, dataType = '', timeColumnName = '',
+                        startDate = None):
+        """
+        Last endpoint in the raw data for a given data type after a start
+        date.
+
+        Endpoints are truncated to the minute as they are for
+        unaggregatedEndpoints.
+
+        :param dataType: string
+        :param timeColumnName: string
+        :param startDate: datetime or None to search from the beginning.
+        :return: datetime or None if there is no endpoint.
+        """
+
+        if startDate is None:
+            startDate = FIRST_ENDPOINT
+        return self.rows("""SELECT DATE_TRUNC('minute', MAX({0})) FROM "{1}"
+        WHERE {0} > '{2}' AND CAST(EXTRACT(MINUTE FROM {0}) AS INTEGER) % {3}
+        = 0""".format(timeColumnName, self.tables[dataType], startDate,
+                      INTERVAL_DURATION))[0][0]
 
 
     def unaggregatedEndpoints(self, dataType = '', aggDataType = '',
@@ -181,6 +313,12 @@ class MSGDataAggregator(object):
         :return: list of datetimes.
         """
 
+        lastEndpoint = self.lastAggregationEndpoint(aggDataType,
+                                                    timeColumnName)
+        self.logger.log('last agg endpoint: {}'.format(lastEndpoint))
+        if lastEndpoint is None:
+            lastEndpoint = FIRST_ENDPOINT
+
         if idColumnName != '':
             # Key:
             # 0: raw
@@ -193,9 +331,6 @@ class MSGDataAggregator(object):
                   '1}".{2} IS NULL AND "{0}".{2} > \'{4}\' ORDER BY {2} ASC, ' \
                   '{3} ASC'
 
-            self.logger.log('last agg endpoint: {}'.format(
-                self.lastAggregationEndpoint(aggDataType, timeColumnName)))
-
             # The id column value is available in the tuple returned by
             # groupby but is not being used here.
 
@@ -220,9 +355,7 @@ class MSGDataAggregator(object):
                                    sql.format(self.tables[dataType],
                                               self.tables[aggDataType],
                                               timeColumnName, idColumnName,
-                                              self.lastAggregationEndpoint(
-                                                  aggDataType,
-                                                  timeColumnName)))])))])
+                                              lastEndpoint))])))])
         else:
             # Key:
             # 0: raw
@@ -233,9 +366,6 @@ class MSGDataAggregator(object):
                   '"{1}".{2} WHERE "{1}".{2} IS NULL AND "{0}".{2} > \'{3}\' ' \
                   'ORDER BY {2} ASC'
 
-            self.logger.log('last agg endpoint: {}'.format(
-                self.lastAggregationEndpoint(aggDataType, timeColumnName)))
-
             return map(lambda x: datetime(x[0], x[1], x[2], x[3], x[4], 0),
                        [k for k, v in groupby(map(lambda y: y.timetuple()[0:5],
                                                   filter(
@@ -248,9 +378,27 @@ class MSGDataAggregator(object):
                                                            self.tables[
                                                                aggDataType],
                                                            timeColumnName,
-                                                           self.lastAggregationEndpoint(
-                                                               aggDataType,
-                                                               timeColumnName)))])))])
+                                                           lastEndpoint))])))])
+
+    def initialMinuteCrossing(self, minute = None):
+        """
+        The next minute crossing for the first reading in a series.
+
+        :param minute: The integer value of the minute of the first reading.
+        :returns: Int of 15, 30, 45 or 0.
+        """
+
+        if minute <= 15:
+            return 15
+        elif minute <= 30:
+            return 30
+        elif minute <= 45:
+            return 45
+        elif minute == 0 or minute <= 59:
+            return 0
+        else:
+            raise Exception('Unable to determine next minute crossing')
+
 
     def intervalCrossed(self, minute = None, subkey = None):
         """
@@ -313,8 +461,34 @@ class MSGDataAggregator(object):
         return self.cursor.fetchall()
 
 
+    def streamedRows(self, sql, itersize = None):
+        """
+        Generator of rows from a SQL fetch using a server-side cursor.
+
+        Rows are transferred from the server in batches of itersize so that
+        memory use is bounded by the batch size instead of the size of the
+        result set. The cursor is closed when the rows are exhausted or the
+        generator is discarded.
+
+        :param sql: Command to be executed.
+        :param itersize: Number of rows per fetch. Defaults to the
+        aggregator's itersize.
+        :returns: Generator of DB rows.
+        """
+
+        self.logger.log('sql: {}'.format(sql), 'debug')
+        cursor = self.conn.cursor(name = 'msg_aggregator_stream')
+        cursor.itersize = itersize if itersize else self.itersize
+        try:
+            self.dbUtil.executeSQL(cursor, sql)
+            for row in cursor:
+                yield row
+        finally:
+            cursor.close()
+
+
     def rawData(self, dataType = '', orderBy = None, timestampCol = '',
-                startDate = '', endDate = ''):
+                startDate = '', endDate = '', streaming = False):
         """
         Raw data to be aggregated.
 
@@ -323,6 +497,8 @@ class MSGDataAggregator(object):
         :param timestampCol: string
         :param startDate: string
         :param endDate: string
+        :param streaming: if True, a generator of rows read through a
+        server-side cursor is returned.
         :returns: DB rows.
         """
 
@@ -330,10 +506,13 @@ class MSGDataAggregator(object):
 
         orderBy = filter(None, orderBy)
 
-        return self.rows("""SELECT {} FROM "{}" WHERE {} BETWEEN '{}' AND
+        sql = """SELECT {} FROM "{}" WHERE {} BETWEEN '{}' AND
         '{}' ORDER BY {}""".format(self.columns[dataType],
                                    self.tables[dataType], timestampCol,
-                                   startDate, endDate, ','.join(orderBy)))
+                                   startDate, endDate, ','.join(orderBy))
+        if streaming:
+            return self.streamedRows(sql)
+        return self.rows(sql)
 
 
     def subkeys(self, dataType = '', timestampCol = '', subkeyCol = '',
@@ -358,9 +537,10 @@ class MSGDataAggregator(object):
                                   timestampCol, startDate, endDate, subkeyCol))]
 
 
-    def insertAggregatedData(self, agg = None):
+    def insertAggregatedData(self, agg = None, commit = True):
         """
         :param agg: MSGAggregatedData
+        :param commit: if False, the insert is left uncommitted.
         :return: None
         """
 
@@ -442,7 +622,109 @@ class MSGDataAggregator(object):
                 raise Exception('Row type not matched.')
 
         # End for row.
-        self.conn.commit()
+        if commit:
+            self.conn.commit()
+
+
+    def bulkInsertAggregatedData(self, agg = None, upsert = False,
+                                 commit = True):
+        """
+        Insert aggregated data with a single COPY.
+
+        With upsert, rows are copied to a temporary table and then used to
+        update existing rows, matched on the time and subkey columns, and to
+        insert the remaining rows. Rerunning an aggregation then replaces
+        its previous result instead of failing on duplicate keys.
+
+        :param agg: MSGAggregatedData
+        :param upsert: if True, existing aggregated rows are updated.
+        :param commit: if False, the insert is left uncommitted.
+        :return: Int count of rows written.
+        """
+
+        if not agg.columns:
+            raise Exception('agg columns not defined.')
+        if not agg.data:
+            raise Exception('agg data not defined.')
+
+        def __copyValue(val):
+            if val == 'NULL' or val is None:
+                return '\\N'
+            elif isinstance(val, datetime):
+                val = val.isoformat()
+            elif type(val) == type(0.0):
+                val = repr(val)
+            elif isinstance(val, basestring):
+                val = val.strip()
+            else:
+                val = str(val)
+            return val.replace('\\', '\\\\').replace('\t', '\\t').replace(
+                '\n', '\\n').replace('\r', '\\r')
+
+        buffer = StringIO()
+        cnt = 0
+        for row in agg.data:
+            for values in (row.values() if type(row) == type({}) else [row]):
+                buffer.write('\t'.join(map(__copyValue, values)) + '\n')
+                cnt += 1
+        buffer.seek(0)
+
+        table = self.tables[agg.aggregationType]
+        columns = ','.join(agg.columns)
+        try:
+            if not upsert:
+                self.cursor.copy_expert(
+                    'COPY "{}" ({}) FROM STDIN'.format(table, columns), buffer)
+            else:
+                (timeCol, subkeyCol) = self.aggregationKeyColumns(
+                    agg.aggregationType)
+                keys = filter(None, [timeCol, subkeyCol])
+                match = ' AND '.join(
+                    ['"{0}".{1} = agg_bulk.{1}'.format(table, k) for k in keys])
+
+                self.cursor.execute(
+                    'CREATE TEMP TABLE agg_bulk (LIKE "{}")'.format(table))
+                self.cursor.copy_expert(
+                    'COPY agg_bulk ({}) FROM STDIN'.format(columns), buffer)
+                self.cursor.execute(
+                    'UPDATE "{0}" SET {1} FROM agg_bulk WHERE {2}'.format(
+                        table, ','.join(['{0} = agg_bulk.{0}'.format(c) for c in
+                                         agg.columns if c not in keys]),
+                        match))
+                self.cursor.execute(
+                    'INSERT INTO "{0}" ({1}) SELECT {1} FROM agg_bulk WHERE '
+                    'NOT EXISTS (SELECT 1 FROM "{0}" WHERE {2})'.format(
+                        table, columns, match))
+                self.cursor.execute('DROP TABLE agg_bulk')
+        except Exception as detail:
+            self.conn.rollback()
+            self.logger.log(
+                'Bulk insert to {} failed: {}.'.format(table, detail), 'error')
+            if self.exitOnError:
+                raise Exception('Failure during aggregated data insert.')
+            return 0
+
+        if commit:
+            self.conn.commit()
+        self.logger.log('{} rows bulk inserted to {}.'.format(cnt, table))
+        return cnt
+
+
+    def storeAggregatedData(self, agg = None, commit = True):
+        """
+        Insert aggregated data using the insert method configured for the
+        aggregator.
+
+        :param agg: MSGAggregatedData
+        :param commit: if False, the insert is left uncommitted.
+        :return: None
+        """
+
+        if self.bulkInsert:
+            self.bulkInsertAggregatedData(agg = agg, upsert = self.upsert,
+                                          commit = commit)
+        else:
+            self.insertAggregatedData(agg = agg, commit = commit)
 
 
     def intervalAverages(self, sums, cnts, timestamp, timestampIndex,
@@ -509,6 +791,243 @@ class MSGDataAggregator(object):
             return myAvgs
 
 
+    def engine(self, dataType = ''):
+        """
+        Aggregation engine for a given data type.
+
+        :param dataType: string
+        :return: MSGAggregationEngines
+        """
+
+        return self.engines.get(dataType, MSGAggregationEngines.python)
+
+
+    def columnTypes(self, dataType = ''):
+        """
+        Database types of the columns of a raw data type.
+
+        :param dataType: string
+        :return: dict of {column name: data type name}
+        """
+
+        return {x[0]: x[1] for x in self.rows(
+            """SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_name = '{}'""".format(self.tables[dataType]))}
+
+
+    def aggregationSQL(self, dataType = '', timeColumnName = '',
+                       subkeyColumnName = '', startDate = '', endDate = ''):
+        """
+        SQL SELECT statement that provides aggregated data with the same
+        endpoint semantics as aggregatedData.
+
+        Interval crossings follow intervalCrossed. A recursive query steps
+        from each crossing of a subkey to the next one while carrying the
+        next minute crossing: the first reading at or after minute 15, 30
+        or 45, or the first reading at or before minute 15 when the next
+        crossing is 0. The first reading for a subkey sets the next minute
+        crossing to 15, 30, 45 or 0 from its minute, as aggregatedData
+        does. Where a 15-minute boundary minute has no reading, the interval
+        therefore ends at the next available reading. Each step is a lookup
+        of a single reading in time order, so the query is efficient when
+        the raw table is indexed by subkey and time. Readings are then
+        flagged as crossings with a join on subkey and time.
+
+        The crossing reading is the last one included in the interval and
+        its timestamp is the interval endpoint. The readings after the last
+        endpoint are not aggregated. Readings are assumed to be unique by
+        subkey and timestamp.
+
+        Values are averaged over the readings where they are not NULL.
+        Integer columns are averaged with floor division and non-numeric
+        columns are NULL.
+
+        :param dataType: string
+        :param timeColumnName: string
+        :param subkeyColumnName: string
+        :param startDate: string
+        :param endDate: string
+        :returns: SQL string with columns in the order of self.columns.
+        """
+
+        intTypes = ['smallint', 'integer', 'bigint']
+        floatTypes = ['real', 'double precision', 'numeric']
+        types = self.columnTypes(dataType)
+
+        selected = []
+        for col in self.columns[dataType].split(','):
+            if col == timeColumnName:
+                selected.append('MAX({0}) AS {0}'.format(col))
+            elif col == subkeyColumnName:
+                selected.append(col)
+            elif types.get(col) in intTypes:
+                selected.append(
+                    'FLOOR(SUM({0})::numeric / NULLIF(COUNT({0}), 0))::bigint '
+                    'AS {0}'.format(col))
+            elif types.get(col) in floatTypes:
+                selected.append('AVG({0}) AS {0}'.format(col))
+            else:
+                selected.append('NULL AS {}'.format(col))
+
+        groupBy = ', '.join(
+            filter(None, [subkeyColumnName, 'agg_interval_number']))
+
+        if subkeyColumnName:
+            subkeys = {'partition': 'PARTITION BY {}'.format(subkeyColumnName),
+                       'distinct': 'DISTINCT ON ({}) '.format(
+                           subkeyColumnName),
+                       'subkey': '{} AS agg_subkey, '.format(subkeyColumnName),
+                       'prevSubkey': 'agg_prev.agg_subkey, ',
+                       'matchPrev': '{} = agg_prev.agg_subkey AND '.format(
+                           subkeyColumnName),
+                       'matchCrossing':
+                           'agg_endpoint.agg_subkey = {} AND '.format(
+                               subkeyColumnName),
+                       'firstOrder': '{}, {}'.format(subkeyColumnName,
+                                                     timeColumnName)}
+        else:
+            subkeys = {'partition': '', 'distinct': '', 'subkey': '',
+                       'prevSubkey': '', 'matchPrev': '', 'matchCrossing': '',
+                       'firstOrder': '{} LIMIT 1'.format(timeColumnName)}
+
+        def nextCrossing(op):
+            """
+            :param op: String of the comparison with the time of agg_prev.
+            :returns: SQL of the first reading after agg_prev, in the sense
+            of op, that crosses an interval.
+            """
+
+            return """LATERAL (
+                SELECT {time} AS agg_time,
+                       (agg_prev.agg_next_crossing + {duration}) % 60
+                           AS agg_next_crossing
+                FROM "{table}"
+                WHERE {matchPrev}{time} {op} agg_prev.agg_time
+                      AND {time} <= '{end}'
+                      AND CASE WHEN agg_prev.agg_next_crossing = 0
+                          THEN date_part('minute', {time}) <= {duration}
+                          ELSE date_part('minute', {time})
+                               >= agg_prev.agg_next_crossing END
+                ORDER BY {time} LIMIT 1) agg_next""".format(
+                op = op, time = timeColumnName, table = self.tables[dataType],
+                end = endDate, duration = INTERVAL_DURATION,
+                matchPrev = subkeys['matchPrev'])
+
+        return """WITH RECURSIVE agg_firsts AS (
+            SELECT {distinct}{subkey}{time} AS agg_time,
+                   CASE WHEN date_part('minute', {time}) <= 15 THEN 15
+                        WHEN date_part('minute', {time}) <= 30 THEN 30
+                        WHEN date_part('minute', {time}) <= 45 THEN 45
+                        ELSE 0 END AS agg_next_crossing
+            FROM "{table}" WHERE {time} BETWEEN '{start}' AND '{end}'
+            ORDER BY {firstOrder}),
+        agg_crossings AS (
+            SELECT {prevSubkey}agg_next.* FROM agg_firsts agg_prev,
+            {firstCrossing}
+            UNION ALL
+            SELECT {prevSubkey}agg_next.* FROM agg_crossings agg_prev,
+            {laterCrossing}),
+        agg_flagged AS (
+            SELECT {cols}, (agg_endpoint.agg_time IS NOT NULL)::int
+                       AS agg_crossing
+            FROM "{table}" LEFT JOIN agg_crossings agg_endpoint
+                ON {matchCrossing}agg_endpoint.agg_time = {time}
+            WHERE {time} BETWEEN '{start}' AND '{end}'),
+        agg_intervals AS (
+            SELECT *, COALESCE(SUM(agg_crossing) OVER ({partition}
+                       ORDER BY {time} ROWS BETWEEN UNBOUNDED PRECEDING AND
+                       1 PRECEDING), 0) AS agg_interval_number,
+                   SUM(agg_crossing) OVER ({partition}) AS agg_interval_count
+            FROM agg_flagged)
+        SELECT {selected} FROM agg_intervals
+        WHERE agg_interval_number < agg_interval_count
+        GROUP BY {groupBy}""".format(firstCrossing = nextCrossing('>='),
+                                     laterCrossing = nextCrossing('>'),
+                                     cols = self.columns[dataType],
+                                     time = timeColumnName,
+                                     table = self.tables[dataType],
+                                     start = startDate, end = endDate,
+                                     selected = ', '.join(selected),
+                                     groupBy = groupBy, **subkeys)
+
+
+    def sqlAggregatedData(self, dataType = '', aggregationType = '',
+                          timeColumnName = '', subkeyColumnName = '',
+                          startDate = '', endDate = ''):
+        """
+        Provide aggregated data computed by the database.
+
+        The data has the same form as the data provided by aggregatedData.
+
+        :param dataType: String
+        :param aggregationType: String
+        :param timeColumnName: String
+        :param subkeyColumnName: String
+        :param startDate: String
+        :param endDate: String
+        :returns: MSGAggregatedData
+        """
+
+        cols = self.columns[dataType].split(',')
+        sql = self.aggregationSQL(dataType = dataType,
+                                  timeColumnName = timeColumnName,
+                                  subkeyColumnName = subkeyColumnName,
+                                  startDate = startDate, endDate = endDate)
+        orderBy = ', '.join(filter(None, [timeColumnName, subkeyColumnName]))
+
+        aggData = []
+        for row in self.rows('{} ORDER BY {}'.format(sql, orderBy)):
+            values = ['NULL' if val is None else val for val in row]
+            if subkeyColumnName:
+                aggData.append(
+                    {row[cols.index(subkeyColumnName)]: values})
+            else:
+                aggData.append(values)
+
+        return MSGAggregatedData(aggregationType = aggregationType,
+                                 columns = cols, data = aggData)
+
+
+    def insertSQLAggregatedData(self, dataType = '', aggregationType = '',
+                                timeColumnName = '', subkeyColumnName = '',
+                                startDate = '', endDate = '',
+                                commit = True):
+        """
+        Aggregate data within the database and insert it to the aggregated
+        data table with a single INSERT ... SELECT.
+
+        :param dataType: String
+        :param aggregationType: String
+        :param timeColumnName: String
+        :param subkeyColumnName: String
+        :param startDate: String
+        :param endDate: String
+        :param commit: if False, the insert is left uncommitted.
+        :returns: Int count of aggregated rows inserted.
+        """
+
+        sql = 'INSERT INTO "{0}" ({1}) {2}'.format(
+            self.tables[aggregationType], self.columns[dataType],
+            self.aggregationSQL(dataType = dataType,
+                                timeColumnName = timeColumnName,
+                                subkeyColumnName = subkeyColumnName,
+                                startDate = startDate, endDate = endDate))
+        self.logger.log('sql: {}'.format(sql), 'debug')
+
+        success = self.dbUtil.executeSQL(self.cursor, sql,
+                                         exitOnFail = self.exitOnError)
+        if not success:
+            self.conn.rollback()
+            if self.exitOnError:
+                raise Exception('Failure during aggregated data insert.')
+            return 0
+
+        cnt = self.cursor.rowcount
+        if commit:
+            self.conn.commit()
+        return cnt
+
+
     def dataParameters(self, dataType = ''):
         """
         Parameters for a given data type.
@@ -522,6 +1041,20 @@ class MSGDataAggregator(object):
             self.logger.log('Unmatched data type {}.'.format(dataType))
 
 
+    def aggregationFunction(self, dataType = ''):
+        """
+        Method providing aggregated data, as MSGAggregatedData, for the
+        in-memory engine selected for a given data type.
+
+        :param dataType: string
+        :return: aggregatedData or numpyAggregatedData
+        """
+
+        if self.engine(dataType) == MSGAggregationEngines.numpy:
+            return self.numpyAggregatedData
+        return self.aggregatedData
+
+
     def aggregateAllData(self, dataType = ''):
         """
         Convenience method for aggregating all data for a given data type.
@@ -534,23 +1067,41 @@ class MSGDataAggregator(object):
         for start, end in self.monthStartsAndEnds(timeColumnName = timeColName,
                                                   dataType = dataType):
             self.logger.log('start, end: {}, {}'.format(start, end))
-            aggData = self.aggregatedData(dataType = dataType,
-                                          aggregationType = aggType,
-                                          timeColumnName = timeColName,
-                                          subkeyColumnName = subkeyColName,
-                                          startDate = start.strftime(
-                                              '%Y-%m-%d %H:%M:%S'),
-                                          endDate = end.strftime(
-                                              '%Y-%m-%d %H:%M:%S'))
-            self.insertAggregatedData(agg = aggData)
-            for row in aggData.data:
-                self.logger.log('aggData row: {}'.format(row))
+
+            startDate = start.strftime('%Y-%m-%d %H:%M:%S')
+            endDate = end.strftime('%Y-%m-%d %H:%M:%S')
+
+            if self.engine(dataType) == MSGAggregationEngines.sql:
+                self.insertSQLAggregatedData(dataType = dataType,
+                                             aggregationType = aggType,
+                                             timeColumnName = timeColName,
+                                             subkeyColumnName = subkeyColName,
+                                             startDate = startDate,
+                                             endDate = endDate, commit = False)
+            else:
+                aggData = self.aggregationFunction(dataType)(
+                    dataType = dataType, aggregationType = aggType,
+                    timeColumnName = timeColName,
+                    subkeyColumnName = subkeyColName, startDate = startDate,
+                    endDate = endDate)
+                self.storeAggregatedData(agg = aggData, commit = False)
+                for row in aggData.data:
+                    self.logger.log('aggData row: {}'.format(row))
+
+            self.advanceAggregationWatermarks(aggDataType = aggType,
+                                              timeColumnName = timeColName,
+                                              startDate = startDate,
+                                              endDate = endDate)
+            self.conn.commit()
 
 
     def aggregateNewData(self, dataType = ''):
         """
         Convenience method for aggregating new data.
 
+        New data is found from the aggregation watermarks which are advanced
+        in the same transaction as the insert of the aggregated data.
+
         :param dataType:
         :return: dict of {dataType: count of aggregation endpoints}
         """
@@ -560,8 +1111,11 @@ class MSGDataAggregator(object):
 
         (aggType, timeColName, subkeyColName) = self.dataParameters(dataType)
 
-        (end, start) = \
-            self.lastUnaggregatedAndAggregatedEndpoints(dataType).items()[0][1]
+        start = self.lastAggregationEndpoint(aggDataType = aggType,
+                                             timeColumnName = timeColName)
+        end = self.lastRawEndpoint(dataType = dataType,
+                                   timeColumnName = timeColName,
+                                   startDate = start)
 
         self.logger.log(
             'datatype: {}; start, end: {}, {}; end type: {}'.format(dataType,
@@ -578,25 +1132,44 @@ class MSGDataAggregator(object):
             self.logger.log('Nothing to aggregate.')
             return {dataType: 0}
 
-        if self.incrementEndpoint(start) >= end:
+        if start is None:
+            # Nothing has been aggregated so start from the beginning.
+            startDate = FIRST_ENDPOINT
+        elif self.incrementEndpoint(start) >= end:
             self.logger.log('Nothing to aggregate.')
             return {dataType: 0}
+        else:
+            startDate = self.incrementEndpoint(start).strftime(
+                '%Y-%m-%d %H:%M:%S')
+        endDate = end.strftime('%Y-%m-%d %H:%M:%S')
+
+        if self.engine(dataType) == MSGAggregationEngines.sql:
+            cnt = self.insertSQLAggregatedData(dataType = dataType,
+                                               aggregationType = aggType,
+                                               timeColumnName = timeColName,
+                                               subkeyColumnName = subkeyColName,
+                                               startDate = startDate,
+                                               endDate = endDate,
+                                               commit = False)
+        else:
+            aggData = self.aggregationFunction(dataType)(
+                dataType = dataType, aggregationType = aggType,
+                timeColumnName = timeColName, subkeyColumnName = subkeyColName,
+                startDate = startDate, endDate = endDate)
+            cnt = len(aggData.data)
+            if cnt:
+                self.storeAggregatedData(agg = aggData, commit = False)
+            for row in aggData.data:
+                self.logger.log('aggData row: {}'.format(row))
 
-        aggData = self.aggregatedData(dataType = dataType,
-                                      aggregationType = aggType,
-                                      timeColumnName = timeColName,
-                                      subkeyColumnName = subkeyColName,
-                                      startDate = self.incrementEndpoint(
-                                          start).strftime('%Y-%m-%d %H:%M:%S'),
-                                      endDate = end.strftime(
-                                          '%Y-%m-%d %H:%M:%S'))
-        self.insertAggregatedData(agg = aggData)
-        for row in aggData.data:
-            self.logger.log('aggData row: {}'.format(row))
+        self.advanceAggregationWatermarks(aggDataType = aggType,
+                                          timeColumnName = timeColName,
+                                          startDate = startDate,
+                                          endDate = endDate)
+        self.conn.commit()
 
-        self.logger.log(
-            '{} rows aggregated for {}.'.format(len(aggData.data), dataType))
-        return {dataType: len(aggData.data)}
+        self.logger.log('{} rows aggregated for {}.'.format(cnt, dataType))
+        return {dataType: cnt}
 
     def incrementEndpoint(self, endpoint = None):
         """
@@ -760,91 +1333,15 @@ class MSGDataAggregator(object):
 
         (sum, cnt) = __initSumAndCount()
 
-
-        def __initIntervalCrossings():
-            """
-            Perform initialization of the interval crossings used to
-            determine when interval crossings occur.
-            :returns None
-            """
-
-            subkeysToCheck = copy.copy(mySubkeys)
-            self.logger.log('subkeys to check: {}'.format(subkeysToCheck),
-                            'debug')
-
-            if mySubkeys:
-                for row in self.rawData(dataType = dataType,
-                                        orderBy = [timeColumnName,
-                                                   subkeyColumnName],
-                                        timestampCol = timeColumnName,
-                                        startDate = startDate,
-                                        endDate = endDate):
-
-                    # @CRITICAL: Exit after every subkey has been visited.
-                    # This scans the raw data until each subkey is encountered
-                    # ONCE and then exits.
-                    if subkeysToCheck != []:
-                        if row[ci(subkeyColumnName)] in subkeysToCheck:
-                            subkeysToCheck.remove(row[ci(subkeyColumnName)])
-                        minute = row[ci(timeColumnName)].timetuple()[
-                            MINUTE_POSITION]
-
-                        if minute <= 15:
-                            self.nextMinuteCrossing[
-                                row[ci(subkeyColumnName)]] = 15
-                        elif minute <= 30:
-                            self.nextMinuteCrossing[
-                                row[ci(subkeyColumnName)]] = 30
-                        elif minute <= 45:
-                            self.nextMinuteCrossing[
-                                row[ci(subkeyColumnName)]] = 45
-                        elif minute == 0 or minute <= 59:
-                            self.nextMinuteCrossing[
-                                row[ci(subkeyColumnName)]] = 0
-                        else:
-                            raise Exception(
-                                'Unable to determine next minute crossing')
-                        self.logger.log('next min crossing for {} = {}'.format(
-                            row[ci(subkeyColumnName)],
-                            self.nextMinuteCrossing[row[ci(subkeyColumnName)]]),
-                                        'debug')
-                    else:
-                        break
-
-            else:
-                # Non-subkey case e.g. weather data.
-                rowCnt = 0
-                # @todo Optimize by querying only the first row.
-                for row in self.rawData(dataType = dataType,
-                                        orderBy = [timeColumnName],
-                                        timestampCol = timeColumnName,
-                                        startDate = startDate,
-                                        endDate = endDate):
-                    minute = row[ci(timeColumnName)].timetuple()[
-                        MINUTE_POSITION]
-                    if minute <= 15:
-                        self.nextMinuteCrossingWithoutSubkeys = 15
-                    elif minute <= 30:
-                        self.nextMinuteCrossingWithoutSubkeys = 30
-                    elif minute <= 45:
-                        self.nextMinuteCrossingWithoutSubkeys = 45
-                    elif minute == 0 or minute <= 59:
-                        self.nextMinuteCrossingWithoutSubkeys = 0
-                    else:
-                        raise Exception(
-                            'Unable to determine next minute crossing')
-                    self.logger.log('next min crossing = {}'.format(
-                        self.nextMinuteCrossingWithoutSubkeys), 'debug')
-                    rowCnt += 1
-                    if rowCnt > 0:
-                        break
-
-        __initIntervalCrossings()
+        # Interval crossings are initialized from the first row of each
+        # subkey as it is encountered.
+        initializedSubkeys = set()
 
         for row in self.rawData(dataType = dataType,
                                 orderBy = [timeColumnName, subkeyColumnName],
                                 timestampCol = timeColumnName,
-                                startDate = startDate, endDate = endDate):
+                                startDate = startDate, endDate = endDate,
+                                streaming = True):
 
             if mySubkeys:
                 for col in self.columns[dataType].split(','):
@@ -855,6 +1352,16 @@ class MSGDataAggregator(object):
 
                 minute = row[ci(timeColumnName)].timetuple()[MINUTE_POSITION]
 
+                if row[ci(subkeyColumnName)] not in initializedSubkeys:
+                    initializedSubkeys.add(row[ci(subkeyColumnName)])
+                    self.nextMinuteCrossing[
+                        row[ci(subkeyColumnName)]] = self.initialMinuteCrossing(
+                        minute)
+                    self.logger.log('next min crossing for {} = {}'.format(
+                        row[ci(subkeyColumnName)],
+                        self.nextMinuteCrossing[row[ci(subkeyColumnName)]]),
+                                    'debug')
+
                 if self.intervalCrossed(minute = minute,
                                         subkey = row[ci(subkeyColumnName)]):
                     minuteCrossed = minute
@@ -884,6 +1391,12 @@ class MSGDataAggregator(object):
 
                 minute = row[ci(timeColumnName)].timetuple()[MINUTE_POSITION]
 
+                if rowCnt == 0:
+                    self.nextMinuteCrossingWithoutSubkeys = \
+                        self.initialMinuteCrossing(minute)
+                    self.logger.log('next min crossing = {}'.format(
+                        self.nextMinuteCrossingWithoutSubkeys), 'debug')
+
                 if self.intervalCrossed(minute = minute):
                     aggData += [
                         self.intervalAverages(sum, cnt, row[ci(timeColumnName)],
@@ -897,3 +1410,156 @@ class MSGDataAggregator(object):
         return MSGAggregatedData(aggregationType = aggregationType,
                                  columns = self.columns[dataType].split(','),
                                  data = aggData)
+
+
+    def numpyAggregatedData(self, dataType = '', aggregationType = '',
+                            timeColumnName = '', subkeyColumnName = '',
+                            startDate = '', endDate = ''):
+        """
+        Provide aggregated data using NumPy array operations.
+
+        The result is the same as that of aggregatedData. Interval crossings
+        are determined for each subkey by stepping through the minutes in
+        which readings occur instead of through every reading. Sums and
+        counts for each interval are computed with grouped reductions.
+
+        :param dataType: String
+        :param aggregationType: String
+        :param timeColumnName: String
+        :param subkeyColumnName: String
+        :param startDate: String
+        :param endDate: String
+        :returns: MSGAggregatedData
+        """
+
+        cols = self.columns[dataType].split(',')
+        ci = lambda col_name: cols.index(col_name)
+
+        rows = self.rawData(dataType = dataType,
+                            orderBy = [timeColumnName, subkeyColumnName],
+                            timestampCol = timeColumnName,
+                            startDate = startDate, endDate = endDate)
+
+        if not rows:
+            return MSGAggregatedData(aggregationType = aggregationType,
+                                     columns = cols, data = [])
+
+        columnValues = zip(*rows)
+        times = columnValues[ci(timeColumnName)]
+        minuteIDs = np.array(times, dtype = 'datetime64[s]').astype(
+            np.int64) // 60
+
+        # Group readings by subkey while keeping time order within a subkey.
+        if subkeyColumnName:
+            subkeyValues = columnValues[ci(subkeyColumnName)]
+            uniqueSubkeys, subkeyIDs = np.unique(
+                np.array(subkeyValues, dtype = object), return_inverse = True)
+            order = np.argsort(subkeyIDs, kind = 'mergesort')
+            bounds = np.searchsorted(subkeyIDs[order],
+                                     np.arange(len(uniqueSubkeys) + 1))
+        else:
+            order = np.arange(len(rows))
+            bounds = np.array([0, len(rows)])
+
+        # Numeric columns are those whose non-NULL values are numbers.
+        numericCols = {}
+        for i, col in enumerate(cols):
+            if col == timeColumnName or col == subkeyColumnName:
+                continue
+            sample = next((v for v in columnValues[i] if v is not None), None)
+            if not self.mathUtil.isNumber(sample) or isinstance(sample,
+                                                                basestring):
+                continue
+            values = np.array(columnValues[i], dtype = np.float64)[order]
+            present = ~np.isnan(values)
+            numericCols[i] = (isinstance(sample, (int, long)),
+                              np.where(present, values, 0.0), present)
+
+        sortedMinuteIDs = minuteIDs[order]
+        aggData = []
+        for b in range(len(bounds) - 1):
+            start, end = bounds[b], bounds[b + 1]
+            if start == end:
+                continue
+            ends = start + np.array(
+                self.__minuteCrossings(sortedMinuteIDs[start:end]),
+                dtype = np.int64)
+            if len(ends) == 0:
+                continue
+            starts = np.concatenate(([start], ends[:-1] + 1))
+
+            # Readings after the last crossing are not part of an interval.
+            last = ends[-1] + 1
+            averages = {}
+            for i, (isInt, values, present) in numericCols.items():
+                sums = np.add.reduceat(values[:last], starts)
+                cnts = np.add.reduceat(present[:last].astype(np.int64),
+                                       starts)
+                averages[i] = (isInt, sums, cnts)
+
+            for n, endIndex in enumerate(ends):
+                rowIndex = order[endIndex]
+                subkey = rows[rowIndex][ci(subkeyColumnName)] if \
+                    subkeyColumnName else None
+                myAvgs = []
+                for i in range(len(cols)):
+                    if i == ci(timeColumnName):
+                        myAvgs.append(times[rowIndex])
+                    elif subkeyColumnName and i == ci(subkeyColumnName):
+                        myAvgs.append(subkey)
+                    elif i not in averages or averages[i][2][n] == 0:
+                        myAvgs.append('NULL')
+                    elif averages[i][0]:
+                        myAvgs.append(
+                            int(round(averages[i][1][n])) // int(
+                                averages[i][2][n]))
+                    else:
+                        myAvgs.append(
+                            float(averages[i][1][n] / averages[i][2][n]))
+                aggData.append(
+                    (rowIndex, {subkey: myAvgs} if subkeyColumnName else myAvgs))
+
+        # Report intervals in the order their endpoints were read.
+        aggData = [x[1] for x in sorted(aggData, key = lambda x: x[0])]
+
+        self.logger.log('aggdata = {}'.format(aggData), 'debug')
+        return MSGAggregatedData(aggregationType = aggregationType,
+                                 columns = cols, data = aggData)
+
+
+    def __minuteCrossings(self, minuteIDs):
+        """
+        Positions of the readings at which intervals are crossed for a
+        single series of readings ordered by time.
+
+        This follows intervalCrossed. Only the first readings within a
+        minute can cross an interval since the crossing state changes only
+        when a crossing occurs.
+
+        :param minuteIDs: numpy array of minutes since the epoch for each
+        reading.
+        :returns: List of int positions.
+        """
+
+        newMinute = np.concatenate(([True], minuteIDs[1:] != minuteIDs[:-1]))
+        groupStarts = np.flatnonzero(newMinute)
+        groupEnds = np.concatenate((groupStarts[1:], [len(minuteIDs)]))
+        minutes = (minuteIDs[groupStarts] % 60).tolist()
+
+        crossings = []
+        nextCrossing = self.initialMinuteCrossing(minutes[0])
+        for minute, groupStart, groupEnd in zip(minutes, groupStarts.tolist(),
+                                                groupEnds.tolist()):
+            position = groupStart
+            while position < groupEnd:
+                if nextCrossing != 0 and minute >= nextCrossing:
+                    nextCrossing += INTERVAL_DURATION
+                    if nextCrossing >= 60:
+                        nextCrossing = 0
+                elif nextCrossing == 0 and minute <= INTERVAL_DURATION:
+                    nextCrossing = INTERVAL_DURATION
+                else:
+                    break
+                crossings.append(position)
+                position += 1
+        return crossings
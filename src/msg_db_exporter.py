@@ -14,13 +14,10 @@ from msg_configer import MSGConfiger
 import os
 import httplib2
 from apiclient.discovery import build
-from apiclient.http import MediaFileUpload
 from oauth2client.client import OAuth2WebServerFlow
 from oauth2client.file import Storage
 from apiclient import errors
 import datetime
-import hashlib
-from functools import partial
 from msg_file_util import MSGFileUtil
 import time
 import requests
@@ -33,6 +30,8 @@ import sys
 from msg_python_util import MSGPythonUtil
 from sek.notifier import SEKNotifier
 from msg_types import MSGNotificationHistoryTypes
+from msg_cloud_storage import MSGDriveStorageClient
+from multiprocessing.pool import ThreadPool
 
 
 class MSGDBExporter(object):
@@ -58,9 +57,19 @@ class MSGDBExporter(object):
     # List of cloud files.
     @property
     def cloudFiles(self):
-        self._cloudFiles = self.driveService.files().list().execute()
+        self._cloudFiles = {'items': self.storageClient.listFiles()}
         return self._cloudFiles
 
+    @property
+    def storageClient(self):
+        if not self._storageClient:
+            # Load the credentials.
+            self.driveService
+            self._storageClient = MSGDriveStorageClient(
+                credentials = self.googleAPICredentials,
+                retryDelay = self.retryDelay)
+        return self._storageClient
+
     @property
     def driveService(self):
         if self._driveService:
@@ -84,9 +93,13 @@ class MSGDBExporter(object):
         return self._driveService
 
 
-    def __init__(self):
+    def __init__(self, storageClient = None, uploadWorkers = 4):
         """
         Constructor.
+
+        :param storageClient: MSGCloudStorageClient used for uploads and
+        listings or None to use Google Drive.
+        :param uploadWorkers: Int count of files uploaded concurrently.
         """
 
         self.logger = SEKLogger(__name__, 'DEBUG', useColor = False)
@@ -134,7 +147,9 @@ class MSGDBExporter(object):
             '{}/google_api_credentials'.format(self.credentialPath))
 
         self._driveService = None
+        self._storageClient = storageClient
         self._cloudFiles = None
+        self.uploadWorkers = uploadWorkers
         self.postAgent = 'Maui Smart Grid 1.0.0 DB Exporter'
         self.retryDelay = 10
         self.availableFilesURL = ''
@@ -192,6 +207,19 @@ class MSGDBExporter(object):
         if not db or not dumpName:
             raise Exception('DB and dumpname required.')
 
+        return '{0} > {1}/{2}.sql'.format(self.streamingDumpCommand(db = db),
+                                          self.exportTempWorkPath, dumpName)
+
+
+    def streamingDumpCommand(self, db = ''):
+        """
+        :param db: String
+        :return: String of command used to export DB to stdout.
+        """
+
+        if not db:
+            raise Exception('DB required.')
+
         # Process exclusions.
 
         exclusions = self.dumpExclusionsDictionary()
@@ -203,9 +231,8 @@ class MSGDBExporter(object):
             for e in excludeList:
                 excludeString += """-T '"{}"' """.format(e)
 
-        return 'sudo -u postgres pg_dump -p {0} -U {1} {5} {2} > {3}/{4}' \
-               '.sql'.format(self.db_port(), self.db_username(), db,
-                             self.exportTempWorkPath, dumpName, excludeString)
+        return 'sudo -u postgres pg_dump -p {0} -U {1} {3} {2}'.format(
+            self.db_port(), self.db_username(), db, excludeString)
 
 
     def dumpExclusionsDictionary(self):
@@ -289,8 +316,56 @@ class MSGDBExporter(object):
         return success
 
 
+    def streamingDumpResult(self, db = '', dumpName = '', chunkSize = 0,
+                            compressLevel = 9, compressionWorkers = 1):
+        """
+        Export a DB by piping the output of pg_dump through gzip compression
+        and splitting in a single pass. The uncompressed dump is never
+        written to disk.
+
+        :param db: String
+        :param dumpName: String of filename of dump file.
+        :param chunkSize: Int maximum size in bytes of a compressed chunk or
+        0 to not split the export.
+        :param compressLevel: Int gzip compression level from 1 to 9.
+        :param compressionWorkers: Int count of compression threads.
+        :return: CompressedStream for the compressed export.
+        """
+
+        compressedFullPath = '{}/{}.sql.gz'.format(self.exportTempWorkPath,
+                                                  dumpName)
+        cmd = self.streamingDumpCommand(db = db)
+        self.logger.log('cmd: {}'.format(cmd))
+
+        process = subprocess.Popen(cmd, shell = True, stdout = subprocess.PIPE)
+        try:
+            result = self.fileUtil.gzipCompressStream(
+                process.stdout, fullPath = compressedFullPath,
+                chunkSize = chunkSize, compressLevel = compressLevel,
+                filename = '{}.sql'.format(dumpName),
+                workers = compressionWorkers)
+        finally:
+            process.stdout.close()
+            returnCode = process.wait()
+
+        if returnCode != 0:
+            self.logger.log(
+                "Exception while dumping: pg_dump returned {}".format(
+                    returnCode))
+            sys.exit(-1)
+
+        for chunk, md5sum in zip(result.chunks, result.chunkMD5Sums):
+            self.logger.log('{} md5: {}'.format(chunk, md5sum), 'DEBUG')
+        self.logger.log('compressed md5: {}, uncompressed md5: {}'.format(
+            result.md5sum, result.sourceMD5Sum), 'INFO')
+
+        return result
+
+
     def exportDBs(self, databases = None, toCloud = False, localExport = True,
-                  testing = False, chunkSize = 0, deleteOutdated = False):
+                  testing = False, chunkSize = 0, deleteOutdated = False,
+                  streaming = False, compressLevel = 9,
+                  compressionWorkers = 1, verify = True):
         """
         Export a set of DBs to local storage.
 
@@ -304,6 +379,17 @@ class MSGDBExporter(object):
         splitting.
         :param deleteOutdated: Boolean indicating outdated files in the cloud
         should be removed.
+        :param streaming: Boolean when set to True, the output of pg_dump is
+        compressed and split as it is produced. Chunks of chunkSize bytes,
+        or of max_bytes_before_split bytes when chunkSize is 0, are kept in
+        the final export path in place of a single compressed file.
+        localExport is ignored.
+        :param compressLevel: Int gzip compression level from 1 to 9.
+        :param compressionWorkers: Int count of compression threads. More
+        than one selects parallel block compression, which produces
+        multi-member gzip files that are readable by gunzip.
+        :param verify: Boolean when set to True, the compressed export is
+        verified by checksum before it is uploaded.
         :returns: List of file IDs of uploaded files or None if there is an
         error condition.
         """
@@ -318,39 +404,74 @@ class MSGDBExporter(object):
 
             dumpName = self.dumpName(db = db)
             fullPath = '{}/{}.sql'.format(self.exportTempWorkPath, dumpName)
-            if localExport:
-                noErrors = self.dumpResult(db, dumpName, fullPath)
-
-            # Perform compression of the file.
-            self.logger.log("Compressing {} using gzip.".format(db), 'info')
-            self.logger.log('fullpath: {}'.format(fullPath), 'DEBUG')
-
-            gzipResult = self.fileUtil.gzipCompressFile(fullPath)
             compressedFullPath = '{}{}'.format(fullPath, '.gz')
-            numChunks = self.numberOfChunksToUse(compressedFullPath)
 
-            # Gzip uncompress and verify by checksum is disabled until a more
-            # efficient, non-memory-based, uncompress is implemented.
-            # md5sum1 = self.fileUtil.md5Checksum(fullPath)
-            # self.md5Verification(compressedFullPath=compressedFullPath,
-            # fullPath=fullPath,md5sum1=md5sum1)
+            if streaming:
+                self.logger.log(
+                    "Compressing {} using gzip while dumping.".format(db),
+                    'info')
+                streamed = self.streamingDumpResult(db, dumpName,
+                                                    chunkSize or int(
+                                                        self.configer.configOptionValue(
+                                                            'Export',
+                                                            'max_bytes_before_split')),
+                                                    compressLevel,
+                                                    compressionWorkers)
+                gzipResult = True
+                numChunks = len(streamed.chunks)
+            else:
+                if localExport:
+                    noErrors = self.dumpResult(db, dumpName, fullPath)
+
+                # Perform compression of the file.
+                self.logger.log("Compressing {} using gzip.".format(db),
+                                'info')
+                self.logger.log('fullpath: {}'.format(fullPath), 'DEBUG')
+
+                gzipResult = self.fileUtil.gzipCompressFile(
+                    fullPath, compressLevel = compressLevel,
+                    workers = compressionWorkers)
+                numChunks = self.numberOfChunksToUse(compressedFullPath)
+
+            # Verify the compressed export against the checksum of the
+            # uncompressed dump. Unverified exports are not uploaded.
+            verified = True
+            if verify:
+                if streaming:
+                    verified = self.md5Verification(
+                        md5sum1 = streamed.sourceMD5Sum,
+                        compressedChunks = streamed.chunks)
+                else:
+                    verified = self.md5Verification(
+                        compressedFullPath = compressedFullPath,
+                        fullPath = fullPath,
+                        md5sum1 = self.fileUtil.md5Checksum(fullPath))
+                if not verified:
+                    noErrors = False
 
-            if toCloud:
+            if toCloud and verified:
                 # Split compressed files into a set of chunks to improve the
-                # reliability of uploads.
-
-                # Upload the files to the cloud.
-                for f in self.filesToUpload(
+                # reliability of uploads. Streamed exports are already split.
+                if streaming:
+                    files = streamed.chunks
+                else:
+                    files = self.filesToUpload(
                         compressedFullPath = compressedFullPath,
-                        numChunks = numChunks, chunkSize = chunkSize):
-                    self.logger.log('Uploading {}.'.format(f), 'info')
-                    fileID = self.uploadFileToCloudStorage(fullPath = f,
-                                                           testing = testing,
-                                                           retryCount = int(
-                                                               self.configer.configOptionValue(
-                                                                   'Export',
-                                                                   'export_retry_count')))
+                        numChunks = numChunks, chunkSize = chunkSize)
 
+                # Upload the files to the cloud.
+                self.logger.log('Uploading {}.'.format(files), 'info')
+                fileIDs = self.uploadFilesToCloudStorage(fullPaths = files,
+                                                         retryCount = int(
+                                                             self.configer.configOptionValue(
+                                                                 'Export',
+                                                                 'export_retry_count')),
+                                                         md5Sums =
+                                                         streamed.chunkMD5Sums
+                                                         if streaming else
+                                                         None)
+
+                for f, fileID in zip(files, fileIDs):
                     self.logger.log('file id after upload: {}'.format(fileID))
 
                     if fileID != None:
@@ -368,11 +489,12 @@ class MSGDBExporter(object):
                             self.logger.log(
                                 'Failed to add readers for {}.'.format(f),
                                 'error')
-                        self.logSuccessfulExport(*self.metadataOfFileID(fileID))
+                        self.logSuccessfulExport(
+                            *self.metadataOfFileID(fileID, cached = True))
 
                     # Remove split sections if they exist.
                     try:
-                        if not testing and numChunks > 1:
+                        if not testing and not streaming and numChunks > 1:
                             self.logger.log('Removing {}'.format(f))
                             os.remove('{}'.format(f))
                     except OSError as error:
@@ -383,12 +505,15 @@ class MSGDBExporter(object):
 
             # End if toCloud.
 
-            if gzipResult:
+            if streaming:
+                for f in streamed.chunks:
+                    self.moveToFinalPath(compressedFullPath = f)
+            elif gzipResult:
                 self.moveToFinalPath(compressedFullPath = compressedFullPath)
 
             # Remove the uncompressed file.
             try:
-                if not testing:
+                if not testing and not streaming:
                     self.logger.log('Removing {}'.format(fullPath))
                     os.remove('{}'.format(fullPath))
             except OSError as error:
@@ -425,45 +550,40 @@ class MSGDBExporter(object):
 
 
     def md5Verification(self, compressedFullPath = '', fullPath = '',
-                        md5sum1 = ''):
+                        md5sum1 = '', compressedChunks = None):
         """
-        Perform md5 verification of a compressed file at compressedFullPath
-        where the original file is at fullPath and has md5sum1.
+        Perform md5 verification of a compressed file at compressedFullPath,
+        or of its split chunks, where the original file is at fullPath and
+        has md5sum1.
+
+        The compressed data is uncompressed and hashed as a stream so nothing
+        is written to disk and memory use does not depend on the size of the
+        export.
 
         :param compressedFullPath: String
         :param fullPath: String
         :param md5sum1: String of md5sum of source file.
-        :return:
+        :param compressedChunks: List of full paths of split chunks, in order,
+        to be verified instead of compressedFullPath.
+        :return: Boolean True if the compressed data matches the checksum,
+        otherwise False.
         """
 
-        GZIP_UNCOMPRESS_FILE = False
-        if GZIP_UNCOMPRESS_FILE:
-            # Verify the compressed file by uncompressing it and
-            # verifying its
-            # checksum against the original checksum.
-            self.logger.log('reading: {}'.format(compressedFullPath), 'DEBUG')
-            self.logger.log('writing: {}'.format(os.path.join(
-                self.configer.configOptionValue('Testing',
-                                                'export_test_data_path'),
-                os.path.splitext(os.path.basename(fullPath))[0])), 'DEBUG')
-
-            self.fileUtil.gzipUncompressFile(compressedFullPath, os.path.join(
-                self.configer.configOptionValue('Testing',
-                                                'export_test_data_path'),
-                fullPath))
+        paths = compressedChunks if compressedChunks else compressedFullPath
+        self.logger.log('verifying: {}'.format(paths), 'DEBUG')
 
-        VERIFY_BY_CHECKSUM = False
-        if VERIFY_BY_CHECKSUM:
-            md5sum2 = self.fileUtil.md5Checksum(fullPath)
+        md5sum2 = self.fileUtil.gzipMD5Checksum(paths)
+        self.logger.log('md5sum1: {}, md5sum2: {}'.format(md5sum1, md5sum2),
+                        'INFO')
 
-            self.logger.log("mtime: {}, md5sum2: {}".format(
-                time.ctime(os.path.getmtime(fullPath)), md5sum2), 'INFO')
+        if md5sum1 and md5sum1 == md5sum2:
+            self.logger.log('Compressed file has been validated by checksum.',
+                            'INFO')
+            return True
 
-            if md5sum1 == md5sum2:
-                self.logger.log(
-                    'Compressed file has been validated by checksum.', 'INFO')
-            else:
-                noErrors = False
+        self.logger.log('Compressed file of {} failed checksum '
+                        'verification.'.format(fullPath or paths), 'error')
+        return False
 
     def numberOfChunksToUse(self, fullPath):
         """
@@ -499,53 +619,105 @@ class MSGDBExporter(object):
         fails.
         """
 
-        success = True
-        myFile = os.path.basename(fullPath)
+        return self.uploadFilesToCloudStorage(fullPaths = [fullPath],
+                                              retryCount = retryCount)[0]
 
-        self.logger.log(
-            'full path {}'.format(os.path.dirname(fullPath), 'DEBUG'))
-        self.logger.log("Uploading {}.".format(myFile))
 
-        result = {}
+    def uploadFilesToCloudStorage(self, fullPaths = None, retryCount = 0,
+                                  md5Sums = None):
+        """
+        Export a batch of files to cloud storage concurrently.
+
+        Each file is uploaded in a resumable session where failed chunks are
+        retried by the storage client. The batch is then verified by MD5
+        checksum against a single listing of the cloud files. Files that
+        fail are removed from the cloud and uploaded again.
+
+        :param fullPaths: List of files to be exported.
+        :param retryCount: Int of number of times to retry the upload of a
+        file that fails or fails verification.
+        :param md5Sums: List of MD5 sums of the files, in the order of
+        fullPaths, or None to calculate them.
+        :returns: List of String File IDs in the order of fullPaths where the
+        ID is None for a file that could not be uploaded and verified.
+        """
+
+        if md5Sums is None:
+            md5Sums = [None] * len(fullPaths)
+        localMD5Sums = dict(zip(fullPaths, md5Sums))
+        fileIDs = dict.fromkeys(fullPaths)
+
+        def upload(fullPath):
+            if not localMD5Sums[fullPath]:
+                localMD5Sums[fullPath] = self.fileUtil.md5Checksum(fullPath)
+            return self.__uploadFile(fullPath)
+
+        # Build the storage client, and the credentials and Drive service it
+        # uses, before the upload threads need it.
+        self.storageClient
+
+        pending = list(fullPaths)
+        pool = ThreadPool(max(1, min(self.uploadWorkers, len(pending))))
         try:
-            media_body = MediaFileUpload(fullPath,
-                                         mimetype =
-                                         'application/gzip-compressed',
-                                         resumable = True)
-            body = {'title': myFile,
-                    'description': 'Hawaii Smart Energy Project gzip '
-                                   'compressed DB export.',
-                    'mimeType': 'application/gzip-compressed'}
+            for attempt in range(retryCount + 1):
+                if attempt > 0:
+                    time.sleep(self.retryDelay * 2 ** (attempt - 1))
+                    self.logger.log('Retrying upload of {}.'.format(pending),
+                                    'warning')
+
+                uploadedIDs = pool.map(upload, pending)
+                remoteFiles = dict(
+                    (item['id'], item) for item in self.cloudFiles['items'])
+
+                failed = []
+                for fullPath, fileID in zip(pending, uploadedIDs):
+                    if fileID and self.__verifyMD5Sum(localMD5Sums[fullPath],
+                                                      remoteFiles.get(fileID)):
+                        fileIDs[fullPath] = fileID
+                        continue
+                    self.logger.log('Failed MD5 checksum verification of '
+                                    '{}.'.format(fullPath), 'INFO')
+                    if fileID in remoteFiles:
+                        self.deleteFile(fileID)
+                    failed.append(fullPath)
+
+                pending = failed
+                if not pending:
+                    break
+        finally:
+            pool.close()
+            pool.join()
+
+        return [fileIDs[f] for f in fullPaths]
+
+
+    def __uploadFile(self, fullPath):
+        """
+        :param fullPath: String of file to be exported.
+        :returns: String File ID of the uploaded file or None if the upload
+        failed.
+        """
 
-            # Result is a Files resource.
-            result = self.driveService.files().insert(body = body,
-                                                      media_body =
-                                                      media_body).execute()
+        myFile = os.path.basename(fullPath)
+        self.logger.log("Uploading {}.".format(myFile))
 
+        body = {'title': myFile,
+                'description': 'Hawaii Smart Energy Project gzip compressed '
+                               'DB export.',
+                'mimeType': 'application/gzip-compressed'}
+        try:
+            # Result is a Files resource.
+            result = self.storageClient.upload(fullPath, body,
+                                               'application/gzip-compressed')
         except Exception as detail:
             # Upload failures can result in a BadStatusLine.
             self.logger.log(
                 "Exception while uploading {}: {}.".format(myFile, detail),
                 'error')
-            success = False
-
-        if not self.__verifyMD5Sum(fullPath, self.fileIDForFileName(myFile)):
-            self.logger.log('Failed MD5 checksum verification.', 'INFO')
-            success = False
-
-        if success:
-            self.logger.log('Verification by MD5 checksum succeeded.', 'INFO')
-            self.logger.log("Finished.")
-            return result['id']
-
-        if not success and retryCount <= 0:
             return None
-        else:
-            time.sleep(self.retryDelay)
-            self.logger.log('Retrying upload of {}.'.format(fullPath),
-                            'warning')
-            self.uploadFileToCloudStorage(fullPath = fullPath,
-                                          retryCount = retryCount - 1)
+
+        self.logger.log("Finished uploading {}.".format(myFile))
+        return result['id']
 
 
     def __retrieveCredentials(self):
@@ -596,7 +768,7 @@ class MSGDBExporter(object):
 
         try:
             # Writing the fileId arg name is required here.
-            self.driveService.files().delete(fileId = fileID).execute()
+            self.storageClient.deleteFile(fileID = fileID)
 
         except errors.HttpError as error:
             self.logger.log('Exception while deleting: {}'.format(error),
@@ -688,13 +860,17 @@ class MSGDBExporter(object):
         output.close()
 
 
-    def metadataOfFileID(self, fileID = ''):
+    def metadataOfFileID(self, fileID = '', cached = False):
         """
         :param fileID: String of a file ID in the cloud.
+        :param cached: Boolean when set to True, the last listing of cloud
+        files is used instead of fetching a new one.
         :return: Tuple of metadata (name, url, timestamp, size) for a given
         file ID.
         """
-        item = [i for i in self.cloudFiles['items'] if i['id'] == fileID][0]
+        cloudFiles = self._cloudFiles if cached and self._cloudFiles else \
+            self.cloudFiles
+        item = [i for i in cloudFiles['items'] if i['id'] == fileID][0]
         return (item[u'originalFilename'], item[u'webContentLink'],
                 item[u'createdDate'], item[u'fileSize'])
 
@@ -887,58 +1063,27 @@ class MSGDBExporter(object):
         return len(self.cloudFiles['items'])
 
 
-    def __verifyMD5Sum(self, localFilePath, remoteFileID):
+    def __verifyMD5Sum(self, localMD5Sum, remoteFile):
         """
-        Verify that the local MD5 sum matches the MD5 sum for the remote file
-        corresponding to an ID.
+        Verify that the local MD5 sum matches the MD5 sum for a remote file.
 
         This verifies that the uploaded file matches the local compressed
         export file.
 
-        :param localFilePath: String of the full path of the local file.
-        :param remoteFileID: String of the cloud ID for the remote file.
+        :param localMD5Sum: String of the MD5 sum of the local file.
+        :param remoteFile: dict of the remote file from a listing of the
+        cloud files or None if the file is not listed.
         :returns: Boolean True if the MD5 sums match, otherwise, False.
         """
 
-        self.logger.log('remote file ID: {}'.format(remoteFileID))
-        self.logger.log('local file path: {}'.format(localFilePath))
-
-        # Get the md5sum for the local file.
-        f = open(localFilePath, mode = 'rb')
-        fContent = hashlib.md5()
-        for buf in iter(partial(f.read, 128), b''):
-            fContent.update(buf)
-        localMD5Sum = fContent.hexdigest()
-        f.close()
-
-        self.logger.log('local md5: {}'.format(localMD5Sum), 'DEBUG')
-
-        def verifyFile():
-            # Get the MD5 sum for the remote file.
-            for item in self.cloudFiles['items']:
-                if (item['id'] == remoteFileID):
-                    self.logger.log(
-                        'remote md5: {}'.format(item['md5Checksum']), 'DEBUG')
-                    if localMD5Sum == item['md5Checksum']:
-                        return True
-                    else:
-                        return False
-
-        try:
-            if verifyFile():
-                return True
-            else:
-                return False
-
-        except errors.HttpError as detail:
-            self.logger.log('HTTP error during MD5 verification.', 'error')
+        if not remoteFile:
+            return False
 
-            time.sleep(10)
-
-            if verifyFile():
-                return True
-            else:
-                return False
+        self.logger.log('local md5: {}, remote md5: {}'.format(localMD5Sum,
+                                                               remoteFile.get(
+                                                                   'md5Checksum')),
+                        'DEBUG')
+        return localMD5Sum == remoteFile.get('md5Checksum')
 
 
     def fileIDForFileName(self, filename):
@@ -987,13 +1132,10 @@ class MSGDBExporter(object):
         self.logger.log('address list: {}'.format(emailAddressList))
 
         for addr in emailAddressList:
-            permission = {'value': addr, 'type': 'user', 'role': 'reader'}
-
             if fileID:
                 try:
-                    resp = self.driveService.permissions().insert(
-                        fileId = fileID, sendNotificationEmails = False,
-                        body = permission).execute()
+                    self.storageClient.addReader(fileID = fileID,
+                                                 emailAddress = addr)
                     self.logger.log(
                         'Reader permission added for {}.'.format(addr))
                 except errors.HttpError as error:
@@ -1008,6 +1150,6 @@ class MSGDBExporter(object):
             time.sleep(self.retryDelay)
             self.logger.log('Retrying adding readers for ID {}.'.format(fileID),
                             'warning')
-            self.addReaders(fileID = fileID,
-                            emailAddressList = emailAddressList,
-                            retryCount = retryCount - 1)
+            return self.addReaders(fileID = fileID,
+                                   emailAddressList = emailAddressList,
+                                   retryCount = retryCount - 1)
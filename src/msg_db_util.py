@@ -80,6 +80,40 @@ class MSGDBUtil(object):
 
         return lastSequenceValue
 
+    def getNextSequenceIDs(self, conn, tableName, columnName, count):
+        """
+        Allocate a block of sequence values for the given table and column.
+
+        The values are reserved in a single round-trip so that primary keys
+        can be assigned before rows are inserted.
+
+        :param conn: DB connection
+        :param tableName: String for name of the table that the sequence matches
+        :param columnName: String for name of the column to which the
+        sequence is applied
+        :param count: Integer number of values to allocate.
+        :returns: List of integer sequence values in ascending order.
+        """
+
+        if count < 1:
+            return []
+
+        sql = """SELECT nextval(pg_get_serial_sequence('"{}"','{}')) FROM
+        generate_series(1, {})""".format(tableName, columnName, int(count))
+
+        cur = conn.cursor()
+        self.executeSQL(cur, sql)
+
+        sequenceValues = sorted(row[0] for row in cur.fetchall())
+
+        if len(sequenceValues) != count:
+            self.logger.log("Critical error. Allocated {} of {} sequence "
+                            "values.".format(len(sequenceValues), count),
+                            'error')
+            sys.exit(-1)
+
+        return sequenceValues
+
     def executeSQL(self, cursor, sql, exitOnFail = True):
         """
         Execute SQL given a cursor and a SQL statement.
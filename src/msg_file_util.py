@@ -13,6 +13,240 @@ from functools import partial
 import gzip
 import os
 import warnings
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+import struct
+import time
+import zlib
+
+STREAM_BUFFER_SIZE = 1024 * 1024
+GZIP_BLOCK_SIZE = 1024 * 1024
+
+# Result of a streaming compression. Chunks and their MD5 sums are in order.
+# The overall MD5 sum is that of the concatenated chunks and the source MD5
+# sum is that of the uncompressed data.
+CompressedStream = namedtuple('CompressedStream',
+                              ['chunks', 'chunkMD5Sums', 'md5sum',
+                               'sourceMD5Sum'])
+
+
+class MSGChunkWriter(object):
+    """
+    File-like object that writes a stream of bytes to a sequence of chunk
+    files while computing the MD5 sum of each chunk and of the whole stream.
+
+    Chunks are named fullPath.0, fullPath.1, ... and each one, except for the
+    last, holds exactly chunkSize bytes. When chunkSize is 0, or when the
+    stream fits in a single chunk, the output is written to fullPath.
+    """
+
+    def __init__(self, fullPath = '', chunkSize = 0):
+        """
+        Constructor.
+
+        :param fullPath: String of the full path of the output.
+        :param chunkSize: Int maximum size in bytes of a chunk or 0 to not
+        split the output.
+        """
+
+        self.fullPath = fullPath
+        self.chunkSize = chunkSize
+        self.chunks = []
+        self.chunkMD5Sums = []
+        self.md5 = hashlib.md5()
+        self._chunk = None
+        self._chunkMD5 = None
+        self._chunkBytes = 0
+
+
+    def _nextChunk(self):
+        self._closeChunk()
+        path = self.fullPath
+        if self.chunkSize:
+            path = '%s.%s' % (self.fullPath, len(self.chunks))
+        self._chunk = open(path, 'wb')
+        self._chunkMD5 = hashlib.md5()
+        self._chunkBytes = 0
+        self.chunks.append(path)
+
+
+    def _closeChunk(self):
+        if self._chunk:
+            self._chunk.close()
+            self.chunkMD5Sums.append(self._chunkMD5.hexdigest())
+            self._chunk = None
+
+
+    def write(self, data):
+        self.md5.update(data)
+        while data:
+            if not self._chunk or (
+                        self.chunkSize and self._chunkBytes >= self.chunkSize):
+                self._nextChunk()
+            part = data
+            if self.chunkSize:
+                part = data[:self.chunkSize - self._chunkBytes]
+            self._chunk.write(part)
+            self._chunkMD5.update(part)
+            self._chunkBytes += len(part)
+            data = data[len(part):]
+
+
+    def flush(self):
+        if self._chunk:
+            self._chunk.flush()
+
+
+    def close(self):
+        """
+        Close the last chunk. A single chunk is renamed to fullPath.
+        """
+
+        if not self.chunks:
+            self._nextChunk()
+        self._closeChunk()
+        if self.chunkSize and len(self.chunks) == 1:
+            os.rename(self.chunks[0], self.fullPath)
+            self.chunks = [self.fullPath]
+
+
+    @property
+    def md5sum(self):
+        return self.md5.hexdigest()
+
+
+def gzipMember(data, compressLevel = 9, header = None):
+    """
+    Compress a block of data as a complete gzip member.
+
+    Concatenated members form a valid gzip file that decompresses to the
+    concatenated blocks. This is called from pool threads; zlib releases the
+    GIL while compressing.
+
+    :param data: String of bytes to be compressed.
+    :param compressLevel: Int gzip compression level from 1 to 9.
+    :param header: String of the gzip member header or None for a header
+    without a filename or timestamp.
+    :returns: String of the gzip member.
+    """
+
+    if header is None:
+        header = gzipMemberHeader()
+    compressor = zlib.compressobj(compressLevel, zlib.DEFLATED,
+                                  -zlib.MAX_WBITS)
+    return ''.join([header, compressor.compress(data), compressor.flush(),
+                    struct.pack('<II', zlib.crc32(data) & 0xffffffff,
+                                len(data) & 0xffffffff)])
+
+
+def gzipMemberHeader(filename = '', mtime = 0):
+    """
+    :param filename: String of the original filename or '' to omit it.
+    :param mtime: Int modification time or 0 to omit it.
+    :returns: String of a gzip member header (RFC 1952).
+    """
+
+    flags = 0x08 if filename else 0
+    header = struct.pack('<BBBBIBB', 0x1f, 0x8b, zlib.DEFLATED, flags,
+                         int(mtime) & 0xffffffff, 0, 255)
+    if filename:
+        header += os.path.basename(filename) + '\0'
+    return header
+
+
+class MSGParallelGzipWriter(object):
+    """
+    File-like object that gzip compresses blocks of written data in parallel
+    and writes them, in order, to a file object as a multi-member gzip
+    stream.
+
+    As with pigz, the output is readable by gunzip and by the gzip module.
+    Each block is compressed independently so the compression ratio is
+    slightly lower than that of a single member. Memory use is bounded to a
+    few blocks per worker.
+
+    Usage:
+
+        f_out = MSGParallelGzipWriter(open(path, 'wb'), workers = 4)
+        f_out.write(data)
+        f_out.close()
+
+    """
+
+    def __init__(self, fileobj = None, compressLevel = 9, workers = 2,
+                 blockSize = GZIP_BLOCK_SIZE, filename = ''):
+        """
+        Constructor.
+
+        :param fileobj: File object to write compressed data to. It is not
+        closed by close().
+        :param compressLevel: Int gzip compression level from 1 to 9.
+        :param workers: Int count of compression threads.
+        :param blockSize: Int size in bytes of uncompressed blocks.
+        :param filename: String of the original filename stored in the
+        header of the first member.
+        """
+
+        self.fileobj = fileobj
+        self.compressLevel = compressLevel
+        self.workers = max(1, workers)
+        self.blockSize = blockSize
+        self.pool = ThreadPool(self.workers)
+        self.pending = []
+        self.buffer = []
+        self.bufferBytes = 0
+        self.header = gzipMemberHeader(filename, time.time())
+        self.memberCount = 0
+        self.closed = False
+
+
+    def _submit(self, data):
+        header = None
+        if self.memberCount == 0:
+            header = self.header
+        self.memberCount += 1
+        self.pending.append(self.pool.apply_async(gzipMember, (
+            data, self.compressLevel, header)))
+        while len(self.pending) > 2 * self.workers:
+            self.fileobj.write(self.pending.pop(0).get())
+
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.bufferBytes += len(data)
+        if self.bufferBytes >= self.blockSize:
+            data = ''.join(self.buffer)
+            for i in range(0, len(data) - self.blockSize + 1, self.blockSize):
+                self._submit(data[i:i + self.blockSize])
+            remainder = data[len(data) - len(data) % self.blockSize:]
+            self.buffer = [remainder] if remainder else []
+            self.bufferBytes = len(remainder)
+
+
+    def flush(self):
+        for result in self.pending:
+            self.fileobj.write(result.get())
+        self.pending = []
+        self.fileobj.flush()
+
+
+    def close(self):
+        """
+        Compress the remaining data and write all pending members.
+        """
+
+        if self.closed:
+            return
+        try:
+            if self.buffer or self.memberCount == 0:
+                self._submit(''.join(self.buffer))
+                self.buffer = []
+                self.bufferBytes = 0
+            self.flush()
+        finally:
+            self.pool.close()
+            self.pool.join()
+            self.closed = True
 
 
 class MSGFileUtil(object):
@@ -56,7 +290,7 @@ class MSGFileUtil(object):
         try:
             f = open(fullPath, mode = 'rb')
             content = hashlib.md5()
-            for buf in iter(partial(f.read, 128), b''):
+            for buf in iter(partial(f.read, STREAM_BUFFER_SIZE), b''):
                 content.update(buf)
             md5sum = content.hexdigest()
             f.close()
@@ -70,32 +304,84 @@ class MSGFileUtil(object):
         """
         Gzip uncompress a file given by fullPath.
 
-        @todo Need to deal with large file sizes. Stop reading into memory.
+        The file is uncompressed in blocks so memory use does not depend on
+        the file size.
 
         :param srcPath: Full path of the file to be uncompressed.
         :param destPath: Full path of file to be written to.
+        :returns: Boolean: True if successful, False otherwise.
         """
 
+        success = False
         self.logger.log(
             'Uncompressing gzip source %s to %s' % (srcPath, destPath), 'DEBUG')
         gzipFile = gzip.open(srcPath, "rb")
         uncompressedFile = open(destPath, "wb")
-        decoded = gzipFile.read()
         try:
-            uncompressedFile.write(decoded)
-        except:
-            self.logger.log("Exception while writing uncompressed file.")
+            for buf in iter(partial(gzipFile.read, STREAM_BUFFER_SIZE), b''):
+                uncompressedFile.write(buf)
+            success = True
+        except (IOError, zlib.error) as detail:
+            self.logger.log(
+                "Exception while writing uncompressed file: %s" % detail)
         gzipFile.close()
         uncompressedFile.close()
+        return success
 
 
-    def gzipCompressFile(self, fullPath):
+    def gzipMD5Checksum(self, paths):
+        """
+        Get the MD5 checksum of the uncompressed content of a gzip file or of
+        the split chunks of a gzip file without writing the uncompressed
+        content.
+
+        Chunks are read in order as one stream so they can be split at any
+        byte. Multi-member gzip data is supported. Memory use does not
+        depend on the file size.
+
+        :param paths: Full path of a gzip file or a list of full paths of
+        chunks in order.
+        :returns: MD5 checksum value as a hex digest or None if the data is
+        not valid gzip data.
+        """
+
+        if isinstance(paths, basestring):
+            paths = [paths]
+
+        newDecompressor = lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+        content = hashlib.md5()
+        decompressor = newDecompressor()
+        try:
+            for path in paths:
+                with open(path, 'rb') as f:
+                    for data in iter(partial(f.read, STREAM_BUFFER_SIZE), b''):
+                        while data:
+                            content.update(decompressor.decompress(
+                                data, STREAM_BUFFER_SIZE))
+                            if decompressor.unused_data:
+                                # Start of the next gzip member.
+                                data = decompressor.unused_data
+                                decompressor = newDecompressor()
+                            else:
+                                data = decompressor.unconsumed_tail
+            content.update(decompressor.flush())
+        except (IOError, zlib.error) as detail:
+            self.logger.log(
+                'Exception during checksum calculation: %s' % detail, 'ERROR')
+            return None
+        return content.hexdigest()
+
+
+    def gzipCompressFile(self, fullPath, compressLevel = 9, workers = 1):
         """
         Perform gzip compression on a file at fullPath.
 
         @todo Generalize this method.
 
         :param fullPath: Full path of the file to be compressed.
+        :param compressLevel: Int gzip compression level from 1 to 9.
+        :param workers: Int count of compression threads. More than one
+        selects parallel block compression.
         :returns: Boolean: True if successful, False otherwise.
         """
 
@@ -103,16 +389,80 @@ class MSGFileUtil(object):
         self.logger.log('Gzip compressing %s.' % fullPath)
         try:
             f_in = open('%s' % (fullPath), 'rb')
-            f_out = gzip.open('%s.gz' % (fullPath), 'wb')
-            f_out.writelines(f_in)
+            gzipFile = open('%s.gz' % (fullPath), 'wb')
+            f_out = self.gzipWriter(gzipFile, compressLevel = compressLevel,
+                                    workers = workers,
+                                    filename = os.path.basename(fullPath))
+            for buf in iter(partial(f_in.read, STREAM_BUFFER_SIZE), b''):
+                f_out.write(buf)
             f_out.close()
+            gzipFile.close()
             f_in.close()
             success = True
         except IOError as detail:
-            self.logger.log('IOError exception while gzipping: %s' % detail, 'ERROR')
+            self.logger.log('IOError exception while gzipping: %s' % detail,
+                            'ERROR')
         return success
 
 
+    def gzipWriter(self, fileobj, compressLevel = 9, workers = 1,
+                   filename = ''):
+        """
+        :param fileobj: File object to write compressed data to.
+        :param compressLevel: Int gzip compression level from 1 to 9.
+        :param workers: Int count of compression threads. More than one
+        selects parallel block compression.
+        :param filename: String of the original filename stored in the gzip
+        header.
+        :returns: File-like object that gzip compresses written data.
+        """
+
+        if workers > 1:
+            return MSGParallelGzipWriter(fileobj, compressLevel = compressLevel,
+                                         workers = workers,
+                                         filename = filename)
+        return gzip.GzipFile(filename = filename, mode = 'wb',
+                             compresslevel = compressLevel, fileobj = fileobj)
+
+
+    def gzipCompressStream(self, f_in, fullPath = '', chunkSize = 0,
+                           compressLevel = 9, filename = '', workers = 1):
+        """
+        Gzip compress a stream, such as the output of a process, to a file or
+        to a sequence of chunk files in a single pass.
+
+        Uncompressed data is never written to disk. MD5 sums of the chunks,
+        of the compressed output and of the uncompressed data are computed
+        while writing.
+
+        :param f_in: File object to be read until EOF.
+        :param fullPath: String of the full path of the compressed output.
+        :param chunkSize: Int maximum size in bytes of a chunk or 0 to not
+        split the output.
+        :param compressLevel: Int gzip compression level from 1 to 9.
+        :param filename: String of the original filename stored in the gzip
+        header.
+        :param workers: Int count of compression threads. More than one
+        selects parallel block compression.
+        :returns: CompressedStream.
+        """
+
+        self.logger.log('Gzip compressing stream to %s.' % fullPath)
+        writer = MSGChunkWriter(fullPath, chunkSize)
+        sourceMD5 = hashlib.md5()
+        try:
+            f_out = self.gzipWriter(writer, compressLevel = compressLevel,
+                                    workers = workers, filename = filename)
+            for buf in iter(partial(f_in.read, STREAM_BUFFER_SIZE), b''):
+                sourceMD5.update(buf)
+                f_out.write(buf)
+            f_out.close()
+        finally:
+            writer.close()
+        return CompressedStream(writer.chunks, writer.chunkMD5Sums,
+                                writer.md5sum, sourceMD5.hexdigest())
+
+
     def splitFile(self, fullPath = '', chunkSize = 0):
         """
         @DEPRECATED
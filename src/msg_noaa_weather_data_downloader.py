@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import gzip
+import json
+import os
+import shutil
+import threading
+import urllib2
+import zipfile
+from sek.logger import SEKLogger
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = 'download-manifest.json'
+
+
+class MSGWeatherDataDownloader(object):
+    """
+    Conditional retrieval of NOAA weather data archives.
+
+    The ETag, Last-Modified and Content-Length headers of each downloaded
+    archive are recorded in a manifest in the download directory. A later
+    download of the same archive is made as a conditional request and is
+    skipped when the server reports that the archive has not changed, or,
+    for servers that ignore conditional requests, when the response headers
+    match the manifest.
+
+    Downloads are safe to perform from multiple threads.
+
+    Usage:
+
+        downloader = MSGWeatherDataDownloader(path)
+        if downloader.download(url, 'QCLCD201208.zip'):
+            downloader.zipMemberToGzip('QCLCD201208.zip', '201208hourly.txt',
+                                       '201208hourly.txt.gz')
+
+    """
+
+    def __init__(self, path = '', timeout = 300):
+        """
+        Constructor.
+
+        :param path: Directory where archives and the manifest are stored.
+        :param timeout: Seconds allowed for a response.
+        """
+
+        self.logger = SEKLogger(__name__, 'info')
+        self.path = path
+        self.timeout = timeout
+        self.manifestPath = os.path.join(path, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.manifest = self.readManifest()
+
+
+    def readManifest(self):
+        """
+        :returns: dict of {filename: dict of headers} from the manifest or
+        an empty dict if there is no manifest.
+        """
+
+        try:
+            with open(self.manifestPath) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return {}
+
+
+    def writeManifest(self):
+        """
+        Write the manifest atomically.
+        """
+
+        tmpPath = self.manifestPath + '.tmp'
+        with open(tmpPath, 'w') as f:
+            json.dump(self.manifest, f, indent = 1, sort_keys = True)
+        os.rename(tmpPath, self.manifestPath)
+
+
+    def validators(self, response):
+        """
+        :param response: urllib2 response.
+        :returns: dict of the headers used to detect changes.
+        """
+
+        headers = response.info()
+        return {'etag': headers.getheader('ETag'),
+                'last_modified': headers.getheader('Last-Modified'),
+                'content_length': headers.getheader('Content-Length')}
+
+
+    def unchanged(self, entry, validators):
+        """
+        :param entry: dict of headers from the manifest.
+        :param validators: dict of headers from a response.
+        :returns: True if the headers show the same archive as the manifest.
+        """
+
+        if not entry:
+            return False
+        if validators['etag'] or entry.get('etag'):
+            if validators['etag'] != entry.get('etag'):
+                return False
+        elif not validators['last_modified'] or validators[
+            'last_modified'] != entry.get('last_modified'):
+            return False
+        return validators['content_length'] == entry.get('content_length')
+
+
+    def download(self, url, filename):
+        """
+        Download an archive unless the local copy is up to date.
+
+        The archive is written to a temporary file that replaces the local
+        copy only when it is complete.
+
+        :param url: URL of the archive.
+        :param filename: Name of the archive in the download directory.
+        :returns: True if the archive was downloaded, False if the local
+        copy is unchanged.
+        :raises: urllib2.URLError on retrieval errors.
+        """
+
+        fullPath = os.path.join(self.path, filename)
+        with self.lock:
+            entry = self.manifest.get(filename) if os.path.exists(
+                fullPath) else None
+
+        request = urllib2.Request(url)
+        if entry:
+            if entry.get('etag'):
+                request.add_header('If-None-Match', entry['etag'])
+            if entry.get('last_modified'):
+                request.add_header('If-Modified-Since', entry['last_modified'])
+
+        try:
+            response = urllib2.urlopen(request, timeout = self.timeout)
+        except urllib2.HTTPError as detail:
+            if detail.code == 304:
+                self.logger.log('{} is not modified.'.format(filename))
+                return False
+            raise
+
+        try:
+            validators = self.validators(response)
+            if self.unchanged(entry, validators):
+                self.logger.log('{} is unchanged.'.format(filename))
+                return False
+
+            tmpPath = fullPath + '.part'
+            with open(tmpPath, 'wb') as f:
+                shutil.copyfileobj(response, f, CHUNK_SIZE)
+        finally:
+            response.close()
+
+        os.rename(tmpPath, fullPath)
+        with self.lock:
+            self.manifest[filename] = validators
+            self.writeManifest()
+        self.logger.log('Downloaded {}.'.format(filename))
+        return True
+
+
+    def zipMemberToGzip(self, zipPath, memberName, gzPath, compressLevel = 9,
+                        stationIDs = None):
+        """
+        Transcode a member of a zip archive to a gzip file in a single
+        streaming pass.
+
+        When station IDs are given, only the header row and the rows whose
+        WBAN, the first column, is one of the station IDs are kept.
+
+        :param zipPath: Path of the zip archive.
+        :param memberName: Name of the member in the archive.
+        :param gzPath: Path of the gzip file to be written.
+        :param compressLevel: gzip compression level from 1 to 9.
+        :param stationIDs: Iterable of station IDs or None to keep all rows.
+        :returns: Int count of rows written or None if rows were not
+        filtered.
+        :raises: zipfile.BadZipfile, KeyError if the member does not exist.
+        """
+
+        rowCount = None
+        tmpPath = gzPath + '.part'
+        zfile = zipfile.ZipFile(zipPath)
+        try:
+            member = zfile.open(memberName)
+            try:
+                f_out = gzip.open(tmpPath, 'wb', compressLevel)
+                try:
+                    if stationIDs is None:
+                        shutil.copyfileobj(member, f_out, CHUNK_SIZE)
+                    else:
+                        rowCount = self.copyStationRows(member, f_out,
+                                                        stationIDs)
+                finally:
+                    f_out.close()
+            finally:
+                member.close()
+        finally:
+            zfile.close()
+        os.rename(tmpPath, gzPath)
+        return rowCount
+
+
+    def copyStationRows(self, f_in, f_out, stationIDs):
+        """
+        Copy the header row and the rows for a set of stations.
+
+        :param f_in: File object of QCLCD data.
+        :param f_out: File object to be written.
+        :param stationIDs: Iterable of station IDs.
+        :returns: Int count of station rows written.
+        """
+
+        stations = frozenset(stationIDs)
+        rowCount = 0
+        buffer = []
+        lines = iter(f_in)
+        for line in lines:
+            buffer.append(line)
+            break
+        for line in lines:
+            if line[:line.find(',')].strip('"') in stations:
+                buffer.append(line)
+                rowCount += 1
+                if len(buffer) >= 1000:
+                    f_out.write(''.join(buffer))
+                    buffer = []
+        f_out.write(''.join(buffer))
+        return rowCount
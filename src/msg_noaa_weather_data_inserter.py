@@ -12,6 +12,7 @@ from msg_db_util import MSGDBUtil
 from sek.logger import SEKLogger
 import sys
 import datetime as dt
+from cStringIO import StringIO
 
 
 class MSGNOAAWeatherDataInserter(object):
@@ -89,3 +90,71 @@ class MSGNOAAWeatherDataInserter(object):
                 self.logger.log("ERROR: Commit failed.", 'debug')
 
         return processedDateTimes
+
+    def insertRecords(self, conn, tableName, columns, records, commit = False):
+        """
+        Insert weather records in bulk.
+
+        Records are staged with COPY to a temporary table and inserted with
+        one INSERT ... SELECT. Records that duplicate existing rows, or
+        earlier records, on (wban, datetime, record_type) are dropped.
+
+        :param conn: A database connection.
+        :param tableName: Name of the DB table to be inserted to.
+        :param columns: List of column names in the order of the values in
+        each record.
+        :param records: Iterable of sequences of values such as those given
+        by MSGNOAAWeatherDataParser.weatherRecords. NULL values are given
+        as 'NULL'.
+        :param (optional) commit: A flag indicated that DB transactions will
+        be committed.
+        :returns: Set of datetimes processed.
+        """
+
+        cur = conn.cursor()
+
+        buffer = StringIO()
+        for record in records:
+            buffer.write('\t'.join(
+                [val.replace('\\', '\\\\').replace('\t', '\\t').replace(
+                    '\n', '\\n').replace('\r', '\\r') for val in
+                 record]) + '\n')
+        buffer.seek(0)
+
+        colList = ','.join(columns)
+        try:
+            cur.execute(
+                'CREATE TEMP TABLE weather_bulk AS SELECT {} FROM "{}" WITH NO '
+                'DATA'.format(colList, tableName))
+            cur.execute('ALTER TABLE weather_bulk ADD COLUMN bulk_row SERIAL')
+            cur.copy_expert("COPY weather_bulk ({}) FROM STDIN WITH NULL AS "
+                            "'NULL'".format(colList), buffer)
+            self.logger.log('Staged {} rows.'.format(cur.rowcount), 'debug')
+
+            cur.execute("""INSERT INTO "{0}" ({1},created)
+                SELECT DISTINCT ON (wban, datetime, record_type) {1}, NOW()
+                FROM weather_bulk AS b WHERE NOT EXISTS (
+                    SELECT 1 FROM "{0}" AS w WHERE w.wban = b.wban AND
+                    w.datetime = b.datetime AND
+                    w.record_type IS NOT DISTINCT FROM b.record_type)
+                ORDER BY wban, datetime, record_type, bulk_row
+                RETURNING datetime""".format(tableName, colList))
+            insertCount = cur.rowcount
+            processedDateTimes = set(row[0] for row in cur.fetchall())
+            cur.execute('DROP TABLE weather_bulk')
+        except Exception as detail:
+            self.logger.log(
+                'Bulk insert to {} failed: {}.'.format(tableName, detail),
+                'error')
+            conn.rollback()
+            sys.exit(-1)
+
+        self.logger.log('Inserted {} rows.'.format(insertCount), 'info')
+
+        if commit:
+            try:
+                conn.commit()
+            except:
+                self.logger.log("ERROR: Commit failed.", 'debug')
+
+        return processedDateTimes
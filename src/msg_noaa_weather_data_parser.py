@@ -8,7 +8,7 @@ __license__ = 'https://raw.github' \
               '-LICENSE.txt'
 
 import csv
-import re
+from collections import namedtuple
 from sek.logger import SEKLogger
 
 
@@ -16,6 +16,16 @@ class MSGNOAAWeatherDataParser(object):
     """
     Given a file object containing NOAA weather data, return a data structure
     containing the data.
+
+    Usage:
+
+        parser = MSGNOAAWeatherDataParser()
+        for record in parser.weatherRecords(fileObject, stationIDs):
+            record.wban, record.datetime
+
+    weatherRecords yields one NOAAWeatherRecord tuple per row, in the order
+    of recordCols, and holds only a single row in memory. parseWeatherData
+    provides the same data as a list of dicts.
     """
 
     def __init__(self):
@@ -44,6 +54,49 @@ class MSGNOAAWeatherDataParser(object):
                      "record_type_flag", "hourly_precip", "hourly_precip_flag",
                      "altimeter", "altimeter_flag"]
 
+        # The date and time columns are combined into a single datetime.
+        self.recordCols = self.cols[0:2] + self.cols[3:]
+        self.recordClass = namedtuple('NOAAWeatherRecord', self.recordCols)
+
+    def weatherRecords(self, fileObject, stationIDs):
+        """
+        Generator of the weather records for a set of stations.
+
+        Rows for other stations are skipped by their WBAN prefix before the
+        rest of the row is split. Blank values are given as 'NULL'.
+
+        :param fileObject: File object containing weather data.
+        :param stationIDs: Iterable of station IDs to be parsed.
+        :returns: Generator of NOAAWeatherRecord.
+        """
+
+        stations = frozenset(stationIDs if stationIDs else [])
+        lines = iter(fileObject)
+
+        def __stationLines():
+            for line in lines:
+                if line[:line.find(',')].strip('"') in stations:
+                    yield line
+
+        # Handle the header row and determine the last column.
+        header = next(csv.reader([next(lines, '')]), [])
+        lastCol = min(len(header), len(self.cols))
+        if lastCol < 3:
+            return
+        padding = ['NULL'] * (len(self.cols) - lastCol)
+
+        for row in csv.reader(__stationLines()):
+            if len(row) < lastCol:
+                continue
+
+            date = row[1]
+            time = row[2].zfill(4)
+            yield self.recordClass._make(
+                [row[0], '%s-%s-%s %s:%s' % (
+                    date[0:4], date[4:6], date[6:8], time[0:2], time[2:4])] + [
+                    col if col.strip() else 'NULL' for col in
+                    row[3:lastCol]] + padding)
+
     def parseWeatherData(self, fileObject, stationIDs):
         """
         :param fileObject: File object containing weather data.
@@ -52,79 +105,8 @@ class MSGNOAAWeatherDataParser(object):
         """
         self.logger.log('Data column count = %s' % len(self.cols), 'debug')
 
-        rowNum = 0
-        lastCol = 0
-
-        reader = csv.reader(fileObject)
-        self.data = []
-
-        for row in reader:
-            rowDict = {}
-
-            newDate = ''
-
-            # Handle the header row and determine the last column.
-            if rowNum == 0:
-                colNum = 0
-                for col in row:
-                    colNum += 1
-                lastCol = colNum
-
-            else:
-                colNum = 0
-
-                for col in row:
-
-                    if colNum == 0:
-                        if self.stationShouldBeProcessed(col, stationIDs):
-                            rowDict['wban'] = col
-                        else:
-                            # Skip station IDs not marked for processing.
-                            break
-
-                    elif colNum == 1: # date column
-                        newDate = '%s' % (
-                            (col[0:4]) + '-%s' % (col[4:6]) + '-%s' % (
-                                col[6:8]))
-
-                    elif colNum == 2: # time column
-                        time = col.zfill(4)
-                        rowDict['datetime'] = '%s %s:%s' % (
-                            newDate, time[0:2], time[2:4])
-                        newDate = ''
-                    else:
-                        try:
-                            rowDict[self.cols[colNum]] = '%s' % col
-                        except IndexError, e:
-                            print "Exception during first assignment: %s, " \
-                                  "Index = %s" % (
-                                      e, colNum)
-                    colNum += 1
-
-                    if colNum == lastCol:
-                        for i in range(0, lastCol - 1):
-
-                            try:
-                                if len(rowDict[self.cols[i]]) == 0 or len(
-                                        re.sub("\s+", "",
-                                               rowDict[self.cols[i]])) == 0:
-                                    rowDict[self.cols[i]] = 'NULL'
-
-                            except IndexError, e:
-                                print "Exception during second assignment: " \
-                                      "%s, Index = %s" % (
-                                          e, i)
-
-                        assert rowDict != {}, "Dict should never be empty."
-
-                        self.data.append(rowDict)
-
-                        # End for col
-
-            rowNum += 1
-
-            # End for row
-
+        self.data = [dict(zip(self.recordCols, record)) for record in
+                     self.weatherRecords(fileObject, stationIDs)]
         return self.data
 
 
@@ -138,8 +120,4 @@ class MSGNOAAWeatherDataParser(object):
 
         if stationIDs is None:
             stationIDs = []
-        for sid in stationIDs:
-            if myStationID == sid:
-                return True
-        return False
-        pass
+        return myStationID in set(stationIDs)
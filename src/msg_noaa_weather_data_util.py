@@ -40,6 +40,8 @@ class MSGWeatherDataUtil(object):
                                                        'weather_data_pattern')
         self.fileList = []
         self.dateList = [] # List of dates corresponding weather data files.
+        self.monthRanges = {} # Month (first day, last day) keyed by date part.
+        self.lastDateLoaded = None
         self.fillFileListAndDateList()
         self.dbUtil = MSGDBUtil()
 
@@ -78,22 +80,80 @@ class MSGWeatherDataUtil(object):
             return datetime.strftime('%Y-%m-%d')
 
 
-    def getLastDateLoaded(self, cursor):
+    def monthRange(self, filename = None):
+        """
+        Return the first and last days of the month of a NOAA weather data
+        filename.
+
+        :param filename: String of the filename such as QCLCD201208.zip.
+        :returns: Tuple of (first day, last day) as datetimes.
+        """
+
+        datePart = self.datePart(filename = filename)
+        if datePart not in self.monthRanges:
+            year = int(datePart[0:4])
+            month = int(datePart[4:6])
+            self.monthRanges[datePart] = (dt.datetime(year, month, 1),
+                                          dt.datetime(year, month,
+                                                      calendar.monthrange(
+                                                          year, month)[1]))
+        return self.monthRanges[datePart]
+
+
+    def getLastDateLoaded(self, cursor, useCache = False):
         """
         Return the last date of loaded weather data.
 
+        The date is kept so that later calls with useCache do not query the
+        database.
+
+        :param cursor: DB cursor.
+        :param useCache: If True, a previously fetched date is returned.
         :returns: Last date.
         """
 
+        if useCache and self.lastDateLoaded is not None:
+            return self.lastDateLoaded
+
         sql = """select wban, datetime, record_type from "%s"
                  ORDER BY datetime desc limit 1""" % WEATHER_DATA_TABLE
 
         self.dbUtil.executeSQL(cursor, sql)
         row = cursor.fetchone()
         # self.logger.log('Date last loaded = %s' % row[1], 'info')
+        self.lastDateLoaded = row[1]
         return row[1]
 
 
+    def fileMonthRanges(self, fileList, cursor = None, lastDate = None):
+        """
+        Month ranges of weather data files and whether each needs to be
+        reloaded.
+
+        A file needs to be reloaded when its month contains or is beyond
+        the last loaded date. The last loaded date is fetched at most once.
+
+        :param fileList: A list of files containing weather data.
+        :param cursor: DB cursor used when the last loaded date is not
+        given and has not been fetched.
+        :param lastDate: datetime of the last loaded data.
+        :returns: List of tuples of (filename, (first day, last day),
+        needs reload) in the order of the file list.
+        """
+
+        if lastDate is None:
+            lastDate = self.getLastDateLoaded(cursor, useCache = True)
+        self.logger.log('last date = %s' % lastDate)
+
+        ranges = []
+        for filename in fileList:
+            # The last day of the month is compared against the last loaded
+            # date.
+            monthRange = self.monthRange(filename = filename)
+            ranges.append((filename, monthRange, lastDate <= monthRange[1]))
+        return ranges
+
+
     def getKeepList(self, fileList, cursor):
         """
         The Keep List is the list of filenames of files containing data that are
@@ -105,32 +165,5 @@ class MSGWeatherDataUtil(object):
         :returns: List of weather data filenames to process.
         """
 
-        keepList = []
-        i = 0
-        for date in fileList:
-            self.logger.log('Examining date %s.' % date)
-
-            # The list date should be the last day of the month.
-            # It is the date that is compared against the last retrieved date.
-
-            listDate = dt.datetime.strptime(self.datePart(filename = date),
-                                            "%Y%m")
-            lastDay = calendar.monthrange(listDate.year, listDate.month)[1]
-            listDate = dt.datetime.strptime(
-                '%s-%s-%s' % (listDate.year, listDate.month, lastDay),
-                "%Y-%m-%d")
-            self.logger.log('List date = %s.' % listDate)
-            lastDate = self.getLastDateLoaded(cursor)
-
-            self.logger.log('last date = %s' % lastDate)
-
-            if lastDate <= listDate:
-                keepList.append((i, listDate))
-
-            i += 1
-
-        if keepList:
-            keepList.sort()
-
-        return [fileList[d[0]] for d in keepList]
-
+        return [filename for (filename, monthRange, needsReload) in
+                self.fileMonthRanges(fileList, cursor) if needsReload]
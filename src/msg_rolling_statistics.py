@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import csv
+import datetime
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from sek.logger import SEKLogger
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# Rows of windows computed together. Bounds the size of temporary arrays.
+BLOCK_SIZE = 64 * 1024
+
+
+class MSGRollingStatistics(object):
+    """
+    Vectorized rolling-window statistics for detecting flatlines in SCADA
+    data.
+
+    A flatline is a run of rows where the standard deviation of a column over
+    a window of windowSize values is at or below threshold for more than
+    minTime seconds. The run includes the row where the standard deviation
+    rises above the threshold. This is the condition tested, one row at a
+    time, by insertCleanSCADAVoltageAndTapData.py.
+
+    Missing values are NaN. A window consists of the windowSize most recent
+    values of a column that are not missing.
+
+    Usage:
+
+        stats = MSGRollingStatistics()
+        parser = MSGTimestampParser()
+        with open(csvPath) as f:
+            timestamps, values = stats.loadColumns(f, columnNumbers,
+                                                   timestampColumnNumber,
+                                                   parser.scadaTimestamp)
+        masks = stats.flatlineMasks(timestamps, values)
+
+    """
+
+    def __init__(self, windowSize = 20, threshold = 0.00001, minTime = 300,
+                 blockSize = BLOCK_SIZE):
+        """
+        Constructor.
+
+        :param windowSize: Int count of values in a window.
+        :param threshold: Standard deviation at or below which a window is
+        flat.
+        :param minTime: Seconds that a run of flat windows must exceed to be
+        a flatline.
+        :param blockSize: Int count of windows computed together.
+        """
+
+        self.logger = SEKLogger(__name__, 'info')
+        self.windowSize = windowSize
+        self.threshold = threshold
+        self.minTime = minTime
+        self.blockSize = blockSize
+
+
+    def loadColumns(self, fileObject, columnNumbers, timestampColumnNumber,
+                    parseTimestamp):
+        """
+        Load a block of columns from a SCADA CSV file.
+
+        Blank, NULL and other non-numeric values are loaded as NaN.
+
+        :param fileObject: File object of CSV data with a header row.
+        :param columnNumbers: List of column indices to be loaded.
+        :param timestampColumnNumber: Column index of the timestamp.
+        :param parseTimestamp: Callable that converts a timestamp string to a
+        datetime.
+        :returns: Tuple of (1-D array of timestamps in seconds since the
+        epoch, 2-D array of values with one column for each column number).
+        """
+
+        reader = csv.reader(fileObject)
+        next(reader)
+
+        timestamps = []
+        columns = [[] for _ in columnNumbers]
+        for row in reader:
+            timestamps.append(
+                (parseTimestamp(row[timestampColumnNumber]) -
+                 EPOCH).total_seconds())
+            for column, columnNumber in zip(columns, columnNumbers):
+                try:
+                    column.append(float(row[columnNumber]))
+                except (IndexError, ValueError):
+                    column.append(np.nan)
+
+        values = np.empty((len(timestamps), len(columnNumbers)))
+        for i, column in enumerate(columns):
+            values[:, i] = column
+        return np.array(timestamps, dtype = np.float64), values
+
+
+    def rollingVariance(self, values):
+        """
+        Sample variance of every window of consecutive values.
+
+        Window sums are differences of cumulative sums, which take a constant
+        number of operations per window but lose precision as the sums grow
+        and cancel when the data is nearly constant. The sums are therefore
+        restarted for each block of windows, with the data shifted by a value
+        in the block, and every window whose variance is within the rounding
+        error bound of the threshold is recalculated directly from its
+        values. The windows recalculated are the flat windows and their
+        neighbours, which are a small part of real data.
+
+        :param values: 1-D array of values without NaN.
+        :returns: 1-D array of len(values) - windowSize + 1 variances. Item i
+        is the variance of values[i:i + windowSize].
+        """
+
+        w = self.windowSize
+        values = np.ascontiguousarray(values, dtype = np.float64)
+        windowCount = len(values) - w + 1
+        if windowCount <= 0:
+            return np.empty(0)
+
+        variance = np.empty(windowCount)
+        eps = np.finfo(np.float64).eps
+        for start in xrange(0, windowCount, self.blockSize):
+            stop = min(start + self.blockSize, windowCount)
+            block = values[start:stop + w - 1]
+
+            shifted = block - block[0]
+            sums = np.zeros(len(block) + 1)
+            np.cumsum(shifted, out = sums[1:])
+            squareSums = np.zeros(len(block) + 1)
+            np.cumsum(shifted * shifted, out = squareSums[1:])
+
+            s1 = sums[w:] - sums[:-w]
+            s2 = squareSums[w:] - squareSums[:-w]
+            blockVariance = (s2 - s1 * s1 / w) / (w - 1)
+
+            # Worst case rounding error of the cumulative sums.
+            tolerance = 4 * len(block) * eps * (
+                squareSums[-1] + np.abs(sums).max() ** 2 / w) / (w - 1)
+            candidates = np.flatnonzero(
+                blockVariance <= self.threshold ** 2 + tolerance)
+            if candidates.size:
+                windows = as_strided(block, shape = (len(block) - w + 1, w),
+                                     strides = block.strides * 2)
+                blockVariance[candidates] = windows[candidates].var(axis = 1,
+                                                                    ddof = 1)
+
+            variance[start:stop] = blockVariance
+        return variance
+
+
+    def rollingStandardDeviation(self, values):
+        """
+        :param values: 2-D array of values with NaN for missing values.
+        :returns: 2-D array, of the shape of values, of the standard deviation
+        of the window ending at each value. It is NaN for missing values and
+        for the first windowSize - 1 values of each column.
+        """
+
+        values = np.asarray(values, dtype = np.float64)
+        deviations = np.empty(values.shape)
+        deviations.fill(np.nan)
+        for i in xrange(values.shape[1]):
+            rows = np.flatnonzero(~np.isnan(values[:, i]))
+            variance = self.rollingVariance(values[rows, i])
+            deviations[rows[self.windowSize - 1:], i] = np.sqrt(variance)
+        return deviations
+
+
+    def flatlineRuns(self, timestamps, deviations):
+        """
+        :param timestamps: 1-D array of timestamps in seconds.
+        :param deviations: 1-D array of rolling standard deviations with NaN
+        for missing values.
+        :returns: List of (begin, end) row indices, inclusive, of flatlines.
+        """
+
+        rows = np.flatnonzero(~np.isnan(deviations))
+        if not rows.size:
+            return []
+
+        flat = np.zeros(rows.size + 2, dtype = np.int8)
+        flat[1:-1] = deviations[rows] <= self.threshold
+        changes = np.diff(flat)
+        begins = np.flatnonzero(changes == 1)
+        # A run ends with the first value above the threshold or with the
+        # last value.
+        ends = np.minimum(np.flatnonzero(changes == -1), rows.size - 1)
+
+        begins, ends = rows[begins], rows[ends]
+        flatlines = timestamps[ends] - timestamps[begins] > self.minTime
+        return zip(begins[flatlines].tolist(), ends[flatlines].tolist())
+
+
+    def flatlineMasks(self, timestamps, values):
+        """
+        Find the flatlines of all columns.
+
+        :param timestamps: 1-D array of timestamps in seconds.
+        :param values: 2-D array of values with NaN for missing values.
+        :returns: Boolean 2-D array, of the shape of values, that is True for
+        rows in a flatline of the column.
+        """
+
+        timestamps = np.asarray(timestamps, dtype = np.float64)
+        masks = np.zeros(np.shape(values), dtype = bool)
+        for i in xrange(masks.shape[1]):
+            # One column at a time to limit memory use.
+            deviations = self.rollingStandardDeviation(values[:, i:i + 1])
+            counts = np.zeros(len(timestamps) + 1, dtype = np.int64)
+            for begin, end in self.flatlineRuns(timestamps, deviations[:, 0]):
+                counts[begin] += 1
+                counts[end + 1] -= 1
+            masks[:, i] = np.cumsum(counts[:-1]) > 0
+        return masks
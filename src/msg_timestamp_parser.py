@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import calendar
+import datetime
+
+MONTHS = {'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+          'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12}
+
+# Values of two-digit fields. The raw SCADA data calls the 0 hour 24.
+TWO_DIGITS = dict(('{:02d}'.format(i), i) for i in range(61))
+HOURS = dict((k, v) for k, v in TWO_DIGITS.items() if v < 24)
+HOURS['24'] = 0
+
+# NREL fields are not zero padded.
+NUMBERS = dict((str(i), i) for i in range(61))
+HOURS_AND_MINUTES = dict(
+    (str(h * 100 + m), (h, m)) for h in range(24) for m in range(60))
+
+
+def daysOfYear(leap):
+    """
+    :param leap: True for a leap year.
+    :returns: List of (month, day) indexed by day of the year, starting at 1.
+    """
+
+    year = 2000 if leap else 2001
+    days = [None]
+    for month in range(1, 13):
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            days.append((month, day))
+    return days
+
+
+DAYS_OF_YEAR = {False: daysOfYear(False), True: daysOfYear(True)}
+
+# Count of parsed timestamps kept for reuse.
+MEMO_SIZE = 100000
+
+
+class MSGTimestampParser(object):
+    """
+    Parsers for the timestamps of SCADA and NREL data files.
+
+    Fields are converted with lookup tables instead of int() and the date
+    part of a timestamp is parsed once per day. SCADA timestamps have a
+    fixed layout and are parsed by slicing. They are also memoized by the
+    timestamp string truncated to the second, so repeated timestamps, and
+    timestamps that only differ by milliseconds, are parsed once.
+
+    Usage:
+
+        parser = MSGTimestampParser()
+        parser.scadaTimestamp('Sun Sep 01 2013 24:00:00.000 GMT-1000')
+        parser.nrelTimestamp('30', '2012', '245', '1315')
+
+    """
+
+    def __init__(self, memoSize = MEMO_SIZE):
+        """
+        Constructor.
+
+        :param memoSize: Int count of parsed timestamps kept for reuse.
+        """
+
+        self.memoSize = memoSize
+        self.memo = {}
+        # (year, month, day) keyed by the date part of timestamps.
+        self.scadaDates = {}
+        self.nrelDates = {}
+
+
+    def scadaDate(self, dateStr):
+        """
+        :param dateStr: String like Sep 01 2013.
+        :returns: Tuple of (year, month, day).
+        :raises: KeyError, ValueError if the string is not a SCADA date.
+        """
+
+        if dateStr[3] != ' ' or dateStr[6] != ' ' or len(dateStr) != 11:
+            raise ValueError
+        date = (int(dateStr[7:11]), MONTHS[dateStr[:3].lower()],
+                TWO_DIGITS[dateStr[4:6]])
+        # Validate the day of the month.
+        datetime.date(*date)
+        self.scadaDates[dateStr] = date
+        return date
+
+
+    def scadaTimestamp(self, datetimeStr):
+        """
+        Parse a SCADA timestamp. The UTC offset and the milliseconds are
+        discarded.
+
+        The raw data calls the 0 hour 24, and it is parsed as hour 0 of the
+        same day.
+
+        :param datetimeStr: String like Sun Sep 01 2013 24:00:00.000 GMT-1000.
+        :returns: datetime.
+        :raises: ValueError if the string is not a SCADA timestamp.
+        """
+
+        key = datetimeStr[:24]
+        timestamp = self.memo.get(key)
+        if timestamp is not None:
+            return timestamp
+
+        try:
+            date = self.scadaDates.get(key[4:15]) or self.scadaDate(key[4:15])
+            if key[15] != ' ' or key[18] != ':' or key[21] != ':':
+                raise ValueError
+            timestamp = datetime.datetime(date[0], date[1], date[2],
+                                          HOURS[key[16:18]],
+                                          TWO_DIGITS[key[19:21]],
+                                          TWO_DIGITS[key[22:24]])
+        except (IndexError, KeyError, ValueError):
+            raise ValueError(
+                'Invalid SCADA timestamp: {}'.format(datetimeStr))
+
+        if len(self.memo) >= self.memoSize:
+            self.memo.clear()
+        self.memo[key] = timestamp
+        return timestamp
+
+
+    def nrelTimestamp(self, second, year, dayOfYear, hourAndMinute):
+        """
+        Parse the time columns of NREL irradiance data.
+
+        :param second: String of the second.
+        :param year: String of the year.
+        :param dayOfYear: String of the Julian day, starting at 1.
+        :param hourAndMinute: String of the hour and minute as HHMM.
+        :returns: datetime.
+        :raises: ValueError if a field is out of range.
+        """
+
+        date = self.nrelDates.get((year, dayOfYear))
+        if date is None:
+            date = self.nrelDate(year, dayOfYear)
+        try:
+            hour, minute = HOURS_AND_MINUTES[hourAndMinute]
+            second = NUMBERS[second]
+        except KeyError:
+            hour, minute = divmod(int(hourAndMinute), 100)
+            second = int(second)
+        return datetime.datetime(date[0], date[1], date[2], hour, minute,
+                                 second)
+
+
+    def nrelDate(self, year, dayOfYear):
+        """
+        :param year: String of the year.
+        :param dayOfYear: String of the Julian day, starting at 1.
+        :returns: Tuple of (year, month, day).
+        :raises: ValueError if the day is not in the year.
+        """
+
+        days = DAYS_OF_YEAR[calendar.isleap(int(year))]
+        if not 1 <= int(dayOfYear) < len(days):
+            raise ValueError(
+                'Day {} is not in the year {}.'.format(dayOfYear, year))
+        date = (int(year),) + days[int(dayOfYear)]
+        self.nrelDates[(year, dayOfYear)] = date
+        return date
@@ -24,6 +24,15 @@ class MSGAggregationTypes(Enum):
     irradiance = 4
 
 
+class MSGAggregationEngines(Enum):
+    """
+    Engines for performing aggregation.
+    """
+    python = 1
+    sql = 2
+    numpy = 3
+
+
 class MSGNotificationHistoryTypes(Enum):
     """
     Types for the notification history.
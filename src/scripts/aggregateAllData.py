@@ -19,9 +19,9 @@ after the time of aggregation.
 This script enables aggregation and loading of aggregated data while not
 terminating when duplicate key errors are encountered.
 
-The following flags invoked here, exitOnError
-and commitOnEveryInsert, allow the ability to work around duplicate key
-errors and the lack of commits due to errors occurring within a transaction.
+The following flags invoked here, bulkInsert and upsert, load each month of
+aggregated data with a single COPY and replace existing aggregated data for
+the same intervals so that reruns do not produce duplicate key errors.
 
 """
 
@@ -51,8 +51,7 @@ class AllDataAggregator(object):
         Constructor.
         """
         self.logger = SEKLogger(__name__, 'DEBUG')
-        self.aggregator = MSGDataAggregator(exitOnError = False,
-                                            commitOnEveryInsert = True)
+        self.aggregator = MSGDataAggregator(bulkInsert = True, upsert = True)
         self.notifier = MSGNotifier()
 
         # Available types are in ['weather', 'egauge', 'circuit', 'irradiance'].
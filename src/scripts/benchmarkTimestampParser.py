@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark MSGTimestampParser against the functions it replaced in
+insertCleanSCADAVoltageAndTapData.py and insertNRELIrradianceData.py, and
+against the equivalent strptime calls.
+
+The replaced functions are kept here as baselines. They are checked to agree
+with the parser before they are timed.
+
+Usage:
+
+python benchmarkTimestampParser.py
+
+"""
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import datetime
+import timeit
+from msg_timestamp_parser import MSGTimestampParser
+
+COUNT = 100000
+
+
+def legacySCADATimestamp(datetimeStr):
+    """
+    getTimestamp of insertCleanSCADAVoltageAndTapData.py before it used
+    MSGTimestampParser.
+
+    :param datetimeStr: String like Sun Sep 01 2013 24:00:00.000 GMT-1000.
+    :returns: datetime.
+    """
+
+    guava = datetimeStr.split(".")
+    guava1 = guava[0].split(" ")
+    month = guava1[1]
+    day = guava1[2]
+    year = guava1[3]
+    time = guava1[4].split(":")
+    # The raw data calls the 0 hour 24, rather than 0
+    if time[0] == "24":
+        time[0] = 0
+    hour = time[0]
+    minute = time[1]
+    second = time[2]
+
+    if month.lower() == "jan":
+        month = 1
+    elif month.lower() == "feb":
+        month = 2
+    elif month.lower() == "mar":
+        month = 3
+    elif month.lower() == "apr":
+        month = 4
+    elif month.lower() == "may":
+        month = 5
+    elif month.lower() == "jun":
+        month = 6
+    elif month.lower() == "jul":
+        month = 7
+    elif month.lower() == "aug":
+        month = 8
+    elif month.lower() == "sep":
+        month = 9
+    elif month.lower() == "oct":
+        month = 10
+    elif month.lower() == "nov":
+        month = 11
+    elif month.lower() == "dec":
+        month = 12
+
+    return datetime.datetime(int(year), month, int(day), int(hour),
+                             int(minute), int(second))
+
+
+def legacyIsLeapYear(year):
+    """
+    is_leap_year of insertNRELIrradianceData.py.
+
+    :param year: The year.
+    :returns: 1 if the year is a leap year, 0 otherwise.
+    """
+
+    year = int(year)
+    if (year % 400) == 0:
+        leap = 1
+    elif (year % 100) == 0:
+        leap = 0
+    elif (year % 4) == 0:
+        leap = 1
+    else:
+        leap = 0
+    return leap
+
+
+def legacyNRELTimestamp(row):
+    """
+    get_timestamp of insertNRELIrradianceData.py before it used
+    MSGTimestampParser.
+
+    :param row: List of the second, year, day of year and HHMM strings.
+    :returns: datetime.
+    """
+
+    second = int(row[0])
+    year = int(row[1])
+    julianDay = int(row[2])
+    hour = int(row[3][:-2])
+    minute = int(row[3][-2:])
+    if legacyIsLeapYear(year) == 1:
+        if 1 <= julianDay < 32:
+            month = 1
+            day = julianDay
+        if 32 <= julianDay < 61:
+            month = 2
+            day = julianDay - 31
+        if 61 <= julianDay < 92:
+            month = 3
+            day = julianDay - 60
+        if 92 <= julianDay < 122:
+            month = 4
+            day = julianDay - 91
+        if 122 <= julianDay < 153:
+            month = 5
+            day = julianDay - 121
+        if 153 <= julianDay < 183:
+            month = 6
+            day = julianDay - 152
+        if 183 <= julianDay < 214:
+            month = 7
+            day = julianDay - 182
+        if 214 <= julianDay < 245:
+            month = 8
+            day = julianDay - 213
+        if 245 <= julianDay < 275:
+            month = 9
+            day = julianDay - 244
+        if 275 <= julianDay < 306:
+            month = 10
+            day = julianDay - 274
+        if 306 <= julianDay < 336:
+            month = 11
+            day = julianDay - 305
+        if 336 <= julianDay <= 366:
+            month = 12
+            day = julianDay - 335
+    else:
+        if 1 <= julianDay < 32:
+            month = 1
+            day = julianDay
+        if 32 <= julianDay < 60:
+            month = 2
+            day = julianDay - 31
+        if 60 <= julianDay < 91:
+            month = 3
+            day = julianDay - 59
+        if 91 <= julianDay < 121:
+            month = 4
+            day = julianDay - 90
+        if 121 <= julianDay < 152:
+            month = 5
+            day = julianDay - 120
+        if 152 <= julianDay < 182:
+            month = 6
+            day = julianDay - 151
+        if 182 <= julianDay < 213:
+            month = 7
+            day = julianDay - 181
+        if 213 <= julianDay < 244:
+            month = 8
+            day = julianDay - 212
+        if 244 <= julianDay < 274:
+            month = 9
+            day = julianDay - 243
+        if 274 <= julianDay < 305:
+            month = 10
+            day = julianDay - 273
+        if 305 <= julianDay < 335:
+            month = 11
+            day = julianDay - 304
+        if 335 <= julianDay <= 365:
+            month = 12
+            day = julianDay - 334
+    return datetime.datetime(year, month, day, hour, minute, second)
+
+
+if __name__ == '__main__':
+    parser = MSGTimestampParser()
+
+    start = datetime.datetime(2013, 9, 1)
+    scadaRows = [(start + datetime.timedelta(seconds = i)).strftime(
+        '%a %b %d %Y %H:%M:%S.000 GMT-1000') for i in range(COUNT)]
+
+    def legacySCADA():
+        for s in scadaRows:
+            legacySCADATimestamp(s)
+
+    def strptimeSCADA():
+        for s in scadaRows:
+            datetime.datetime.strptime(s[4:24], '%b %d %Y %H:%M:%S')
+
+    def parseSCADA():
+        parser.memo.clear()
+        parser.scadaDates.clear()
+        for s in scadaRows:
+            parser.scadaTimestamp(s)
+
+    def parseRepeatedSCADA():
+        for s in scadaRows:
+            parser.scadaTimestamp(s)
+
+    nrelRows = [('30', str(2012 + i % 2), str(i % 365 + 1), '1315') for i in
+                range(COUNT)]
+
+    def legacyNREL():
+        for row in nrelRows:
+            legacyNRELTimestamp(row)
+
+    def strptimeNREL():
+        for row in nrelRows:
+            datetime.datetime.strptime(' '.join(row), '%S %Y %j %H%M')
+
+    def parseNREL():
+        parser.nrelDates.clear()
+        for row in nrelRows:
+            parser.nrelTimestamp(*row)
+
+    # The baselines and the parser must agree before they are timed.
+    assert [legacySCADATimestamp(s) for s in scadaRows] == [
+        parser.scadaTimestamp(s) for s in scadaRows]
+    assert [legacyNRELTimestamp(row) for row in nrelRows] == [
+        parser.nrelTimestamp(*row) for row in nrelRows]
+
+    results = []
+    for name, f in [('SCADA legacy', legacySCADA),
+                    ('SCADA strptime', strptimeSCADA),
+                    ('SCADA parser', parseSCADA),
+                    ('SCADA parser, repeated', parseRepeatedSCADA),
+                    ('NREL legacy', legacyNREL),
+                    ('NREL strptime', strptimeNREL),
+                    ('NREL parser', parseNREL)]:
+        seconds = min(timeit.repeat(f, repeat = 3, number = 1))
+        results.append((name, seconds))
+    baselines = dict((name.split()[0], seconds) for name, seconds in results
+                     if name.endswith('legacy'))
+    for name, seconds in results:
+        print '{:<24} {:.2f} us per row, {:.1f}x legacy'.format(
+            name, seconds / COUNT * 1e6, baselines[name.split()[0]] / seconds)
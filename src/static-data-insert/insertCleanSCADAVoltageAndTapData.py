@@ -24,17 +24,38 @@ percent of the total data. Still, it bears mention. Currently, the script is
 written to create files for the Wailea transformer voltages, irradiance 
 data, and circuits 1517 and 1518.
 
+Blank-line trimming and flatline detection for all of the monitored columns
+are performed in a single pass over each file that writes the cleaned file
+directly.
+
 Running time is a couple of minutes.
 """
 
 import csv
+import collections
 import sys
 import subprocess
-import datetime
 import os
 import math
 from msg_db_connector import MSGDBConnector
-from msg_db_util import MSGDBUtil
+from msg_csv_bulk_loader import MSGCSVBulkLoader
+from msg_timestamp_parser import MSGTimestampParser
+
+# Flatline detection parameters: a window of WINDOW_SIZE values whose
+# standard deviation is at or below THRESHOLD for more than MIN_TIME seconds
+# is treated as bad data.
+MIN_TIME = 300
+WINDOW_SIZE = 20
+THRESHOLD = 0.00001
+
+# Keys, from getColumns(), of the columns that are checked for flatlines.
+FLATLINE_COLUMNS = ['transformerVltACol', 'transformerVltBCol',
+					'transformerVltCCol', 'mw1517Col', 'mw1518Col',
+					'mvar1517Col', 'mvar1518Col', 'batteryKvar', 'batteryKw',
+					'batterySoc', 'batteryVolt']
+
+# Timestamps are parsed for both the cleaning and the splitting passes.
+timestampParser = MSGTimestampParser()
 
 def getCleanName(name):
 	"""
@@ -56,49 +77,7 @@ def getTimestamp(datetimeStr):
 	:returns: The corresponding datetime.datetime object
 	"""
 
-	# We're parsing the string into a list of the days, minutes, etc.
-	guava = datetimeStr.split(".")
-	guava1 = guava[0].split(" ")
-	month = guava1[1]
-	day = guava1[2]
-	year = guava1[3]
-	time = guava1[4].split(":")
-	# The raw data calls the 0 hour 24, rather than 0
-	if time[0] == "24":
-		time[0] = 0
-	hour = time[0]
-	minute = time[1]
-	second = time[2]
-
-	if month.lower() == "jan":
-		month = 1
-	elif month.lower() == "feb":
-		month = 2
-	elif month.lower() == "mar":
-		month = 3
-	elif month.lower() == "apr":
-		month = 4
-	elif month.lower() == "may":
-		month = 5
-	elif month.lower() == "jun":
-		month = 6
-	elif month.lower() == "jul":
-		month = 7
-	elif month.lower() == "aug":
-		month = 8
-	elif month.lower() == "sep":
-		month = 9
-	elif month.lower() == "oct":
-		month = 10
-	elif month.lower() == "nov":
-		month =11 
-	elif month.lower() == "dec":
-		month =12 
-
-	# We can finally make a Python datetime object, now
-	timestamp = datetime.datetime(int(year), month, int(day), int(hour),
-								  int(minute), int(second))
-	return timestamp
+	return timestampParser.scadaTimestamp(datetimeStr)
 
 def getColumnNumber(header, desiredValue):
 	"""
@@ -224,156 +203,83 @@ def calculateOnlineVariance(data):
 	variance = M2/(n-1)
 	return variance
 
-def voltageStandardDeviationAlgorithm(reader, filename, unit, columnNumber, 
-									  timestampColumnNumber):     
-	"""     
-	Uses a sliding window to measure the standard deviation, notifies the user 
-	via the console when the std. dev. falls beneath a threshold indicating 
-	the meter readings are unchanging for a given minimum number of seconds.
-
-	:param reader: A CSV reader.
-	:param filename: Name of the output file to be created.
-	:param unit: The item of the CSV to be analyzed.
-	:param columnNumber: The column # of the item.
-	:param timestampColumnNumber: The column # of the timestamp.
+class FlatlineDetector(object):
 	"""
+	Rolling standard deviation of a single column along with the state of the
+	current run of rows where the standard deviation is at or below THRESHOLD.
 
-	MIN_TIME = 300
-	windowSize = 20
-	THRESHOLD = 0.00001
-	i, avg, variance, rollingStdDev = 0, 0, 0, 0
-	window = []
-	event = False
-	beginString = ""
-	begin = None
-	blankRowSequence = False
-
-	# We're gonna sort everything into two files.
-	badDataFile = file(filename, 'w+')
-	badDataWriter = csv.writer(badDataFile)
-	rows = []
-	header = ["timestamp", unit]
-	badDataWriter.writerow(header)
-
-	# Jettison the header line.
-	columnName = reader.next()[columnNumber]
-
-	# We still need to initialize the window and related variables.
-	while i < windowSize:
-		i += 1
-		row = reader.next()
-		# In case we encounter a blank row (although this should've been 
-		# cleaned up before this function was called).
-		if row[columnNumber] == '':
-			i -= 1
-			continue
-		window.append(float(row[columnNumber]))
-
-	avg = reduce(lambda x, y: x + y, window) / len(window)
-	variance = calculateOnlineVariance(window)
-	cumulativeStdDev = math.sqrt(variance)
-
-	for row in reader:
-		vlt = float(row[columnNumber])
-		timestamp = getTimestamp(row[timestampColumnNumber])
-		newRow = [row[timestampColumnNumber], row[columnNumber]]
-		avg = reduce(lambda x, y: x + y, window) / len(window)
-		variance, rollingStdDev = slidingStandardDeviationCalc(avg, 
-								  variance, window[0], vlt, len(window))
-		# Drop the first item and slide the window forward.
-		del window[0]
-		window.append(vlt)
-
-		# This logic is for marking and printing when an event occurs, as well
-		# as keeping a list of the rows that may or may not be in the set of
-		# good data and writing the new files.
-		if event and rollingStdDev > THRESHOLD:
-			rows.append(newRow)
-
-			if (timestamp - begin).total_seconds() > MIN_TIME:
-				print "Standard deviation for", str(columnName), "fell to", \
-					  THRESHOLD, "or lower for the following duration:"
-				print "\tBegin:\t", beginString[4:-13], "\n\tEnd:\t", \
-					  row[timestampColumnNumber][4:-13]
-				badDataWriter.writerows(rows)
-
-			rows = []
-			event = False
-		
-		elif not event and rollingStdDev <= THRESHOLD:
-			rows.append(newRow)
-			event = True
-			begin = timestamp
-			beginString = row[timestampColumnNumber]
-		
-		elif event: 
-			rows.append(newRow)
-
-	# CASE: We reach the end of the file but any of the flags are still set,
-	# which means we should print a note of that:
-	if event:
-		print "Reached end of file with the flag set."
-		print "Begin:\t" + beginString
-
-		if (timestamp - begin).total_seconds() > MIN_TIME:
-			badDataWriter.writerows(rows)
-
-	print "\nStandardDeviationAlgorithm's run for", unit, "is complete.\n"
-
-def writeNullsIntoCsv(badDataCsv, originalCsv, newFile, columnNumber, timestampColumnNumber):
-	"""
-	Given the output of voltageStandardDeviationAlgorithm file and the file 
-	from which it was derived, write NULL values into the field (indicated by 
-	columnNumber) where timestamps from each file correspond.
-
-	:param badDataCsv: The CSV file containing rows to be removed.
-	:param originalCsv: The CSV file from which to remove the rows.
-	:param newFile: The output file.
-	:param columnNumber: The column to be overwritten.
-	:param timestampColumnNumber: The column # of the timestamp.
+	The rolling mean and variance are updated in constant time per row. They
+	are recalculated from the window once per window length so that floating
+	point error does not accumulate.
 	"""
-	
-	print "Overwriting bad data from", badDataCsv.name, "w/ blank (null) values."
-	original_reader = csv.reader(originalCsv)
-	badDataReader = csv.reader(badDataCsv)
-	newFileWriter = csv.writer(newFile)
-	# Write the header to thw new file and index over the header from the other input file.
-	newFileWriter.writerow(original_reader.next())
-	badDataReader.next()
-	
-	for badDataRow in badDataReader:
-		originalRow = original_reader.next()
-		originalTimestamp = getTimestamp(originalRow[timestampColumnNumber])
-		badDataTimestamp = getTimestamp(badDataRow[0])
-	
-		while (originalTimestamp - badDataTimestamp).total_seconds() < 0:
-			newFileWriter.writerow(originalRow)
-			originalRow = original_reader.next()
-			originalTimestamp = getTimestamp(originalRow[timestampColumnNumber])
-	
-		if (originalTimestamp - badDataTimestamp).total_seconds() == 0:
-			originalRow[columnNumber] = "NULL"
-	
-		if (originalTimestamp - badDataTimestamp).total_seconds() > 0:
-			print "ERROR: total_seconds > 0"
-			print (originalTimestamp - badDataTimestamp).total_seconds()
-			print "Original ts:", originalTimestamp
-			print "Bad data ts:", badDataTimestamp
-			return
-	
-		newFileWriter.writerow(originalRow)
-	
-	for remainingRow in original_reader:
-		newFileWriter.writerow(remainingRow)
 
-def trimBlankLines(inputFile, columns, timestampColumnNumber):
+	def __init__(self, name, columnNumber, windowSize = WINDOW_SIZE):
+		"""
+		:param name: The name of the column.
+		:param columnNumber: The column # of the item.
+		:param windowSize: The number of items in the window.
+		"""
+
+		self.name = name
+		self.columnNumber = columnNumber
+		self.windowSize = windowSize
+		self.window = collections.deque()
+		self.avg, self.variance, self.count = 0, 0, 0
+
+		# Row index, timestamp and timestamp string of the first row of the
+		# current run or None when there is no run.
+		self.beginIndex = None
+		self.begin = None
+		self.beginString = ""
+		# Set when the current run has lasted longer than MIN_TIME.
+		self.flatline = False
+
+	def update(self, x_n):
+		"""
+		Slide the window forward.
+
+		:param x_n: The item to be counted into the window.
+		:returns: The rolling standard deviation or None while the window is
+				  being filled.
+		"""
+
+		window = self.window
+		if len(window) < self.windowSize:
+			window.append(x_n)
+			if len(window) == self.windowSize:
+				self.avg = math.fsum(window) / self.windowSize
+				self.variance = calculateOnlineVariance(window)
+			return None
+
+		x_0 = window.popleft()
+		window.append(x_n)
+		self.variance, rollingStdDev = slidingStandardDeviationCalc(self.avg,
+									   self.variance, x_0, x_n, self.windowSize)
+		self.avg = self.avg + (x_n - x_0) / self.windowSize
+
+		self.count += 1
+		if self.count % self.windowSize == 0:
+			self.avg = math.fsum(window) / self.windowSize
+			self.variance = calculateOnlineVariance(window)
+			rollingStdDev = math.sqrt(self.variance)
+
+		return rollingStdDev
+
+def cleanSCADAFile(inputFile, detectors, columns, timestampColumnNumber):
 	"""
-	Given an input CSV file, scan through the rows for lines with blank 
-	values for the columns, whatever they may be, and elide those (and only
-	those) from the output file.
+	Given an input CSV file, write a copy that elides rows with blank values
+	for all of the given columns and that has NULL values in place of
+	flatline data, in a single pass.
+
+	A flatline is a run of rows where the rolling standard deviation of a
+	column is at or below THRESHOLD for more than MIN_TIME seconds. The run
+	includes the row where the standard deviation rises above THRESHOLD. Rows
+	are held in memory only while a run that may become a flatline is in
+	progress.
 
 	:param inputFile: A CSV file
-	:param columns: A list of column indices to be checked for blank entries. 
+	:param detectors: A list of FlatlineDetectors for the monitored columns.
+	:param columns: A list of column indices to be checked for blank entries.
 	:param timestampColumnNumber: The column # of the timestamp.
 	:returns: The output file containing no blank lines.
 	"""
@@ -384,8 +290,14 @@ def trimBlankLines(inputFile, columns, timestampColumnNumber):
 	writer = csv.writer(outputFile)
 	blankRowSequence = False
 
-	# When finding a sequence of rows with blank voltage values, we find its
-	# beginning and end, and print the findings to std i/o.
+	writer.writerow(reader.next())
+
+	# Rows that have not been written yet, beginning with row index
+	# pendingIndex.
+	pending = []
+	pendingIndex = 0
+	index = -1
+
 	for row in reader:
 		allColumnsBlank = True
 
@@ -394,18 +306,82 @@ def trimBlankLines(inputFile, columns, timestampColumnNumber):
 				allColumnsBlank = False
 				break
 
-		if not allColumnsBlank:
-			writer.writerow(row)
+		# When finding a sequence of rows with blank voltage values, we find
+		# its beginning and end, and print the findings to std i/o.
+		if allColumnsBlank:
+			if not blankRowSequence:
+				startBlankRowSequence = row[timestampColumnNumber]
+				blankRowSequence = True
+			continue
 
-			if blankRowSequence:
-				blankRowSequence = False
-				print "Sequence of blank rows found:\n\tBegin:\t", \
-					startBlankRowSequence[4:-13],"\n\tEnd:\t", \
-					row[timestampColumnNumber][4:-13]
+		if blankRowSequence:
+			blankRowSequence = False
+			print "Sequence of blank rows found:\n\tBegin:\t", \
+				startBlankRowSequence[4:-13],"\n\tEnd:\t", \
+				row[timestampColumnNumber][4:-13]
+
+		index += 1
+		pending.append(row)
+		timestamp = None
+
+		for detector in detectors:
+			value = row[detector.columnNumber]
+			if value == '' or value == 'NULL':
+				continue
+
+			rollingStdDev = detector.update(float(value))
+			if rollingStdDev is None:
+				continue
+
+			if detector.beginIndex is None:
+				if rollingStdDev <= THRESHOLD:
+					if timestamp is None:
+						timestamp = getTimestamp(row[timestampColumnNumber])
+					detector.beginIndex = index
+					detector.begin = timestamp
+					detector.beginString = row[timestampColumnNumber]
+					detector.flatline = False
+				continue
+
+			if not detector.flatline:
+				if timestamp is None:
+					timestamp = getTimestamp(row[timestampColumnNumber])
+				if (timestamp - detector.begin).total_seconds() > MIN_TIME:
+					detector.flatline = True
+					for heldRow in pending[detector.beginIndex - pendingIndex:]:
+						heldRow[detector.columnNumber] = "NULL"
+
+			if detector.flatline:
+				row[detector.columnNumber] = "NULL"
+
+			if rollingStdDev > THRESHOLD:
+				if detector.flatline:
+					print "Standard deviation for", str(detector.name), \
+						  "fell to", THRESHOLD, \
+						  "or lower for the following duration:"
+					print "\tBegin:\t", detector.beginString[4:-13], \
+						  "\n\tEnd:\t", row[timestampColumnNumber][4:-13]
+				detector.beginIndex = None
+				detector.flatline = False
+
+		# Write the rows that can no longer become part of a flatline.
+		heldIndex = min([detector.beginIndex for detector in detectors if
+						 detector.beginIndex is not None and
+						 not detector.flatline] or [index + 1])
+		if heldIndex > pendingIndex:
+			writer.writerows(pending[:heldIndex - pendingIndex])
+			del pending[:heldIndex - pendingIndex]
+			pendingIndex = heldIndex
+
+	writer.writerows(pending)
 
-		elif not blankRowSequence:
-			startBlankRowSequence = row[timestampColumnNumber]
-			blankRowSequence = True
+	# CASE: We reach the end of the file but any of the flags are still set,
+	# which means we should print a note of that:
+	for detector in detectors:
+		if detector.beginIndex is not None:
+			print "Reached end of file with the flag set for", \
+				  str(detector.name) + "."
+			print "Begin:\t" + detector.beginString
 
 	return outputFile
 
@@ -512,13 +488,13 @@ def writeSeparateFiles(reader, columns):
 						row[columns['batteryVolt']]]
 				writerBattery.writerow(newRowBattery)
 
-		except IndexError:
+		except (IndexError, ValueError):
 			i += 1
 			stinkers.append(row)
 			continue
 
 	if i > 0:
-		print 'Raised IndexError exception', i, 'times in', j, 'lines copied '\
+		print 'Raised an exception', i, 'times in', j, 'lines copied '\
 			  'during generation of the split files. This (these) bad row(s) '\
 			  'raised exceptions:'
 
@@ -534,34 +510,13 @@ def insertData(files, table, cols, testing = False):
 	:param cols: A list of the columns (as strings) in the table.
 	:param testing: Specify whether to use test (false by default).
 	"""
-	connector = MSGDBConnector()
+	connector = MSGDBConnector(testing = testing)
 	conn = connector.connectDB()
-	dbUtil = MSGDBUtil()
-	cursor = conn.cursor()
-
-	cnt = 0
+	loader = MSGCSVBulkLoader(conn, '"%s"' % table, cols,
+							  transforms = dict.fromkeys(cols, str.strip))
 
 	for file in files:
-
-		with open(file, 'r') as csvfile:
-			reader = csv.reader(csvfile, delimiter = ',')
-			# Skip the header line.
-			reader.next()
-			for row in reader:
-				sql = """INSERT INTO "%s" (%s) VALUES (%s)""" % (
-					table, ','.join(cols),
-					','.join("'" + item.strip() + "'" for item in row))
-
-				sql = sql.replace("'NULL'", 'NULL')
-
-				dbUtil.executeSQL(cursor, sql)
-
-				cnt += 1
-				if cnt % 10000 == 0:
-					conn.commit()
-
-		conn.commit()
-		cnt = 0
+		loader.loadFile(file)
 
 def insertDataCaller(columns):
 	"""Calls the insertData function a few times to insert info into the DB."""
@@ -587,28 +542,6 @@ def insertDataCaller(columns):
 		cols = ['timestamp', 'kvar', 'kw', 'soc', 'pwr_ref_volt']
 		insertData(['batteryOutput.csv'], 'BatteryWailea', cols)
 
-def writeNullsCaller(trimmedFileName, badDataFileName, dataColumnNumber, 
-					 timestampColumnNumber):
-	""" 
-	Convenience function to call the writeNullsIntoCsv function and handles
-	the file I/O.
-
-	:param trimmedFileName: Name of the CSV file stripped of blank entries
-	:param badDataFileName: Name of the CSV file containing flat data
-	:param dataColumnNumber: The col. # to be overwritten w/ null value
-	:param timestampColumnNumber: The col. # of the timestamp 
-	"""
-	trimmedFile = open(trimmedFileName, 'r')
-	newFile = open('output.csv', 'w+')
-	badDataFile = open(badDataFileName, 'r')
-	writeNullsIntoCsv(badDataFile, trimmedFile, newFile, 
-		dataColumnNumber, timestampColumnNumber)
-	subprocess.call(['rm', '-f', badDataFile.name])
-	subprocess.call(['mv', newFile.name, trimmedFile.name])
-	trimmedFile.close()
-	newFile.close()
-	badDataFile.close()
-
 #----------------#
 # Body of script #
 #----------------#
@@ -639,95 +572,20 @@ for filename in fileNames:
 
 	# Here's where we call our algorithm to scan for lines found in the data
 	# where all the 'items to scan for' are blank. If a line of the CSV is 
-	# missing output for all members in the tuple, it will be deleted in the 
-	# trimBlankLines() routine.
+	# missing output for all members in the tuple, it will be deleted. Flat
+	# data in the monitored columns is overwritten with null values in the
+	# same pass.
 	itemsToScanFor = (columns['transformerVltACol'], 
 		 		 	  columns['transformerVltBCol'], 
 		 		 	  columns['transformerVltCCol'])
-	inputFile = open(filename, 'r')
+	detectors = [FlatlineDetector(header[columns[key]], columns[key])
+				 for key in FLATLINE_COLUMNS if columns.has_key(key)]
 
-	trimmedFile = trimBlankLines(inputFile, itemsToScanFor,
-								 columns['timestampCol'])
+	with open(filename, 'r') as inputFile:
+		trimmedFile = cleanSCADAFile(inputFile, detectors, itemsToScanFor,
+									 columns['timestampCol'])
 	trimmedFileName = trimmedFile.name
-
-	with open(trimmedFileName, 'r') as trimmedFile:
-		reader = csv.reader(trimmedFile)
-		voltageStandardDeviationAlgorithm(reader, 'wailea_voltage_a.csv', 
-			'voltage', columns['transformerVltACol'], columns['timestampCol'])
-		trimmedFile.seek(0)
-		reader = csv.reader(trimmedFile)
-		voltageStandardDeviationAlgorithm(reader, 'wailea_voltage_b.csv', 
-			'voltage', columns['transformerVltBCol'], columns['timestampCol'])
-		trimmedFile.seek(0)
-		reader = csv.reader(trimmedFile)
-		voltageStandardDeviationAlgorithm(reader, 'wailea_voltage_c.csv', 
-			'voltage', columns['transformerVltCCol'], columns['timestampCol'])
-		trimmedFile.seek(0)
-		reader = csv.reader(trimmedFile)
-		voltageStandardDeviationAlgorithm(reader, 'circuit_1517_mw.csv', 
-			'voltage', columns['mw1517Col'], columns['timestampCol'])
-		trimmedFile.seek(0)
-		reader = csv.reader(trimmedFile)
-		voltageStandardDeviationAlgorithm(reader, 'circuit_1518_mw.csv', 
-			'voltage', columns['mw1518Col'], columns['timestampCol'])
-		trimmedFile.seek(0)
-		reader = csv.reader(trimmedFile)
-		voltageStandardDeviationAlgorithm(reader, 'circuit_1517_mvar.csv', 
-			'voltage', columns['mvar1517Col'], columns['timestampCol'])
-		trimmedFile.seek(0)
-		reader = csv.reader(trimmedFile)
-		voltageStandardDeviationAlgorithm(reader, 'circuit_1518_mvar.csv', 
-			'voltage', columns['mvar1518Col'], columns['timestampCol'])
-
-		if columns.has_key('batteryKvar'):
-			trimmedFile.seek(0)
-			reader = csv.reader(trimmedFile)
-			voltageStandardDeviationAlgorithm(reader, 'battery_kvar.csv', 
-				'voltage', columns['batteryKvar'], columns['timestampCol'])
-
-		if columns.has_key('batteryKw'):
-			trimmedFile.seek(0)
-			reader = csv.reader(trimmedFile)
-			voltageStandardDeviationAlgorithm(reader, 'battery_kw.csv', 
-				'voltage', columns['batteryKw'], columns['timestampCol'])
-
-		if columns.has_key('batterySoc'):
-			trimmedFile.seek(0)
-			reader = csv.reader(trimmedFile)
-			voltageStandardDeviationAlgorithm(reader, 'battery_soc.csv', 
-				'voltage', columns['batterySoc'], columns['timestampCol'])
-
-		if columns.has_key('batteryVolt'):
-			trimmedFile.seek(0)
-			reader = csv.reader(trimmedFile)
-			voltageStandardDeviationAlgorithm(reader, 'battery_volt.csv', 
-				'voltage', columns['batteryVolt'], columns['timestampCol'])
-
-	# And finally we overwrite places the CSV file where we had bad data with 
-	# null values. Yes, this could be broken out into a function...
-
-	writeNullsCaller(trimmedFileName, 'wailea_voltage_a.csv', 
-					columns['transformerVltACol'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'wailea_voltage_b.csv', 
-					columns['transformerVltBCol'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'wailea_voltage_c.csv', 
-					columns['transformerVltCCol'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'circuit_1517_mw.csv', 
-					columns['mw1518Col'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'circuit_1518_mw.csv', 
-					columns['mw1518Col'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'circuit_1517_mvar.csv', 
-					columns['mvar1517Col'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'circuit_1518_mvar.csv', 
-					columns['mvar1518Col'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'battery_kvar.csv', 
-					columns['batteryKvar'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'battery_kw.csv', 
-					columns['batteryKw'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'battery_soc.csv', 
-					columns['batterySoc'], columns['timestampCol'])
-	writeNullsCaller(trimmedFileName, 'battery_volt.csv', 
-					columns['batteryVolt'], columns['timestampCol'])
+	trimmedFile.close()
 
 	trimmedFile = open(trimmedFileName, 'r')
 	reader = csv.reader(trimmedFile)
@@ -19,10 +19,9 @@ __license__ = 'https://raw.github' \
               '-LICENSE.txt'
 
 
-import csv
 import sys
 from msg_db_connector import MSGDBConnector
-from msg_db_util import MSGDBUtil
+from msg_csv_bulk_loader import MSGCSVBulkLoader
 from msg_notifier import MSGNotifier
 from msg_configer import MSGConfiger
 
@@ -34,8 +33,6 @@ if __name__ == '__main__':
     anyFailure = False
     connector = MSGDBConnector()
     conn = connector.connectDB()
-    cur = conn.cursor()
-    dbUtil = MSGDBUtil()
     notifier = MSGNotifier()
     msgBody = ''
     configer = MSGConfiger()
@@ -47,12 +44,8 @@ if __name__ == '__main__':
     sys.stderr.write(msg)
     msgBody += msg
 
-    f = open(filename, "r")
-    reader = csv.reader(f)
-
     # @todo verify column order
 
-    data = []
     cols = ['load_device_type', 'load_action', 'device_util_id', 'device_serial_no',
             'device_status', 'device_operational_status', 'install_date',
             'remove_date', 'cust_account_no', 'cust_name', 'service_point_util_id',
@@ -64,30 +57,12 @@ if __name__ == '__main__':
             'state', 'post_code', 'country', 'timezone', 'region_code',
             'map_page_no', 'map_coord', 'longitude', 'latitude']
 
-    lineCnt = 0
-
-    with open(filename) as tsv:
-        for line in csv.reader(tsv, delimiter = "\t"):
-            if lineCnt != 0:
-
-                data = line[0:38]
-
-                for i in range(0, 38):
-                    if len(data[i]) == 0:
-                        data[i] = 'NULL'
-                    else:
-                        data[i] = "'" + data[i] + "'"
-
-                sql = """INSERT INTO "LocationRecords" (%s) VALUES (%s)""" % (
-                    ','.join(cols), ','.join(data))
-
-                success = dbUtil.executeSQL(cur, sql)
-                if not success:
-                    anyFailure = True
-
-            lineCnt += 1
-
-    conn.commit()
+    loader = MSGCSVBulkLoader(conn, '"LocationRecords"', cols,
+                              nullValues = [''], delimiter = '\t',
+                              exitOnFail = False)
+    lineCnt = loader.loadFile(filename)
+    if lineCnt is None:
+        anyFailure = True
 
     msg = ("Processed %s lines.\n" % lineCnt)
     sys.stderr.write(msg)
@@ -16,10 +16,9 @@ __license__ = 'https://raw.github' \
               '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
               '-LICENSE.txt'
 
-import csv
 import sys
 from msg_db_connector import MSGDBConnector
-from msg_db_util import MSGDBUtil
+from msg_csv_bulk_loader import MSGCSVBulkLoader
 from msg_notifier import MSGNotifier
 from msg_configer import MSGConfiger
 from sek.logger import SEKLogger
@@ -45,7 +44,7 @@ def processCommandLineArguments():
                            help = 'If this flag is on, '
                                   'insert data to the testing database as '
                                   'specified in the local configuration file.')
-    commandLineArgs = argParser.parse_args()
+    COMMAND_LINE_ARGS = argParser.parse_args()
 
 if __name__ == '__main__':
 
@@ -57,8 +56,6 @@ if __name__ == '__main__':
     anyFailure = False
     connector = MSGDBConnector(testing = COMMAND_LINE_ARGS.testing)
     conn = connector.connectDB()
-    cur = conn.cursor()
-    dbUtil = MSGDBUtil()
     notifier = MSGNotifier()
     msgBody = ''
     configer = MSGConfiger()
@@ -73,41 +70,16 @@ if __name__ == '__main__':
     sys.stderr.write(msg)
     msgBody += msg
 
-    f = open(filename, "r")
-    reader = csv.reader(f)
-
-    data = []
     cols = ["meter_name", "mac_address", "installed", "uninstalled", "location",
             "address", "city", "latitude", "longitude", "service_point_id",
             "service_point_height", "service_point_latitude",
             "service_point_longitude", "notes"]
 
-    lineCnt = 0
-
-    with open(filename, "rU") as csvFile:
-        for line in csv.reader(csvFile, delimiter = ","):
-            if lineCnt != 0: # Skip header.
-                data = line[0:len(cols)] # Overshoot columns to get the last column.
-
-                for i in range(0, len(cols)):
-                    if len(data[i]) == 0:
-                        data[i] = 'NULL'
-                    else:
-                        # Escape single quotes with double single quotes in
-                        # PostgreSQL.
-                        data[i] = data[i].replace("'", "\'\'")
-                        data[i] = "'" + data[i] + "'"
-
-                sql = """INSERT INTO "MeterLocationHistory" (%s) VALUES (%s)""" % (
-                    ','.join(cols), ','.join(data))
-                logger.log("SQL: %s" % sql, 'debug')
-                success = dbUtil.executeSQL(cur, sql)
-                if not success:
-                    anyFailure = True
-
-            lineCnt += 1
-
-    conn.commit()
+    loader = MSGCSVBulkLoader(conn, '"MeterLocationHistory"', cols,
+                              nullValues = [''], exitOnFail = False)
+    lineCnt = loader.loadFile(filename)
+    if lineCnt is None:
+        anyFailure = True
 
     msg = ("Processed %s lines.\n" % lineCnt)
     sys.stderr.write(msg)
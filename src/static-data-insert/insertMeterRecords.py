@@ -20,10 +20,9 @@ __license__ = 'https://raw.github' \
               '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
               '-LICENSE.txt'
 
-import csv
 import sys
 from msg_db_connector import MSGDBConnector
-from msg_db_util import MSGDBUtil
+from msg_csv_bulk_loader import MSGCSVBulkLoader
 from msg_notifier import MSGNotifier
 from msg_configer import MSGConfiger
 
@@ -34,8 +33,6 @@ if __name__ == '__main__':
     configer = MSGConfiger()
     connector = MSGDBConnector()
     conn = connector.connectDB()
-    cur = conn.cursor()
-    dbUtil = MSGDBUtil()
     notifier = MSGNotifier()
     msgBody = ''
 
@@ -46,10 +43,6 @@ if __name__ == '__main__':
     sys.stderr.write(msg)
     msgBody += msg
 
-    f = open(filename, "r")
-    reader = csv.reader(f)
-
-    data = []
     cols = ['type', 'action', 'did_sub_type', 'device_util_id', 'device_serial_no',
             'device_status', 'device_operational_status', 'device_name',
             'device_description', 'device_mfg', 'device_mfg_date',
@@ -71,29 +64,9 @@ if __name__ == '__main__':
             'nic_attribute_2', 'nic_attribute_3', 'nic_attribute_4',
             'nic_attribute_5']
 
-    lineCnt = 0
-
-    with open(filename) as tsv:
-        for line in csv.reader(tsv, delimiter = "\t"):
-            if lineCnt != 0:
-
-                data = line[0:66]
-
-                for i in range(0, 66):
-
-                    if len(data[i]) == 0:
-                        data[i] = 'NULL'
-                    else:
-                        data[i] = "'" + data[i] + "'"
-
-                sql = """INSERT INTO "MeterRecords" (%s) VALUES (%s)""" % (
-                    ','.join(cols), ','.join(data))
-
-                dbUtil.executeSQL(cur, sql)
-
-            lineCnt += 1
-
-    conn.commit()
+    loader = MSGCSVBulkLoader(conn, '"MeterRecords"', cols,
+                              nullValues = [''], delimiter = '\t')
+    lineCnt = loader.loadFile(filename)
 
     msg = ("Processed %s lines.\n" % lineCnt)
     sys.stderr.write(msg)
@@ -23,10 +23,12 @@ Running time is commensurate with the number of files in the working directory.
 import csv
 import sys
 import subprocess
-import datetime
 import os
 from msg_db_connector import MSGDBConnector
-from msg_db_util import MSGDBUtil
+from msg_csv_bulk_loader import MSGCSVBulkLoader
+from msg_timestamp_parser import MSGTimestampParser
+
+timestampParser = MSGTimestampParser()
 
 def get_clean_name(name):
 	"""
@@ -42,118 +44,15 @@ def get_clean_name(name):
 
 def get_timestamp(row):
 	"""
-	A convenience function to parse a string into a Python datetime object.
+	A convenience function to parse the time columns of a row into a Python
+	datetime object.
 
-	:param datetimeStr: A string containing a date and time, e.g.: Sun Sep 01 2013 24:00:00.000 GMT-1000
+	:param row: A row whose first four items are the second, year, Julian day
+				and HHMM hour and minute.
 	:returns: The corresponding datetime.datetime object
 	"""
 
-	#assign the values in the list to the different components needed to
-	#create the datetime object
-	second = int(row[0])
-	year = int(row[1])
-	julianDay = int(row[2])
-	hour = int(row[3][:-2])
-	minute = int(row[3][-2:])
-	#if we are dealing with a leap year, use these calculations to find the day
-	if is_leap_year(year) == 1:
-		if 1 <= julianDay < 32:
-			month = 1
-			day = julianDay
-		if 32 <= julianDay < 61:
-			month = 2
-			day = julianDay -31
-		if 61 <= julianDay < 92:
-			month = 3
-			day = julianDay - 60
-		if 92 <= julianDay < 122:
-			month = 4
-			day = julianDay - 91
-		if 122 <= julianDay < 153:
-			month = 5
-			day = julianDay - 121
-		if 153 <= julianDay < 183:
-			month = 6
-			day = julianDay - 152
-		if 183 <= julianDay < 214:
-			month = 7
-			day = julianDay - 182
-		if 214 <= julianDay < 245:
-			month = 8
-			day = julianDay - 213
-		if 245 <= julianDay < 275:
-			month = 9
-			day = julianDay - 244
-		if 275 <= julianDay < 306:
-			month = 10
-			day = julianDay - 274
-		if 306 <= julianDay < 336:
-			month = 11
-			day = julianDay - 305
-		if 336 <= julianDay <= 366:
-			month = 12
-			day = julianDay - 335
-	else:
-		#otherwise we're dealing with a non-leap year, then use these calculations for the day
-		if 1 <= julianDay < 32:
-			month = 1
-			day = julianDay
-		if 32 <= julianDay < 60:
-			month = 2
-			day = julianDay - 31
-		if 60 <= julianDay < 91:
-			month = 3
-			day = julianDay -59
-		if 91 <= julianDay < 121:
-			month = 4 
-			day = julianDay - 90
-		if 121 <= julianDay < 152:
-			month = 5
-			day = julianDay -120
-		if 152 <= julianDay < 182:
-			month = 6
-			day = julianDay - 151
-		if 182 <= julianDay < 213:
-			month = 7
-			day = julianDay - 181
-		if 213 <= julianDay < 244:
-			month = 8
-			day = julianDay - 212
-		if 244 <= julianDay < 274:
-			month = 9
-			day = julianDay - 243
-		if 274 <= julianDay < 305:
-			month = 10
-			day = julianDay - 273
-		if 305 <= julianDay < 335:
-			month = 11
-			day = julianDay - 304
-		if 335 <= julianDay <= 365:
-			month = 12
-			day = julianDay - 334
-	#now that we have the necessary componenets, build the object and return it
-	timestamp = datetime.datetime(year, month, day, hour, minute, second)
-	return timestamp
-
-
-def is_leap_year(year):
-	"""
-	Helper function for get_timestamp.
-
-	:param year: The year.
-	:returns True if the year is a leap year.
-	"""
-
-	year = int(year)
-	if(year%400) ==0:
-		leap=1
-	elif (year%100) == 0:
-		leap = 0
-	elif (year%4) == 0:
-		leap = 1
-	else:
-		leap = 0
-	return leap
+	return timestampParser.nrelTimestamp(row[0], row[1], row[2], row[3])
 
 
 def insertData(files, table, cols):
@@ -168,31 +67,11 @@ def insertData(files, table, cols):
 
 	connector = MSGDBConnector()
 	conn = connector.connectDB()
-	dbUtil = MSGDBUtil()
-	cursor = conn.cursor()
-
-	cnt = 0
+	loader = MSGCSVBulkLoader(conn, '"%s"' % table, cols,
+							  transforms = dict.fromkeys(cols, str.strip))
 
 	for file in files:
-
-		with open(file, 'rb') as csvfile:
-			myReader = csv.reader(csvfile, delimiter = ',')
-			# Skip the header line.
-			myReader.next()
-			for row in myReader:
-				print row
-				sql = """INSERT INTO "%s" (%s) VALUES (%s)""" % (
-					table, ','.join(cols),
-					','.join("'" + item.strip() + "'" for item in row))
-
-				sql = sql.replace("'NULL'", 'NULL')
-				dbUtil.executeSQL(cursor, sql)
-				cnt += 1
-				if cnt % 10000 == 0:
-					conn.commit()
-
-		conn.commit()
-		cnt = 0
+		loader.loadFile(file)
 
 def getFileNames(ext):
 	"""
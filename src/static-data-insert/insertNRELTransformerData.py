@@ -6,15 +6,19 @@ This module inserts transformer data into the database from NREL tab-separated
 data files for the distribution transformers that NREL metered in 2012 and
 2013. Meters ST530 and ST534 are commercial model TPYT, while  15502, 10745 and
 13976, residential meters of model SPDT. It walks the directory tree from the 
-working directory to get all CSV file paths, and parses them as it goes. This
-module requires a correctly configured instance of the Maui Smart Grid software
-in the runtime environment.
+working directory to get all CSV file paths and loads each file with a bulk
+COPY. This module requires a correctly configured instance of the Maui Smart
+Grid software in the runtime environment.
+
+With --workers, files are loaded concurrently, largest file first, by a pool of
+worker processes that each hold a database connection. The line count of each
+file is included in the notification.
 
 Usage:
 Run script from a working directory that contains files and folders that have
 the NREL transformer data. And type:
 
-insertNRELTransformerData.py [--email] [--testing]
+insertNRELTransformerData.py [--email] [--testing] [--workers N]
 """
 
 __author__ = 'David Wilkie'
@@ -23,14 +27,13 @@ __license__ = 'https://raw.github' \
               '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
               '-LICENSE.txt'
 
-import csv
 import sys
-import subprocess
-import shutil
 import os
+import itertools
+import multiprocessing
 from os.path import join
 from msg_db_connector import MSGDBConnector
-from msg_db_util import MSGDBUtil
+from msg_csv_bulk_loader import MSGCSVBulkLoader
 from msg_notifier import MSGNotifier
 from msg_configer import MSGConfiger
 from sek.logger import SEKLogger
@@ -39,6 +42,45 @@ import argparse
 commandLineArgs = None
 logger = SEKLogger(__name__, 'debug')
 
+# The database connection of the current process.
+connection = None
+
+SPDT_COLUMNS = ["timestamp", "quality", "v1_phasor_magnitude", \
+                "v1_phase_angle", "v2_phasor_magnitude", \
+                "v2_phase_angle", "v12_phasor_magnitude", \
+                "v12_phase_angle", "i1_phasor_magnitude", \
+                "i1_phase_angle", "i2_phasor_magnitude", \
+                "i2_phase_angle", "in_phasor_magnitude", \
+                "in_phase_angle", "frequency", "v1_rms", \
+                "v2_rms", "v12_rms", "i1_rms", "i2_rms", \
+                "in_rms", "apparent_power_magnitude_s", \
+                "real_power_p", "reactive_power_q", \
+                "power_factor", "meter_internal_temperature", \
+                "transformer_housing_temperature", \
+                "device_name"]
+
+TPYT_COLUMNS = ["timestamp", "quality", \
+                "va_phasor_magnitude", "va_phasor_angle", \
+                "vb_phasor_magnitude", "vb_phasor_angle", \
+                "vc_phasor_magnitude", "vc_phasor_angle", \
+                "ia_phasor_magnitude", "ia_phasor_angle", \
+                "ib_phasor_magnitude", "ib_phasor_angle", \
+                "ic_phasor_magnitude", "ic_phasor_angle", \
+                "frequency", "va_rms", "vb_rms", "vc_rms", \
+                "ia_rms", "ib_rms", "ic_rms", \
+                "apparent_power_magnitude_s", \
+                "phase_a_apparent_power_magnitude_s", \
+                "phase_b_apparent_power_magnitude_s", \
+                "phase_c_apparent_power_magnitude_s", \
+                "real_power_p", "phase_a_real_power_p", \
+                "phase_b_real_power_p", "phase_c_real_power_p", \
+                "reactive_power_q", "phase_a_reactive_power_q", \
+                "phase_b_reactive_power_q", \
+                "phase_c_reactive_power_q", "power_factor", \
+                "meter_internal_temperature", \
+                "transformer_housing_temperature", \
+                "device_name"]
+
 def processCommandLineArguments():
     global argParser, commandLineArgs, filename
     argParser = argparse.ArgumentParser(
@@ -51,6 +93,9 @@ def processCommandLineArguments():
                            help = 'If this flag is on, '
                                   'insert data to the testing database as '
                                   'specified in the local configuration file.')
+    argParser.add_argument('--workers', type = int, default = 1,
+                           help = 'Number of files to load concurrently, '
+                                  'each over its own database connection.')
     commandLineArgs = argParser.parse_args()
 
 def getDeviceNameFromFileName(name):
@@ -68,16 +113,56 @@ def getDeviceNameFromFileName(name):
     else:
         return False
 
+def tableAndColumns(deviceName):
+    """
+    :param deviceName: Device name from getDeviceNameFromFileName.
+    :returns: Tuple of (table, list of columns) for the data of the device.
+    """
+
+    if deviceName in ['15502', '13976', '10754']:
+        return "dw.\"TransformerDataNREL\"", SPDT_COLUMNS
+    return "dw.\"TransformerDataNRELST\"", TPYT_COLUMNS
+
+def openConnection(testing):
+    """
+    Open the database connection of the current process. This is the
+    initializer of the pool worker processes.
+
+    :param testing: True to connect to the testing database.
+    """
+
+    global connection
+    connection = MSGDBConnector(testing = testing).connectDB()
+
+def loadFile(nameAndPath):
+    """
+    Load a transformer data file. This is a multiprocessing pool worker.
+
+    :param nameAndPath: Path of a CSV file.
+    :returns: Tuple of the path and the count of lines loaded, or None if
+    the file was not loaded.
+    """
+
+    deviceName = getDeviceNameFromFileName(os.path.basename(nameAndPath))
+    if not deviceName:
+        logger.log("No device name found for %s." % nameAndPath, 'error')
+        return nameAndPath, None
+
+    table, cols = tableAndColumns(deviceName)
+    # The device name is the value of the last column for every row.
+    loader = MSGCSVBulkLoader(connection, table, cols,
+                              nullValues = ['', 'nil'], exitOnFail = False)
+    try:
+        return nameAndPath, loader.loadFile(nameAndPath, [deviceName])
+    except Exception as detail:
+        logger.log("Loading %s failed: %s" % (nameAndPath, detail), 'error')
+        return nameAndPath, None
+
 if __name__ == '__main__':
 
     processCommandLineArguments()
 
-    success = True
     anyFailure = False
-    connector = MSGDBConnector(testing = commandLineArgs.testing)
-    conn = connector.connectDB()
-    cur = conn.cursor()
-    dbUtil = MSGDBUtil()
     notifier = MSGNotifier()
     msgBody = ''
     configer = MSGConfiger()
@@ -87,91 +172,51 @@ if __name__ == '__main__':
     else:
         dbName = "meco_v3"
 
+    paths = []
     for root, dirs, files in os.walk(os.getcwd()):
         # For each file in the list of found files.
         for name in files:
-            nameAndPath = join(root, name)
             if not '.csv' in name.lower(): # Skip all non-CSV files.
                 continue
-            msg = ("Loading NREL xformer data in file %s to database %s.\n" % (
-                nameAndPath, dbName))
-            sys.stderr.write(msg)
-            msgBody += msg
-
-            data = []
-            lineCnt = 0
-
-            with open(nameAndPath, "rU") as csvFile:
-                for line in csv.reader(csvFile, delimiter = ","):
-                    if lineCnt == 0: # Check the type of transformer.
-                        if '15502' in name or '13976' in name \
-                        or '10754' in name:
-                            cols = ["timestamp", "quality", "v1_phasor_magnitude",\
-                                    "v1_phase_angle", "v2_phasor_magnitude", \
-                                    "v2_phase_angle", "v12_phasor_magnitude", \
-                                    "v12_phase_angle", "i1_phasor_magnitude", \
-                                    "i1_phase_angle", "i2_phasor_magnitude", \
-                                    "i2_phase_angle", "in_phasor_magnitude", \
-                                    "in_phase_angle", "frequency", "v1_rms", \
-                                    "v2_rms", "v12_rms", "i1_rms", "i2_rms", \
-                                    "in_rms", "apparent_power_magnitude_s", \
-                                    "real_power_p", "reactive_power_q", \
-                                    "power_factor", "meter_internal_temperature", \
-                                    "transformer_housing_temperature", \
-                                    "device_name"]
-                            table = "dw.\"TransformerDataNREL\""
-
-                        if 'ST534' in name or 'ST530' in name:
-                            cols = ["timestamp", "quality", \
-                                "va_phasor_magnitude", "va_phasor_angle", \
-                                "vb_phasor_magnitude", "vb_phasor_angle", \
-                                "vc_phasor_magnitude", "vc_phasor_angle",\
-                                "ia_phasor_magnitude", "ia_phasor_angle", \
-                                "ib_phasor_magnitude", "ib_phasor_angle", \
-                                "ic_phasor_magnitude", "ic_phasor_angle", \
-                                "frequency", "va_rms", "vb_rms", "vc_rms", \
-                                "ia_rms", "ib_rms", "ic_rms", \
-                                "apparent_power_magnitude_s", \
-                                "phase_a_apparent_power_magnitude_s", \
-                                "phase_b_apparent_power_magnitude_s", \
-                                "phase_c_apparent_power_magnitude_s", \
-                                "real_power_p", "phase_a_real_power_p", \
-                                "phase_b_real_power_p", "phase_c_real_power_p",\
-                                "reactive_power_q", "phase_a_reactive_power_q",\
-                                "phase_b_reactive_power_q", \
-                                "phase_c_reactive_power_q", "power_factor", \
-                                "meter_internal_temperature", \
-                                "transformer_housing_temperature", \
-                                "device_name"]
-                            table = "dw.\"TransformerDataNRELST\""
-
-                    if lineCnt != 0: # Skip header.
-                        data = line[0:len(cols)] # Overshoot to get last column.
-
-                        for i in range(0, len(cols) - 1):
-                            if len(data[i]) == 0 or data[i] == 'nil':
-                                data[i] = 'NULL'
-                            else:
-                                # Escape single quotes with double single quotes in
-                                # PostgreSQL.
-                                data[i] = data[i].replace("'", "\'\'")
-                                data[i] = "'" + data[i] + "'"
-
-                        data = data + ["'" + getDeviceNameFromFileName(name) + "'"]
-
-                        sql = """INSERT INTO %s (%s) VALUES (%s)""" % (
-                            table, ','.join(cols), ','.join(data))
-                        success = dbUtil.executeSQL(cur, sql)
-                        if not success:
-                            anyFailure = True
-
-                    lineCnt += 1
-
-            conn.commit()
-            msg = ("Processed %s lines.\n" % lineCnt)
-            lineCnt = 0
-            sys.stderr.write(msg)
-            msgBody += msg
+            paths.append(join(root, name))
+
+    # Start the largest files first so that one does not extend the run time
+    # by starting last.
+    paths.sort(key = os.path.getsize, reverse = True)
+
+    workers = max(1, commandLineArgs.workers)
+    msg = ("Loading %s NREL xformer data files to database %s with %s "
+           "workers.\n" % (len(paths), dbName, workers))
+    sys.stderr.write(msg)
+    msgBody += msg
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer = openConnection,
+                                    initargs = (commandLineArgs.testing,))
+        results = pool.imap_unordered(loadFile, paths)
+    else:
+        openConnection(commandLineArgs.testing)
+        results = itertools.imap(loadFile, paths)
+
+    totalCnt = 0
+    for nameAndPath, lineCnt in results:
+        if lineCnt is None:
+            anyFailure = True
+            msg = "Failed to load %s.\n" % nameAndPath
+        else:
+            totalCnt += lineCnt
+            msg = "Processed %s lines in %s.\n" % (lineCnt, nameAndPath)
+        sys.stderr.write(msg)
+        msgBody += msg
+
+    if pool:
+        pool.close()
+        pool.join()
+
+    msg = "Processed %s lines in %s files.\n" % (totalCnt, len(paths))
+    sys.stderr.write(msg)
+    msgBody += msg
 
     if not anyFailure:
         msg = "Finished inserting NREL transformer records.\n"
@@ -20,8 +20,8 @@ __license__ = 'https://raw.github' \
 
 from msg_db_connector import MSGDBConnector
 from msg_db_util import MSGDBUtil
+from msg_timestamp_parser import MSGTimestampParser
 import csv
-import re
 
 if __name__ == '__main__':
 
@@ -29,6 +29,7 @@ if __name__ == '__main__':
     conn = connector.connectDB()
     dbUtil = MSGDBUtil()
     cursor = conn.cursor()
+    timestampParser = MSGTimestampParser()
 
     tFiles = ['Kihei AirTemp F 2013_07.csv', 'Kihei AirTemp F 2013_08.csv',
               'Kihei AirTemp F 2013_09.csv', 'Kihei AirTemp F 2013_10.csv']
@@ -59,8 +60,7 @@ if __name__ == '__main__':
                     continue
                     #temps[t_i] = [row[0], row[1]]
 
-                row[0] = row[0].replace('GMT-1000', '')
-                row[0] = re.sub(r'\s24:', '\s00:', row[0])
+                row[0] = str(timestampParser.scadaTimestamp(row[0]))
 
                 if row[1] == '':
                     row[1] = 'NULL'
@@ -91,8 +91,7 @@ if __name__ == '__main__':
                     cnt += 1
                     continue
 
-                row[0] = row[0].replace('GMT-1000', '')
-                row[0] = re.sub(r'\s24:', '\s00:', row[0])
+                row[0] = str(timestampParser.scadaTimestamp(row[0]))
 
                 if row[1] == '':
                     row[1] = 'NULL'
@@ -9,6 +9,7 @@ __license__ = 'https://raw.github' \
 
 import unittest
 from meco_dupe_check import MECODupeChecker
+from meco_dupe_index import MECODupeIndex
 from meco_xml_parser import MECOXMLParser
 from msg_db_connector import MSGDBConnector
 from msg_db_util import MSGDBUtil
@@ -47,6 +48,47 @@ class TestMECODupeChecker(unittest.TestCase):
                                                      '1', True),
             "Record should already exist")
 
+    def testFindIndividualDupeWithIndex(self):
+        """
+        Find a duplicate record using an index loaded for a file.
+        """
+        self.dbUtil.eraseTestMeco()
+
+        self.p.filename = "../../test-data/meco_v3-energy-test-data.xml"
+        fileObject = open(self.p.filename, "rb")
+        self.p.parseXML(fileObject, True)
+
+        dupeIndex = MECODupeIndex()
+        dupeIndex.load(self.conn, open(self.p.filename, "rb"))
+
+        self.assertTrue(dupeIndex.readingDupeExists('100000',
+                                                    '2013-04-08T00:30:00.000'
+                                                    '-10:00', '1'),
+                        "Record should already exist")
+        self.assertFalse(dupeIndex.readingDupeExists('100000',
+                                                     '2013-04-08T00:30:00.000'
+                                                     '-10:00', '9'),
+                         "Record should not exist")
+
+    def testReloadIsDroppedWithIndex(self):
+        """
+        Loading the same file twice with the dupe index inserts no readings
+        the second time.
+        """
+        self.dbUtil.eraseTestMeco()
+
+        filename = "../../test-data/meco_v3-energy-test-data.xml"
+        self.p.filename = filename
+        self.p.parseXML(open(filename, "rb"), True)
+
+        parser = MECOXMLParser(True)
+        parser.filename = filename
+        parser.parseXML(open(filename, "rb"), True, indexDupes = True)
+
+        self.assertEqual(parser.totalReadingInsertCount, 0)
+        self.assertEqual(parser.totalReadingDupeOnInsertCount,
+                         self.p.totalReadingInsertCount)
+
     def testLoadOnTop(self):
         """
         If the same data set is loaded in succession,
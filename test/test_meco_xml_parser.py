@@ -38,6 +38,64 @@ class TestMECOXMLParser(unittest.TestCase):
         print "element count = %s" % self.p.processForInsertElementCount
         self.assertEqual(self.p.processForInsertElementCount, expectedCount)
 
+    def testEveryElementIsVisitedWhenStreaming(self):
+        self.dbUtil.eraseTestMeco()
+
+        self.p.filename = "../../test-data/meco_v3-energy-test-data.xml"
+        fileObject = open(self.p.filename, "rb")
+        expectedCount = 125
+        self.p.parseXML(fileObject, True, streaming = True)
+        print "element count = %s" % self.p.processForInsertElementCount
+        self.assertEqual(self.p.processForInsertElementCount, expectedCount)
+
+    def testStreamingWalkMatchesTreeWalk(self):
+        """
+        Incremental parsing produces the same element sequence as walking a
+        fully built tree.
+        """
+
+        import xml.etree.ElementTree as ET
+
+        filename = "../../test-data/meco_v3-energy-test-data.xml"
+
+        def describe(pairs):
+            return [(e.tag, sorted(e.attrib.items()), e.text,
+                     n.tag if n is not None else None) for e, n in pairs]
+
+        treeWalk = describe(
+            self.p.getNext(ET.parse(open(filename, "rb")).getroot().iter()))
+        streamingWalk = describe(
+            self.p.iterElementsWithNext(open(filename, "rb")))
+        self.assertEqual(treeWalk, streamingWalk)
+
+    def testBatchInsertMatchesRowInsert(self):
+        """
+        Batch insertion inserts the same rows, with the same key structure,
+        as row-by-row insertion.
+        """
+
+        filename = "../../test-data/meco_v3-energy-test-data.xml"
+        sql = """SELECT COUNT(*) FROM "MeterData"
+                 INNER JOIN "IntervalReadData" ON "MeterData".meter_data_id =
+                 "IntervalReadData".meter_data_id
+                 INNER JOIN "Interval" ON "IntervalReadData"
+                 .interval_read_data_id = "Interval".interval_read_data_id
+                 INNER JOIN "Reading" ON "Interval".interval_id = "Reading"
+                 .interval_id"""
+
+        counts = []
+        for batch in [False, True]:
+            self.dbUtil.eraseTestMeco()
+            parser = MECOXMLParser(True)
+            parser.filename = filename
+            parser.parseXML(open(filename, "rb"), True, batch = batch)
+            self.dbUtil.executeSQL(self.cur, sql)
+            counts.append(self.cur.fetchone()[0])
+            self.conn.commit()
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertGreater(counts[1], 0)
+
     def testAllTableNamesArePresent(self):
         self.dbUtil.eraseTestMeco()
 
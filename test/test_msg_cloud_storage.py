@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import unittest
+import hashlib
+import os
+import shutil
+import tempfile
+from msg_cloud_storage import MSGLocalStorageClient
+
+
+class MSGCloudStorageTester(unittest.TestCase):
+    """
+    Unit tests for resumable uploads using the local storage client.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.storagePath = os.path.join(self.path, 'cloud')
+        os.mkdir(self.storagePath)
+        self.fullPath = os.path.join(self.path, 'export.sql.gz.0')
+        self.data = os.urandom(1000)
+        with open(self.fullPath, 'wb') as f:
+            f.write(self.data)
+        self.body = {'title': 'export.sql.gz.0'}
+
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+
+    def test_upload_resumes_after_transient_failures(self):
+        client = MSGLocalStorageClient(self.storagePath, transientFailures = 3,
+                                       chunkSize = 256, retryDelay = 0)
+        item = client.upload(self.fullPath, self.body,
+                             'application/gzip-compressed')
+
+        self.assertEqual(0, client.transientFailures)
+        self.assertEqual(hashlib.md5(self.data).hexdigest(),
+                         item['md5Checksum'])
+        self.assertEqual('export.sql.gz.0', item['originalFilename'])
+        self.assertEqual([item['id']], [i['id'] for i in client.listFiles()])
+
+
+    def test_upload_fails_after_retry_count(self):
+        client = MSGLocalStorageClient(self.storagePath, transientFailures = 3,
+                                       chunkSize = 256, retryCount = 2,
+                                       retryDelay = 0)
+        self.assertRaises(IOError, client.upload, self.fullPath, self.body,
+                          'application/gzip-compressed')
+        self.assertEqual([], client.listFiles())
+        self.assertEqual([], os.listdir(self.storagePath))
+
+
+if __name__ == '__main__':
+    unittest.main()
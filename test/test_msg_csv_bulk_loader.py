@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import unittest
+import os
+import shutil
+import tempfile
+from msg_csv_bulk_loader import MSGCSVBulkLoader
+
+
+class CopyRecorder(object):
+    """
+    Connection and cursor that record the data sent with COPY.
+    """
+
+    def __init__(self, failAfter = None):
+        self.copies = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.failAfter = failAfter
+
+    def cursor(self):
+        return self
+
+    def copy_expert(self, sql, f):
+        if self.failAfter is not None and len(self.copies) >= self.failAfter:
+            raise Exception('Copy failed.')
+        self.copies.append((sql, f.read()))
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class MSGCSVBulkLoaderTester(unittest.TestCase):
+    """
+    Unit tests for loading CSV files with COPY.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.columns = ['timestamp', 'name', 'value', 'device_name']
+
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+
+    def test_load_file(self):
+        fullPath = os.path.join(self.path, 'data.csv')
+        with open(fullPath, 'w') as f:
+            f.write('timestamp,name,value\n'
+                    '2014-01-01 00:00, O\'Brien ,1.5\n'
+                    '2014-01-01 00:01,"tab\tand\\",NULL\n'
+                    '2014-01-01 00:02,,nil,ignored\n'
+                    '2014-01-01 00:03\n')
+        conn = CopyRecorder()
+        loader = MSGCSVBulkLoader(conn, 'dw."Data"', self.columns,
+                                  transforms = {'name': str.strip},
+                                  nullValues = ['', 'NULL', 'nil'],
+                                  batchSize = 3)
+
+        self.assertEqual(4, loader.loadFile(fullPath, ['ST530']))
+        self.assertEqual(2, len(conn.copies))
+        self.assertEqual(1, conn.commits)
+        self.assertEqual('COPY dw."Data" (timestamp,name,value,device_name) '
+                         'FROM STDIN', conn.copies[0][0])
+        self.assertEqual('2014-01-01 00:00\tO\'Brien\t1.5\tST530\n'
+                         '2014-01-01 00:01\ttab\\tand\\\\\t\\N\tST530\n'
+                         '2014-01-01 00:02\t\\N\t\\N\tST530\n',
+                         conn.copies[0][1])
+        self.assertEqual('2014-01-01 00:03\t\\N\t\\N\tST530\n',
+                         conn.copies[1][1])
+
+
+    def test_load_rows_without_commit(self):
+        conn = CopyRecorder()
+        loader = MSGCSVBulkLoader(conn, '"Data"', self.columns[:3])
+
+        self.assertEqual(2, loader.loadRows([(1, None, 2.5), ['a', 'b', 'c']],
+                                            commit = False))
+        self.assertEqual(0, conn.commits)
+        self.assertEqual('1\t\\N\t2.5\na\tb\tc\n', conn.copies[0][1])
+
+
+    def test_failed_load(self):
+        conn = CopyRecorder(failAfter = 1)
+        loader = MSGCSVBulkLoader(conn, '"Data"', self.columns[:1],
+                                  batchSize = 1, exitOnFail = False)
+
+        self.assertEqual(None, loader.loadRows([['a'], ['b']]))
+        self.assertEqual(1, len(conn.copies))
+        self.assertEqual(0, conn.commits)
+        self.assertEqual(1, conn.rollbacks)
+
+
+if __name__ == '__main__':
+    unittest.main()
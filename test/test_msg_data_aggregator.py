@@ -96,6 +96,20 @@ class MSGDataAggregatorTester(unittest.TestCase):
         self.assertIsNotNone(rows, 'Rows are present.')
 
 
+    def testStreamedFetchMatchesFetch(self):
+        """
+        Streaming raw data through a server-side cursor provides the same
+        rows as fetching them all at once, independent of the batch size.
+        """
+
+        timeCol = 'datetime'
+        args = {'dataType': 'egauge', 'orderBy': [timeCol, 'egauge_id'],
+                'timestampCol': timeCol, 'startDate': self.testStart,
+                'endDate': self.testEnd}
+        self.aggregator.itersize = 7
+        self.assertEqual(self.aggregator.rawData(**args),
+                         list(self.aggregator.rawData(streaming = True, **args)))
+
     def testEgaugeAggregation(self):
         """
         Perform aggregation over the testing time interval.
@@ -197,6 +211,132 @@ class MSGDataAggregatorTester(unittest.TestCase):
         self.aggregator.insertAggregatedData(agg = agg)
 
 
+    def testSQLAggregationMatchesPythonAggregation(self):
+        """
+        The SQL engine provides the same aggregated data as the Python
+        engine over the testing time interval.
+        """
+
+        for dataType in self.rawTypes:
+            (aggType, timeCol, subkeyCol) = self.aggregator.dataParameters(
+                dataType)
+            args = {'dataType': dataType, 'aggregationType': aggType,
+                    'timeColumnName': timeCol,
+                    'subkeyColumnName': subkeyCol if subkeyCol else None,
+                    'startDate': self.testStart, 'endDate': self.testEnd}
+            pythonAgg = self.aggregator.aggregatedData(**args)
+            sqlAgg = self.aggregator.sqlAggregatedData(**args)
+
+            self.assertEqual(pythonAgg.columns, sqlAgg.columns)
+            self.assertEqual(len(pythonAgg.data), len(sqlAgg.data),
+                             'Row count not equal for {}.'.format(dataType))
+
+            flatten = lambda data: [val for row in data for val in (
+                row.values()[0] if type(row) == type({}) else row)]
+            for pythonVal, sqlVal in zip(flatten(pythonAgg.data),
+                                         flatten(sqlAgg.data)):
+                if type(pythonVal) == type(0.0):
+                    self.assertAlmostEqual(pythonVal, sqlVal)
+                else:
+                    self.assertEqual(pythonVal, sqlVal)
+
+    def testSQLAggregationWithMissingBoundaryMinute(self):
+        """
+        The SQL engine ends an interval at the same reading as the Python
+        engine when there is no reading in a 15-minute boundary minute. The
+        readings in the boundary minute are deleted and then rolled back.
+        """
+
+        aggCnt = 0
+        try:
+            for dataType in self.rawTypes:
+                (aggType, timeCol, subkeyCol) = self.aggregator.dataParameters(
+                    dataType)
+                self.aggregator.cursor.execute(
+                    """DELETE FROM "{}" WHERE date_trunc('minute', {}) =
+                    '2014-01-02 12:00'""".format(
+                        self.aggregator.tables[dataType], timeCol))
+                args = {'dataType': dataType, 'aggregationType': aggType,
+                        'timeColumnName': timeCol,
+                        'subkeyColumnName': subkeyCol if subkeyCol else None,
+                        'startDate': self.testStart, 'endDate': self.testEnd}
+                pythonAgg = self.aggregator.aggregatedData(**args)
+                sqlAgg = self.aggregator.sqlAggregatedData(**args)
+                aggCnt += len(pythonAgg.data)
+
+                self.assertEqual(len(pythonAgg.data), len(sqlAgg.data),
+                                 'Row count not equal for {}.'.format(
+                                     dataType))
+
+                flatten = lambda data: [val for row in data for val in (
+                    row.values()[0] if type(row) == type({}) else row)]
+                for pythonVal, sqlVal in zip(flatten(pythonAgg.data),
+                                             flatten(sqlAgg.data)):
+                    if type(pythonVal) == type(0.0):
+                        self.assertAlmostEqual(pythonVal, sqlVal)
+                    else:
+                        self.assertEqual(pythonVal, sqlVal)
+        finally:
+            self.aggregator.conn.rollback()
+
+        self.assertGreater(aggCnt, 0, 'No intervals were aggregated.')
+
+    def testNumpyAggregationMatchesPythonAggregation(self):
+        """
+        The NumPy engine provides the same aggregated data as the Python
+        engine over the testing time interval.
+        """
+
+        for dataType in self.rawTypes:
+            (aggType, timeCol, subkeyCol) = self.aggregator.dataParameters(
+                dataType)
+            args = {'dataType': dataType, 'aggregationType': aggType,
+                    'timeColumnName': timeCol,
+                    'subkeyColumnName': subkeyCol if subkeyCol else None,
+                    'startDate': self.testStart, 'endDate': self.testEnd}
+            pythonAgg = self.aggregator.aggregatedData(**args)
+            numpyAgg = self.aggregator.numpyAggregatedData(**args)
+
+            self.assertEqual(pythonAgg.columns, numpyAgg.columns)
+            self.assertEqual(len(pythonAgg.data), len(numpyAgg.data),
+                             'Row count not equal for {}.'.format(dataType))
+
+            flatten = lambda data: [val for row in data for val in (
+                row.values()[0] if type(row) == type({}) else row)]
+            for pythonVal, numpyVal in zip(flatten(pythonAgg.data),
+                                           flatten(numpyAgg.data)):
+                if type(pythonVal) == type(0.0):
+                    self.assertAlmostEqual(pythonVal, numpyVal)
+                else:
+                    self.assertEqual(pythonVal, numpyVal)
+
+    def testBulkUpsertIsIdempotent(self):
+        """
+        Bulk inserting the same aggregated data twice with upsert leaves one
+        row per interval. The inserts are rolled back.
+        """
+
+        (aggType, timeCol, subkeyCol) = self.aggregator.dataParameters(
+            'egauge')
+        agg = self.aggregator.aggregatedData(dataType = 'egauge',
+                                             aggregationType = aggType,
+                                             timeColumnName = timeCol,
+                                             subkeyColumnName = subkeyCol,
+                                             startDate = self.testStart,
+                                             endDate = self.testEnd)
+        for i in range(2):
+            self.aggregator.bulkInsertAggregatedData(agg = agg, upsert = True,
+                                                     commit = False)
+
+        endpoints = set(row.values()[0][agg.columns.index(timeCol)] for row in
+                        agg.data)
+        cnt = self.aggregator.rows(
+            """SELECT COUNT(*) FROM "{}" WHERE {} BETWEEN '{}' AND '{}'""".format(
+                self.aggregator.tables[aggType], timeCol, min(endpoints),
+                max(endpoints)))[0][0]
+        self.aggregator.conn.rollback()
+        self.assertEqual(len(agg.data), cnt)
+
     def test_month_starts_and_ends(self):
         """
         Test retrieving the list of start and end dates for each month in a
@@ -306,6 +446,35 @@ class MSGDataAggregatorTester(unittest.TestCase):
                                                       timeColumnName =
                                                       'timestamp')
 
+    def testLastAggregationEndpointMatchesExistingIntervals(self):
+        """
+        The watermark for a data type is the last existing aggregation
+        interval.
+        """
+
+        for dataType in self.rawTypes:
+            (aggType, timeCol, subkeyCol) = self.aggregator.dataParameters(
+                dataType)
+            intervals = self.aggregator.existingIntervals(
+                aggDataType = aggType, timeColumnName = timeCol)
+            self.assertEqual(intervals[-1] if intervals else None,
+                             self.aggregator.lastAggregationEndpoint(
+                                 aggDataType = aggType,
+                                 timeColumnName = timeCol))
+
+    def testLastRawEndpointWithoutStartDate(self):
+        """
+        A missing start date searches the raw data from the beginning.
+        """
+
+        for dataType in self.rawTypes:
+            timeCol = self.aggregator.dataParameters(dataType)[1]
+            self.assertEqual(self.aggregator.lastRawEndpoint(
+                dataType = dataType, timeColumnName = timeCol,
+                startDate = datetime(1970, 1, 1)),
+                self.aggregator.lastRawEndpoint(dataType = dataType,
+                                                timeColumnName = timeCol))
+
     def testUnaggregatedDataExists(self):
         """
 
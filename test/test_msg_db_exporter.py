@@ -17,7 +17,7 @@ from msg_configer import MSGConfiger
 import os
 import shutil
 import gzip
-from msg_file_util import MSGFileUtil
+from msg_file_util import MSGFileUtil, MSGParallelGzipWriter
 from msg_db_connector import MSGDBConnector
 from msg_db_util import MSGDBUtil
 import re
@@ -26,6 +26,7 @@ import itertools
 import time
 from msg_time_util import MSGTimeUtil
 from msg_types import MSGNotificationHistoryTypes
+from msg_cloud_storage import MSGLocalStorageClient
 
 EARLIEST_DATE = MSGTimeUtil().datetimeForString('2011-01-01 00:00')
 
@@ -320,6 +321,36 @@ class MSGDBExporterTester(unittest.TestCase):
         map(self.exporter.deleteFile, ids)
 
 
+    def test_export_db_without_streaming(self):
+        """
+        Test the non-streaming export of an existing dump: the dump is
+        compressed, verified and moved to the final export path.
+        """
+
+        dumpName = 'meco_v3_test_data_export'
+        self.exporter.exportTempWorkPath = self.testDir
+        self.exporter.dumpName = lambda db = '': dumpName
+        fullPath = '{}/{}.sql'.format(self.testDir, dumpName)
+        shutil.copyfile('{}/{}'.format(self.exportTestDataPath,
+                                       self.uncompressedTestFilename), fullPath)
+        finalPath = os.path.join(
+            self.configer.configOptionValue('Export', 'db_export_final_path'),
+            '{}.sql.gz'.format(dumpName))
+
+        try:
+            self.assertEqual(self.exporter.exportDBs(databases = ['test_meco'],
+                                                     localExport = False,
+                                                     streaming = False,
+                                                     compressLevel = 6), [])
+            self.assertFalse(os.path.exists(fullPath))
+            with open('{}/{}'.format(self.exportTestDataPath,
+                                     self.uncompressedTestFilename), 'rb') as f:
+                self.assertEqual(gzip.open(finalPath, 'rb').read(), f.read())
+        finally:
+            if os.path.exists(finalPath):
+                os.remove(finalPath)
+
+
     def test_split_archive(self):
         """
         Test splitting an archive into chunks.
@@ -338,6 +369,114 @@ class MSGDBExporterTester(unittest.TestCase):
         self.assertEquals(len(self.fileChunks), 3)
 
 
+    def test_streaming_compression(self):
+        """
+        Test compressing and splitting a stream in a single pass.
+        """
+        fullPath = '{}/{}'.format(self.exportTestDataPath,
+                                  self.uncompressedTestFilename)
+        compressedPath = '{}/{}'.format(self.testDir,
+                                        self.compressedTestFilename)
+
+        with open(fullPath, 'rb') as f:
+            result = self.fileUtil.gzipCompressStream(f, compressedPath,
+                                                      chunkSize = 1000)
+        self.fileChunks = result.chunks
+
+        self.assertGreater(len(result.chunks), 1)
+        self.assertEqual(result.chunkMD5Sums,
+                         map(self.fileUtil.md5Checksum, result.chunks))
+        self.assertEqual(result.sourceMD5Sum,
+                         self.fileUtil.md5Checksum(fullPath))
+
+        with open(compressedPath, 'wb') as f:
+            for chunk in result.chunks:
+                f.write(open(chunk, 'rb').read())
+        self.assertEqual(result.md5sum,
+                         self.fileUtil.md5Checksum(compressedPath))
+        with open(fullPath, 'rb') as f:
+            self.assertEqual(gzip.open(compressedPath, 'rb').read(), f.read())
+
+
+    def test_parallel_compression(self):
+        """
+        Test that parallel block compression produces a multi-member gzip
+        file that uncompresses to the original data.
+        """
+        fullPath = '{}/{}'.format(self.exportTestDataPath,
+                                  self.uncompressedTestFilename)
+        compressedPath = '{}/{}'.format(self.testDir,
+                                        self.compressedTestFilename)
+        uncompressedPath = '{}/{}'.format(self.testDir,
+                                          self.uncompressedTestFilename)
+
+        with open(compressedPath, 'wb') as f:
+            writer = MSGParallelGzipWriter(f, compressLevel = 6, workers = 3,
+                                           blockSize = 1000)
+            writer.write(open(fullPath, 'rb').read())
+            writer.close()
+
+        self.assertGreater(writer.memberCount, 1)
+        self.fileUtil.gzipUncompressFile(compressedPath, uncompressedPath)
+        self.assertEqual(self.fileUtil.md5Checksum(uncompressedPath),
+                         self.fileUtil.md5Checksum(fullPath))
+
+
+    def test_md5_verification_of_split_archive(self):
+        """
+        Test verifying the chunks of a split archive against the checksum of
+        the uncompressed data.
+        """
+        shutil.copyfile('{}/{}'.format(self.exportTestDataPath,
+                                       self.compressedTestFilename),
+                        '{}/{}'.format(self.testDir,
+                                       self.compressedTestFilename))
+        fullPath = '{}/{}'.format(self.testDir, self.compressedTestFilename)
+        self.fileChunks = self.fileUtil.splitLargeFile(fullPath = fullPath,
+                                                       numChunks = 3)
+        md5sum1 = self.fileUtil.md5Checksum('{}/{}'.format(
+            self.exportTestDataPath, self.uncompressedTestFilename))
+
+        self.assertEqual(self.fileUtil.gzipMD5Checksum(self.fileChunks),
+                         md5sum1)
+        self.assertTrue(self.exporter.md5Verification(
+            md5sum1 = md5sum1, compressedChunks = self.fileChunks))
+        self.assertFalse(self.exporter.md5Verification(
+            md5sum1 = md5sum1, compressedChunks = self.fileChunks[:2]))
+
+
+    def test_upload_chunks_to_local_storage(self):
+        """
+        Test concurrent uploads of split sections with transient failures
+        using local storage in place of the cloud.
+        """
+        shutil.copyfile('{}/{}'.format(self.exportTestDataPath,
+                                       self.compressedTestFilename),
+                        '{}/{}'.format(self.testDir,
+                                       self.compressedTestFilename))
+        self.fileChunks = self.fileUtil.splitLargeFile(
+            fullPath = '{}/{}'.format(self.testDir,
+                                      self.compressedTestFilename),
+            numChunks = 3)
+        storagePath = os.path.join(self.testDir, 'cloud')
+        os.mkdir(storagePath)
+        storageClient = MSGLocalStorageClient(storagePath,
+                                              transientFailures = 4,
+                                              chunkSize = 1024,
+                                              retryDelay = 0)
+        exporter = MSGDBExporter(storageClient = storageClient)
+
+        try:
+            fileIDs = exporter.uploadFilesToCloudStorage(
+                fullPaths = self.fileChunks, retryCount = 1)
+            self.assertEqual(len(set(fileIDs)), 3)
+            self.assertEqual(
+                [exporter.filenameForFileID(fileID) for fileID in fileIDs],
+                [os.path.basename(f) for f in self.fileChunks])
+        finally:
+            shutil.rmtree(storagePath)
+
+
     def test_get_file_size(self):
         """
         Test retrieving local file sizes.
@@ -551,9 +690,14 @@ if __name__ == '__main__':
                          'test_dump_exclusions_dictionary',
                          'test_filename_for_file_id', 'test_move_to_final',
                          'test_get_md5_sum_from_cloud', 'test_split_archive',
+                         'test_streaming_compression',
+                         'test_parallel_compression',
+                         'test_md5_verification_of_split_archive',
+                         'test_upload_chunks_to_local_storage',
                          'test_get_file_size',
                          'test_get_file_id_for_nonexistent_file',
                          'test_create_compressed_archived',
+                         'test_export_db_without_streaming',
                          'test_adding_reader_permissions',
                          'test_markdown_list_of_downloadable_files',
                          'test_outdated_files', 'test_count_of_db_exports',
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import unittest
+import BaseHTTPServer
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from msg_noaa_weather_data_downloader import MSGWeatherDataDownloader
+
+
+class ArchiveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Stand-in for the NOAA server that serves archives from the server's
+    files dict and honors If-None-Match when the server's conditional flag
+    is set.
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = self.server.files.get(self.path.lstrip('/'))
+        if body is None:
+            self.send_error(404)
+            return
+
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.server.conditional and self.headers.getheader(
+                'If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MSGWeatherDataDownloaderTester(unittest.TestCase):
+    """
+    Unit tests for conditional retrieval of weather data archives.
+    """
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                ArchiveHandler)
+        self.server.files = {'QCLCD201208.zip': 'first'}
+        self.server.requests = []
+        self.server.conditional = True
+        self.thread = threading.Thread(target = self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d/QCLCD201208.zip' % \
+                   self.server.server_address[1]
+        self.downloader = MSGWeatherDataDownloader(self.path)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.path)
+
+    def contents(self, filename):
+        with open(os.path.join(self.path, filename), 'rb') as f:
+            return f.read()
+
+    def testUnchangedArchiveIsNotDownloaded(self):
+        self.assertTrue(self.downloader.download(self.url, 'QCLCD201208.zip'))
+        self.assertFalse(self.downloader.download(self.url, 'QCLCD201208.zip'))
+        self.assertEqual('first', self.contents('QCLCD201208.zip'))
+
+    def testChangedArchiveIsDownloaded(self):
+        self.downloader.download(self.url, 'QCLCD201208.zip')
+        self.server.files['QCLCD201208.zip'] = 'second'
+        self.assertTrue(self.downloader.download(self.url, 'QCLCD201208.zip'))
+        self.assertEqual('second', self.contents('QCLCD201208.zip'))
+
+    def testManifestIsUsedAcrossRuns(self):
+        self.downloader.download(self.url, 'QCLCD201208.zip')
+        downloader = MSGWeatherDataDownloader(self.path)
+        self.assertFalse(downloader.download(self.url, 'QCLCD201208.zip'))
+
+    def testHeadersAreComparedWithoutConditionalSupport(self):
+        self.server.conditional = False
+        self.downloader.download(self.url, 'QCLCD201208.zip')
+        self.assertFalse(self.downloader.download(self.url, 'QCLCD201208.zip'))
+
+    def testMissingLocalCopyIsDownloaded(self):
+        self.downloader.download(self.url, 'QCLCD201208.zip')
+        os.remove(os.path.join(self.path, 'QCLCD201208.zip'))
+        self.assertTrue(self.downloader.download(self.url, 'QCLCD201208.zip'))
+
+    def testZipMemberToGzip(self):
+        data = ''.join(['22516,20120801,%04d\n' % i for i in range(10000)])
+        zipPath = os.path.join(self.path, 'QCLCD201208.zip')
+        zfile = zipfile.ZipFile(zipPath, 'w', zipfile.ZIP_DEFLATED)
+        zfile.writestr('201208hourly.txt', data)
+        zfile.writestr('201208daily.txt', 'daily')
+        zfile.close()
+
+        gzPath = os.path.join(self.path, '201208hourly.txt.gz')
+        self.downloader.zipMemberToGzip(zipPath, '201208hourly.txt', gzPath)
+        f = gzip.open(gzPath, 'rb')
+        self.assertEqual(data, f.read())
+        f.close()
+        self.assertFalse(
+            os.path.exists(os.path.join(self.path, '201208hourly.txt')))
+
+    def testZipMemberToGzipWithStationFilter(self):
+        header = 'WBAN,Date,Time\n'
+        rows = ['%s,20120801,%04d\n' % (wban, i) for i in range(3000) for
+                wban in ('22516', '12345')]
+        zipPath = os.path.join(self.path, 'QCLCD201208.zip')
+        zfile = zipfile.ZipFile(zipPath, 'w', zipfile.ZIP_DEFLATED)
+        zfile.writestr('201208hourly.txt', header + ''.join(rows))
+        zfile.close()
+
+        gzPath = os.path.join(self.path, '201208hourly.txt.gz')
+        cnt = self.downloader.zipMemberToGzip(zipPath, '201208hourly.txt',
+                                              gzPath, compressLevel = 1,
+                                              stationIDs = ['22516'])
+        f = gzip.open(gzPath, 'rb')
+        self.assertEqual(header + ''.join(rows[0::2]), f.read())
+        f.close()
+        self.assertEqual(3000, cnt)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import unittest
+import datetime
+import StringIO
+import numpy as np
+from msg_rolling_statistics import MSGRollingStatistics
+
+
+class MSGRollingStatisticsTester(unittest.TestCase):
+    """
+    Unit tests for rolling-window statistics of SCADA data.
+    """
+
+    def setUp(self):
+        self.stats = MSGRollingStatistics(windowSize = 5, threshold = 0.001,
+                                          minTime = 10, blockSize = 7)
+        random = np.random.RandomState(0)
+        self.values = 12000 + random.normal(0, 1, 60)
+
+
+    def test_rolling_variance(self):
+        expected = [np.var(self.values[i:i + 5], ddof = 1) for i in
+                    range(len(self.values) - 4)]
+        np.testing.assert_allclose(self.stats.rollingVariance(self.values),
+                                   expected, rtol = 1e-9)
+        self.assertEqual(0, len(self.stats.rollingVariance(self.values[:4])))
+
+
+    def test_rolling_variance_of_near_constant_data(self):
+        values = np.concatenate((self.values[:20], np.repeat(12000.0001, 20),
+                                 self.values[20:]))
+        variance = self.stats.rollingVariance(values)
+        self.assertTrue(np.all(variance[20:36] <= 1e-20))
+        self.assertTrue(np.all(variance[:16] > 0.001 ** 2))
+        self.assertTrue(np.all(variance >= 0))
+
+
+    def test_flatline_masks(self):
+        timestamps = np.arange(80, dtype = np.float64)
+        values = np.empty((80, 2))
+        values[:, 0] = np.concatenate((self.values[:30], np.repeat(1.0, 20),
+                                       self.values[30:]))
+        values[:, 1] = np.concatenate((self.values[:30], np.repeat(1.0, 8),
+                                       self.values[30:], self.values[:12]))
+        values[40, 0] = np.nan
+
+        masks = self.stats.flatlineMasks(timestamps, values)
+
+        # Flat windows begin with the row of the fifth constant value and the
+        # run includes the first row above the threshold.
+        self.assertEqual(range(34, 51), np.flatnonzero(masks[:, 0]).tolist())
+        # A run of four flat windows is not long enough.
+        self.assertFalse(masks[:, 1].any())
+
+
+    def test_load_columns(self):
+        data = StringIO.StringIO('time,a,b\n'
+                                 '2014-01-01 00:00:00,1.5,\n'
+                                 '2014-01-01 00:00:01,NULL,2\n')
+        parse = lambda s: datetime.datetime.strptime(s, '%Y-%m-%d %H:%M:%S')
+        timestamps, values = self.stats.loadColumns(data, [2, 1], 0, parse)
+
+        self.assertEqual([1388534400, 1388534401], timestamps.tolist())
+        self.assertEqual(2, values[1, 0])
+        self.assertEqual(1.5, values[0, 1])
+        self.assertTrue(np.isnan(values[0, 0]))
+        self.assertTrue(np.isnan(values[1, 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Daniel Zhang (張道博)'
+__copyright__ = 'Copyright (c) 2014, University of Hawaii Smart Energy Project'
+__license__ = 'https://raw.github' \
+              '.com/Hawaii-Smart-Energy-Project/Maui-Smart-Grid/master/BSD' \
+              '-LICENSE.txt'
+
+import unittest
+from datetime import datetime, timedelta
+from msg_timestamp_parser import MSGTimestampParser
+
+
+class MSGTimestampParserTester(unittest.TestCase):
+    """
+    Unit tests for parsing SCADA and NREL timestamps.
+    """
+
+    def setUp(self):
+        self.parser = MSGTimestampParser(memoSize = 10)
+
+
+    def test_scada_timestamp(self):
+        start = datetime(2013, 12, 31, 22)
+        for i in range(0, 4 * 3600, 37):
+            timestamp = start + timedelta(seconds = i)
+            datetimeStr = timestamp.strftime(
+                '%a %b %d %Y %H:%M:%S.250 GMT-1000')
+            self.assertEqual(timestamp, self.parser.scadaTimestamp(datetimeStr))
+        self.assertTrue(len(self.parser.memo) <= 10)
+
+
+    def test_scada_hour_24(self):
+        self.assertEqual(datetime(2013, 9, 1, 0, 0, 5),
+                         self.parser.scadaTimestamp(
+                             'Sun Sep 01 2013 24:00:05.000 GMT-1000'))
+
+
+    def test_invalid_scada_timestamp(self):
+        for datetimeStr in ['', 'Sun Sep 1 2013 12:00:00.000 GMT-1000',
+                            'Sun Sex 01 2013 12:00:00.000 GMT-1000',
+                            'Sun Feb 30 2013 12:00:00.000 GMT-1000',
+                            'Sun Sep 01 2013 25:00:00.000 GMT-1000',
+                            'local datetime']:
+            self.assertRaises(ValueError, self.parser.scadaTimestamp,
+                              datetimeStr)
+
+
+    def test_nrel_timestamp(self):
+        self.assertEqual(datetime(2012, 9, 1, 13, 15, 30),
+                         self.parser.nrelTimestamp('30', '2012', '245', '1315'))
+        self.assertEqual(datetime(2013, 9, 2, 0, 5, 0),
+                         self.parser.nrelTimestamp('0', '2013', '245', '5'))
+        self.assertEqual(datetime(2012, 12, 31, 23, 59, 59),
+                         self.parser.nrelTimestamp(59, 2012, 366, 2359))
+        self.assertRaises(ValueError, self.parser.nrelTimestamp, '0', '2013',
+                          '366', '0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,7 @@ __license__ = 'https://raw.github' \
 import unittest
 from sek.logger import SEKLogger
 from msg_types import MSGAggregationTypes
+from msg_types import MSGAggregationEngines
 
 
 class MSGTypesTester(unittest.TestCase):
@@ -26,6 +27,11 @@ class MSGTypesTester(unittest.TestCase):
         self.assertTrue(MSGAggregationTypes.circuit in MSGAggregationTypes)
         self.assertTrue(MSGAggregationTypes.irradiance in MSGAggregationTypes)
 
+    def test_aggregation_engines(self):
+        self.assertTrue(MSGAggregationEngines.python in MSGAggregationEngines)
+        self.assertTrue(MSGAggregationEngines.sql in MSGAggregationEngines)
+        self.assertTrue(MSGAggregationEngines.numpy in MSGAggregationEngines)
+
     def tearDown(self):
         pass
 
@@ -35,7 +41,7 @@ if __name__ == '__main__':
 
     if RUN_SELECTED_TESTS:
 
-        selected_tests = ['test_aggregation_types']
+        selected_tests = ['test_aggregation_types', 'test_aggregation_engines']
 
         mySuite = unittest.TestSuite()
         for t in selected_tests:
@@ -12,7 +12,11 @@ from msg_noaa_weather_data_util import MSGWeatherDataUtil
 from sek.logger import SEKLogger
 from msg_db_connector import MSGDBConnector
 import re
+import datetime as dt
+from StringIO import StringIO
 from msg_configer import MSGConfiger
+from msg_noaa_weather_data_parser import MSGNOAAWeatherDataParser
+from msg_noaa_weather_data_inserter import MSGNOAAWeatherDataInserter
 
 
 class WeatherDataLoadingTester(unittest.TestCase):
@@ -46,6 +50,22 @@ class WeatherDataLoadingTester(unittest.TestCase):
         assert match and (match.group(1) == myDate), "Date format is valid."
 
 
+    def testFileMonthRanges(self):
+        """
+        Files for months containing or beyond the last loaded date need to be
+        reloaded.
+        """
+
+        ranges = self.weatherUtil.fileMonthRanges(
+            ['QCLCD201202.zip', 'QCLCD201203.zip'],
+            lastDate = dt.datetime(2012, 3, 5, 13, 53))
+        self.assertEqual([('QCLCD201202.zip', (
+            dt.datetime(2012, 2, 1), dt.datetime(2012, 2, 29)), False), (
+                              'QCLCD201203.zip', (dt.datetime(2012, 3, 1),
+                                                  dt.datetime(2012, 3, 31)),
+                              True)], ranges)
+
+
     def testWeatherDataPattern(self):
         myPattern = self.configer.configOptionValue('Weather Data',
                                                     'weather_data_pattern')
@@ -62,6 +82,87 @@ class WeatherDataLoadingTester(unittest.TestCase):
             1) == 'QCLCD201208.zip', "Download filename was matched."
 
 
+    def testWeatherRecordsParsing(self):
+        """
+        Only rows for the given stations are parsed and blank values are
+        given as NULL.
+        """
+
+        parser = MSGNOAAWeatherDataParser()
+        header = ','.join(['col%d' % i for i in range(len(parser.cols))])
+        values = ['1'] * (len(parser.cols) - 3)
+        values[5] = '  '
+        rows = [header, '22516,20120801,53,' + ','.join(values),
+                '12345,20120801,53,' + ','.join(values),
+                '22516,20120801,1253,' + ','.join([''] * (len(parser.cols) - 3))]
+        records = list(
+            parser.weatherRecords(StringIO('\r\n'.join(rows)), ['22516']))
+
+        self.assertEqual(2, len(records))
+        self.assertEqual(len(parser.recordCols), len(records[0]))
+        self.assertEqual('22516', records[0].wban)
+        self.assertEqual('2012-08-01 00:53', records[0].datetime)
+        self.assertEqual('2012-08-01 12:53', records[1].datetime)
+        self.assertEqual('NULL', records[0][7])
+        self.assertEqual('1', records[0].altimeter_flag)
+        self.assertEqual('NULL', records[1].altimeter_flag)
+        self.assertEqual(
+            dict(zip(parser.recordCols, records[0])),
+            parser.parseWeatherData(StringIO('\r\n'.join(rows)), ['22516'])[0])
+
+
+    def testBulkInsertDropsDupes(self):
+        """
+        Records colliding on (wban, datetime, record_type) are inserted
+        once. The inserts are rolled back.
+        """
+
+        parser = MSGNOAAWeatherDataParser()
+        inserter = MSGNOAAWeatherDataInserter()
+        conn = self.dbConnector.conn
+        values = ['NULL'] * len(parser.recordCols)
+        values[0] = '99999'
+        values[1] = '1900-01-01 00:53'
+        values[parser.recordCols.index('record_type')] = 'AA'
+        records = [tuple(values)] * 2
+
+        first = inserter.insertRecords(conn, 'WeatherNOAA', parser.recordCols,
+                                       records)
+        second = inserter.insertRecords(conn, 'WeatherNOAA',
+                                        parser.recordCols, records)
+        conn.rollback()
+
+        self.assertEqual(1, len(first))
+        self.assertEqual(0, len(second))
+
+
+    def testBulkInsertEscapesValues(self):
+        """
+        Values with line breaks, tabs and backslashes are inserted as they
+        are. The insert is rolled back.
+        """
+
+        parser = MSGNOAAWeatherDataParser()
+        inserter = MSGNOAAWeatherDataInserter()
+        conn = self.dbConnector.conn
+        flag = 'a\nb\r\nc\td\\e'
+        values = ['NULL'] * len(parser.recordCols)
+        values[0] = '99999'
+        values[1] = '1900-01-01 00:53'
+        values[parser.recordCols.index('altimeter_flag')] = flag
+
+        inserted = inserter.insertRecords(conn, 'WeatherNOAA',
+                                          parser.recordCols, [tuple(values)])
+        cur = conn.cursor()
+        cur.execute("""SELECT altimeter_flag FROM "WeatherNOAA" WHERE wban =
+        '99999' AND datetime = '1900-01-01 00:53'""")
+        rows = cur.fetchall()
+        conn.rollback()
+
+        self.assertEqual(1, len(inserted))
+        self.assertEqual([(flag,)], rows)
+
+
     def testWeatherDataURL(self):
         myURL = self.configer.configOptionValue('Weather Data',
                                                 'weather_data_url')